@@ -1,7 +1,8 @@
 """Flask application module."""
 import os
+import tempfile
 from datetime import datetime, timedelta
-from flask import Flask, render_template, session, redirect, url_for
+from flask import Flask, Request, render_template, session, redirect, url_for
 from flask_migrate import Migrate
 from authlib.integrations.flask_client import OAuth
 from src.models.database import db
@@ -9,6 +10,10 @@ from src.routes.document import document_bp
 from src.routes.dashboard import dashboard_bp
 from src.routes.alert import alert_bp
 from src.routes.auth import auth_bp, oauth
+from src.routes.metrics import metrics_bp
+from src.document_processor.jobs import JobWorkerPool, get_job_queue
+from src.document_processor.processor import process_job
+from src.document_processor.uploads import UPLOAD_MEMORY_LIMIT
 from config import Config
 
 def datetime_filter(value):
@@ -26,6 +31,32 @@ def format_number(value):
     except (ValueError, TypeError):
         return str(value)
 
+class UploadRequest(Request):
+    """Request that keeps uploaded files in memory up to UPLOAD_MEMORY_LIMIT.
+
+    Werkzeug otherwise spools any file over 500KB to a temporary file
+    before the upload route reads it.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return tempfile.SpooledTemporaryFile(max_size=UPLOAD_MEMORY_LIMIT, mode='rb+')
+
+def start_processing_workers(app):
+    """Start the configured background processing workers for ``app``.
+
+    Called by the entry points that run a long-lived process, never on
+    import: serverless and CLI imports must not start threads.
+    """
+    count = app.config['PROCESSING_WORKERS']
+    if count <= 0:
+        return None
+    print(f"Starting {count} processing workers")
+    with app.app_context():
+        workers = JobWorkerPool(app, get_job_queue(), process_job, workers=count)
+    workers.start()
+    app.extensions['processing_workers'] = workers
+    return workers
+
 def create_app():
     """Create Flask application."""
     print("Creating Flask application")
@@ -33,6 +64,7 @@ def create_app():
     
     # Create Flask app instance
     app = Flask(__name__)
+    app.request_class = UploadRequest
     print("Flask app instance created")
     
     # Load configuration
@@ -95,6 +127,9 @@ def create_app():
     print("Imported auth blueprint")
     app.register_blueprint(auth_bp)
     
+    print("Imported metrics blueprint")
+    app.register_blueprint(metrics_bp)
+    
     print("All blueprints registered successfully")
     
     @app.route('/')
@@ -128,4 +163,5 @@ app = create_app()
 # For local development
 if __name__ == '__main__':
     print("Running in development mode")
+    start_processing_workers(app)
     app.run(host='0.0.0.0', port=8080, debug=True)
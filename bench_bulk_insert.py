@@ -0,0 +1,67 @@
+"""Benchmark set-based covenant and alert inserts against adding ORM objects one at a time."""
+import os
+import tempfile
+import time
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+from flask import Flask
+
+from src.document_processor.processor import DocumentProcessor
+from src.models.database import Project, db
+
+def covenant_rows(size):
+    """Covenants of one document; a third are in warning and a third in breach."""
+    return [{
+        'name': f"Leverage Ratio {index}",
+        'description': f"Maximum leverage ratio, clause {index}",
+        'threshold_value': 3.5,
+        'current_value': [3.0, 3.7, 5.0][index % 3],
+        'measurement_frequency': 'quarterly',
+        'metadata': {'section': str(index)},
+    } for index in range(size)]
+
+def timed(func, covenants, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(covenants)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            project = Project(name='Benchmark', user_id='bench')
+            db.session.add(project)
+            db.session.commit()
+            processor = DocumentProcessor('agreement.pdf', 'bench', project.id, use_mock=True)
+
+            def one_at_a_time(covenants):
+                document = processor.new_document('loan_agreement', {})
+                stored = [processor.add_covenant(document, covenant_data) for covenant_data in covenants]
+                db.session.flush()
+                processor.add_alerts(stored)
+                db.session.commit()
+
+            def bulk(covenants):
+                processor.add_records('loan_agreement', {}, covenants)
+                db.session.commit()
+
+            for size in (10, 100, 1_000):
+                covenants = covenant_rows(size)
+                # Covenants plus the alerts derived from them
+                rows = size + sum(1 for index in range(size) if index % 3)
+                single = timed(one_at_a_time, covenants)
+                batch = timed(bulk, covenants)
+                print(f"{size:>5,} covenants: one at a time {rows / single:>9,.0f} rows/s, "
+                      f"bulk {rows / batch:>9,.0f} rows/s, speedup {single / batch:.1f}x")
+            db.session.remove()
+            db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
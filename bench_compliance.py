@@ -0,0 +1,74 @@
+"""Benchmark portfolio-wide compliance evaluation against updating covenants one at a time."""
+import os
+import random
+import tempfile
+import time
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+from flask import Flask
+
+from src.data_integration.compliance import evaluate_covenants
+from src.models.database import Covenant, Document, Project, db
+
+NAMES = ['Leverage Ratio', 'Interest Coverage Ratio', 'Minimum Net Worth', 'Fixed Charge Coverage Ratio']
+
+def fill(size):
+    """A portfolio of ``size`` covenants, one document per hundred."""
+    rng = random.Random(0)
+    project = Project(name='Portfolio', user_id='bench')
+    db.session.add(project)
+    db.session.flush()
+    documents = [Document(project_id=project.id, filename=f"{index}.pdf", user_id='bench')
+                 for index in range(size // 100)]
+    db.session.add_all(documents)
+    db.session.flush()
+    for index in range(size):
+        covenant = Covenant(document_id=documents[index // 100].id, user_id='bench', name=rng.choice(NAMES),
+                            threshold_value=3.5, current_value=rng.uniform(2, 5))
+        covenant.update_compliance_status()
+        db.session.add(covenant)
+    db.session.commit()
+
+def move_values(share):
+    """New current values for a share of the portfolio, as after a metrics refresh."""
+    rng = random.Random()
+    ids = [covenant_id for (covenant_id,) in db.session.query(Covenant.id)]
+    for covenant_id in rng.sample(ids, int(len(ids) * share)):
+        Covenant.query.filter_by(id=covenant_id).update({'current_value': rng.uniform(2, 5)})
+    db.session.commit()
+
+def one_at_a_time():
+    for covenant in Covenant.query.all():
+        covenant.update_compliance_status()
+    db.session.commit()
+    db.session.expunge_all()
+
+def batch():
+    evaluate_covenants()
+    db.session.commit()
+
+def main():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            size = 100_000
+            fill(size)
+            for share in (0.0, 0.01, 0.1):
+                timings = []
+                for evaluate in (one_at_a_time, batch):
+                    move_values(share)
+                    start = time.perf_counter()
+                    evaluate()
+                    timings.append(time.perf_counter() - start)
+                single, vectorized = timings
+                print(f"{size:,} covenants, {share:>4.0%} values moved: one at a time {single:.2f} s, "
+                      f"batch {vectorized:.2f} s, speedup {single / vectorized:.0f}x")
+            db.session.remove()
+            db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark date extraction against the previous three-pass implementation."""
+import random
+import re
+import time
+
+from src.document_processor.dates import extract_dates
+
+LEGACY_PATTERNS = {
+    'review_date': r'(?:review|reporting|compliance)\s*date.*?(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
+    'effective_date': r'(?:effective|closing)\s*date.*?(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
+    'termination_date': r'(?:termination|maturity)\s*date.*?(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})'
+}
+
+def legacy_extract_dates(text):
+    """Previous implementation: one unbounded finditer pass per date type."""
+    dates = []
+    for date_type, pattern in LEGACY_PATTERNS.items():
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            dates.append({'type': date_type, 'date': match.group(1), 'context': match.group(0)})
+    return dates
+
+def agreement_text(size):
+    """Synthetic agreement text with dates sprinkled through it."""
+    rng = random.Random(0)
+    words = ("the borrower shall maintain leverage ratio lenders agent date of this agreement "
+             "review period closing conditions maturity of loans effective upon").split()
+    lines, total = [], 0
+    while total < size:
+        line = " ".join(rng.choice(words) for _ in range(rng.randint(5, 25)))
+        roll = rng.random()
+        if roll < 0.02:
+            line += " Effective Date: 10/28/2024"
+        elif roll < 0.03:
+            line += " the Maturity Date shall be 12/31/2029 and"
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines)[:size]
+
+def timed(func, text, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, len(result)
+
+def main():
+    text = agreement_text(1024 * 1024)
+    legacy, legacy_count = timed(legacy_extract_dates, text)
+    current, current_count = timed(extract_dates, text)
+    print(f"1 MB agreement text: legacy {legacy * 1000:.1f} ms ({legacy_count} dates), "
+          f"single pass {current * 1000:.1f} ms ({current_count} dates), "
+          f"speedup {legacy / current:.1f}x")
+
+    # Keywords without a following date on one long line make the legacy
+    # lazy .*? rescan the rest of the line for every keyword
+    long_line = "the review date shall be determined by the agent " * 2000
+    legacy, _ = timed(legacy_extract_dates, long_line, repeat=1)
+    current, _ = timed(extract_dates, long_line, repeat=1)
+    print(f"{len(long_line) // 1024} KB line without dates: legacy {legacy * 1000:.1f} ms, "
+          f"single pass {current * 1000:.1f} ms, speedup {legacy / current:.0f}x")
+
+if __name__ == '__main__':
+    main()
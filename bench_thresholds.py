@@ -0,0 +1,53 @@
+"""Benchmark batch threshold parsing against parsing one value at a time."""
+import random
+import time
+
+from src.document_processor.thresholds import SCALES, THRESHOLD_PATTERN, parse_thresholds
+
+FORMATS = [
+    "{ratio:.2f}:1.00", "{ratio:.2f}x", "{ratio:.2f} to 1.00", "USD {amount:,}", "${millions} million",
+    "EUR {millions}mm", "{percent:.1f}%", "{amount}", "not specified",
+]
+
+def threshold_column(size, distinct):
+    """Threshold strings drawn from ``distinct`` values, as in historical extractions."""
+    rng = random.Random(0)
+    pool = []
+    for _ in range(distinct):
+        pool.append(rng.choice(FORMATS).format(
+            ratio=rng.uniform(1, 6), amount=rng.randint(1, 500) * 100000,
+            millions=rng.randint(1, 500), percent=rng.uniform(0, 100)))
+    return [rng.choice(pool) for _ in range(size)]
+
+def timed(func, column, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(column)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def parse_one(value):
+    """Plain-Python parse of one value with the same pattern."""
+    match = THRESHOLD_PATTERN.search(value)
+    if match is None:
+        return float('nan')
+    number = float(match.group('number').replace(',', ''))
+    if match.group('denominator'):
+        return number / float(match.group('denominator'))
+    number *= SCALES.get((match.group('scale') or '').lower(), 1.0)
+    return number / 100 if match.group('percent') else number
+
+def one_at_a_time(column):
+    return [parse_one(value) for value in column]
+
+def main():
+    for size, distinct in ((100_000, 2_000), (100_000, 100_000), (1_000_000, 20_000)):
+        column = threshold_column(size, distinct)
+        single = timed(one_at_a_time, column)
+        batch = timed(parse_thresholds, column)
+        print(f"{size:>9,} values, {distinct:>7,} distinct: one at a time {single:.3f} s, "
+              f"batch {batch:.3f} s, {size / batch:,.0f} values/s, speedup {single / batch:.0f}x")
+
+if __name__ == '__main__':
+    main()
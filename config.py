@@ -32,6 +32,19 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = 'uploads'
     
+    # Background document processing. With workers configured, uploads are
+    # queued and processed by worker.py; otherwise inside the request.
+    # Serverless deploys cannot keep threads running, so they always use 0.
+    VERCEL = bool(os.environ.get('VERCEL'))
+    PROCESSING_WORKERS = 0 if VERCEL else int(os.environ.get('PROCESSING_WORKERS', 0))
+    JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH',
+                                    '/tmp/jobs.db' if VERCEL else os.path.join('instance', 'jobs.db'))
+    
+    # Auth0 user IDs (the session's 'sub') allowed to read the LLM metrics,
+    # which span every tenant's documents; comma-separated, none by default
+    METRICS_ADMIN_USERS = [user.strip() for user in os.environ.get('METRICS_ADMIN_USERS', '').split(',')
+                           if user.strip()]
+    
     # Cloudinary config
     CLOUDINARY_CLOUD_NAME = os.environ.get('CLOUDINARY_CLOUD_NAME')
     CLOUDINARY_API_KEY = os.environ.get('CLOUDINARY_API_KEY')
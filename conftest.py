@@ -0,0 +1,2 @@
+"""Test session setup: keep the stores out of instance/ before any app module loads."""
+import test_support  # noqa: F401
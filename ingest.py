@@ -0,0 +1,220 @@
+"""Batch-ingest a directory of loan documents."""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Tuple
+
+from flask import Flask
+
+from config import Config
+from src.document_processor.extraction_cache import file_sha256
+from src.document_processor.processor import USE_MOCK_PARSER, DocumentProcessor
+from src.llm.metrics import LatencyStats
+from src.models.database import Document, Project, db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = os.path.join('instance', 'ingest_checkpoint.jsonl')
+DOCUMENT_EXTENSIONS = ('.pdf',)
+
+def find_documents(directory: str, extensions: Tuple[str, ...] = DOCUMENT_EXTENSIONS) -> List[str]:
+    """Paths of the documents under ``directory``, in a stable order."""
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(extensions):
+                paths.append(os.path.join(root, name))
+    return paths
+
+class Checkpoint:
+    """Append-only record of the documents already ingested.
+
+    Entries are written once their batch has committed, so an interrupted
+    run resumes after the last committed batch. Documents are keyed by
+    project and content hash, so a renamed or copied file is not ingested
+    twice into a project, while the same directory can still be ingested
+    into another project. Entries without a project, from older runs, are
+    ignored; the project's stored content hashes still skip those files.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        self._torn = False
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    self._torn = not line.endswith("\n")
+                    try:
+                        entry = json.loads(line)
+                        self.done.add((entry['project_id'], entry['sha256']))
+                    except (ValueError, KeyError):
+                        continue  # Torn last line from an interrupted write
+
+    def __contains__(self, key: Tuple[int, str]) -> bool:
+        """Whether ``(project_id, sha256)`` was ingested."""
+        return key in self.done
+
+    def record(self, entries: List[Dict[str, Any]]):
+        """Durably append entries for a committed batch."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a') as f:
+            if self._torn:
+                f.write("\n")
+                self._torn = False
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update((entry['project_id'], entry['sha256']) for entry in entries)
+
+def parse_document(path: str, use_mock: bool) -> Dict[str, Any]:
+    """Extract one document in a pool process; no database access happens here."""
+    start = time.perf_counter()
+    try:
+        processor = DocumentProcessor(path, None, use_mock=use_mock)
+        document_type, metadata, covenants = processor.extract()
+        error = None
+    except Exception as e:
+        document_type, metadata, covenants, error = None, {}, [], str(e)
+    timings = metadata.pop('timings', None) or {}
+    timings['parse'] = time.perf_counter() - start
+    return {
+        'path': path,
+        'document_type': document_type,
+        'metadata': metadata,
+        'covenants': covenants,
+        'timings': timings,
+        'error': error,
+    }
+
+def write_batch(results: List[Dict[str, Any]], project_id: int, user_id: str, use_mock: bool):
+    """Store a batch of parsed documents in one transaction."""
+    try:
+        for result in results:
+            processor = DocumentProcessor(result['path'], user_id, project_id, use_mock=use_mock)
+            processor.file_url = 'file://' + os.path.abspath(result['path'])
+            processor.content_hash = result['sha256']
+            processor.add_records(result['document_type'], result['metadata'], result['covenants'])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+def ingest(directory: str, project_id: int, user_id: str = 'batch-ingest', workers: int = 4,
+           batch_size: int = 20, checkpoint_path: str = DEFAULT_CHECKPOINT,
+           use_mock: bool = USE_MOCK_PARSER) -> Dict[str, Any]:
+    """Ingest every document under ``directory`` not yet in the checkpoint or the project.
+
+    Documents are parsed in a process pool and written from this process
+    in batches of ``batch_size``, one transaction per batch. Must be called
+    inside an application context. Returns counts, throughput and
+    per-stage timings.
+    """
+    checkpoint = Checkpoint(checkpoint_path)
+    stored_hashes = {content_hash for (content_hash,) in db.session.query(Document.content_hash)
+                     .filter(Document.project_id == project_id, Document.content_hash.isnot(None))}
+    pending = {}
+    skipped = 0
+    for path in find_documents(directory):
+        sha256 = file_sha256(path)
+        if (project_id, sha256) in checkpoint or sha256 in pending or sha256 in stored_hashes:
+            skipped += 1
+        else:
+            pending[sha256] = path
+
+    stats = LatencyStats()
+    stored = failed = 0
+    batch = []
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal stored, failed
+        batch_start = time.perf_counter()
+        try:
+            write_batch(batch, project_id, user_id, use_mock)
+        except Exception as e:
+            logger.error(f"Error storing batch of {len(batch)} documents: {str(e)}", exc_info=True)
+            failed += len(batch)
+            return
+        per_document = (time.perf_counter() - batch_start) / len(batch)
+        for result in batch:
+            stats.record('store', per_document)
+        checkpoint.record([{'project_id': project_id, 'sha256': result['sha256'], 'path': result['path'],
+                            'covenants': len(result['covenants'])} for result in batch])
+        stored += len(batch)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(parse_document, path, use_mock): sha256 for sha256, path in pending.items()}
+        for future in as_completed(futures):
+            result = future.result()
+            for stage, seconds in result['timings'].items():
+                stats.record(stage, seconds)
+            if result['error']:
+                logger.error(f"Error parsing {result['path']}: {result['error']}")
+                failed += 1
+                continue
+            result['sha256'] = futures[future]
+            batch.append(result)
+            if len(batch) >= batch_size:
+                flush()
+                batch = []
+        if batch:
+            flush()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'documents': len(pending),
+        'stored': stored,
+        'failed': failed,
+        'skipped': skipped,
+        'elapsed_s': elapsed,
+        'docs_per_sec': stored / elapsed if elapsed else 0.0,
+        'stages': stats.summary(),
+    }
+
+def print_summary(summary: Dict[str, Any]):
+    """Print throughput and per-stage latency percentiles."""
+    print(f"Stored {summary['stored']} of {summary['documents']} documents "
+          f"({summary['failed']} failed, {summary['skipped']} already ingested) "
+          f"in {summary['elapsed_s']:.1f}s: {summary['docs_per_sec']:.2f} docs/sec")
+    print(f"{'stage':<10}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'max ms':>12}")
+    for stage, values in summary['stages'].items():
+        print(f"{stage:<10}{values['count']:>8}{values['p50_ms']:>12.1f}{values['p95_ms']:>12.1f}{values['max_ms']:>12.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('directory', help="Directory to walk for documents")
+    parser.add_argument('--project-id', type=int, required=True, help="Project to add the documents to")
+    parser.add_argument('--user-id', default='batch-ingest', help="Owner recorded on stored rows")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Parser processes")
+    parser.add_argument('--batch-size', type=int, default=20, help="Documents per database transaction")
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT, help="Checkpoint file to resume from")
+    parser.add_argument('--mock', dest='use_mock', action='store_true', default=USE_MOCK_PARSER,
+                        help="Use the mock parser")
+    parser.add_argument('--no-mock', dest='use_mock', action='store_false', help="Use the OpenAI parser")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        if db.session.get(Project, args.project_id) is None:
+            print(f"Project {args.project_id} does not exist", file=sys.stderr)
+            return 1
+        summary = ingest(args.directory, args.project_id, user_id=args.user_id, workers=args.workers,
+                         batch_size=args.batch_size, checkpoint_path=args.checkpoint, use_mock=args.use_mock)
+    print_summary(summary)
+    return 1 if summary['failed'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
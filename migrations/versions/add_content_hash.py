@@ -0,0 +1,26 @@
+"""Add a content fingerprint to documents, unique per project
+
+Revision ID: add_content_hash
+Revises: nullable_file_url
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_content_hash'
+down_revision = 'nullable_file_url'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # SHA-256 of the uploaded file; documents stored before this have none
+    with op.batch_alter_table('document') as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index('uq_document_project_content_hash', ['project_id', 'content_hash'], unique=True)
+
+def downgrade():
+    with op.batch_alter_table('document') as batch_op:
+        batch_op.drop_index('uq_document_project_content_hash')
+        batch_op.drop_column('content_hash')
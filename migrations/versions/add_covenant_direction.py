@@ -0,0 +1,35 @@
+"""Store each covenant's direction and warning band
+
+Revision ID: add_covenant_direction
+Revises: json_columns
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_covenant_direction'
+down_revision = 'json_columns'
+branch_labels = None
+depends_on = None
+
+# Name fragments of covenants whose threshold is a floor, as in the model
+FLOOR_TERMS = ('minimum', 'coverage', 'liquidity', 'current ratio', 'working capital', 'net worth')
+
+def upgrade():
+    with op.batch_alter_table('covenant') as batch_op:
+        batch_op.add_column(sa.Column('direction', sa.String(length=3), nullable=True))
+        batch_op.add_column(sa.Column('warning_band', sa.Float(), nullable=True))
+    # Same rule as covenant_direction, for covenants extracted before directions were stored
+    floors = " OR ".join(f"lower(name) LIKE '%{term}%'" for term in FLOOR_TERMS)
+    op.execute(f"""
+        UPDATE covenant
+        SET direction = CASE WHEN {floors} THEN 'min' ELSE 'max' END,
+            warning_band = 0.1
+    """)
+
+def downgrade():
+    with op.batch_alter_table('covenant') as batch_op:
+        batch_op.drop_column('warning_band')
+        batch_op.drop_column('direction')
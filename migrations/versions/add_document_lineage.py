@@ -0,0 +1,28 @@
+"""Link amendments to the document they amend
+
+Revision ID: add_document_lineage
+Revises: add_file_url
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_document_lineage'
+down_revision = 'add_file_url'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Add parent_document_id column to document table
+    with op.batch_alter_table('document') as batch_op:
+        batch_op.add_column(sa.Column('parent_document_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_document_parent_document_id', 'document',
+                                    ['parent_document_id'], ['id'])
+
+def downgrade():
+    # Remove parent_document_id column from document table
+    with op.batch_alter_table('document') as batch_op:
+        batch_op.drop_constraint('fk_document_parent_document_id', type_='foreignkey')
+        batch_op.drop_column('parent_document_id')
@@ -0,0 +1,39 @@
+"""Keep document and covenant counters on projects and documents
+
+Revision ID: add_project_counters
+Revises: add_covenant_direction
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from src.models.counters import COVENANT_COUNTERS, counter_triggers, drop_counter_triggers, recount_statements
+
+# revision identifiers, used by Alembic.
+revision = 'add_project_counters'
+down_revision = 'add_covenant_direction'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('project') as batch_op:
+        for counter in ['document_count'] + COVENANT_COUNTERS:
+            batch_op.add_column(sa.Column(counter, sa.Integer(), nullable=False, server_default='0'))
+    with op.batch_alter_table('document') as batch_op:
+        for counter in COVENANT_COUNTERS:
+            batch_op.add_column(sa.Column(counter, sa.Integer(), nullable=False, server_default='0'))
+    for statement in recount_statements():
+        op.execute(statement)
+    for statement in counter_triggers(op.get_bind().dialect.name):
+        op.execute(statement)
+
+def downgrade():
+    for statement in drop_counter_triggers(op.get_bind().dialect.name):
+        op.execute(statement)
+    with op.batch_alter_table('document') as batch_op:
+        for counter in COVENANT_COUNTERS:
+            batch_op.drop_column(counter)
+    with op.batch_alter_table('project') as batch_op:
+        for counter in ['document_count'] + COVENANT_COUNTERS:
+            batch_op.drop_column(counter)
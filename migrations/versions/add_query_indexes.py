@@ -0,0 +1,31 @@
+"""Index the columns the project, document and alert views filter on
+
+Revision ID: add_query_indexes
+Revises: add_content_hash
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_query_indexes'
+down_revision = 'add_content_hash'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Documents by project are served by uq_document_project_content_hash
+    op.create_index('ix_project_user_id', 'project', ['user_id'])
+    op.create_index('ix_covenant_document_status', 'covenant', ['document_id', 'compliance_status'])
+    op.create_index('ix_covenant_status', 'covenant', ['compliance_status'])
+    op.create_index('ix_alert_user_status_created', 'alert', ['user_id', 'status', 'created_at', 'alert_type'])
+    op.create_index('ix_alert_user_created', 'alert', ['user_id', 'created_at', 'alert_type'])
+    op.create_index('ix_alert_covenant_status', 'alert', ['covenant_id', 'status'])
+
+def downgrade():
+    op.drop_index('ix_alert_covenant_status', table_name='alert')
+    op.drop_index('ix_alert_user_created', table_name='alert')
+    op.drop_index('ix_alert_user_status_created', table_name='alert')
+    op.drop_index('ix_covenant_status', table_name='covenant')
+    op.drop_index('ix_covenant_document_status', table_name='covenant')
+    op.drop_index('ix_project_user_id', table_name='project')
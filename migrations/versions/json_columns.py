@@ -0,0 +1,51 @@
+"""Store document, covenant and alert metadata as JSON with indexed paths
+
+Revision ID: json_columns
+Revises: add_query_indexes
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'json_columns'
+down_revision = 'add_query_indexes'
+branch_labels = None
+depends_on = None
+
+COLUMNS = [('document', 'doc_metadata'), ('covenant', 'covenant_metadata'), ('alert', 'details')]
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    # Existing values are json.dumps output, so they convert as they are
+    for table, column in COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            if postgres:
+                batch_op.alter_column(column, type_=postgresql.JSONB(), existing_type=sa.Text(),
+                                      postgresql_using=f'{column}::jsonb')
+            else:
+                batch_op.alter_column(column, type_=sa.JSON(), existing_type=sa.Text())
+
+    # Expressions must match what the models render for queries to use them
+    if postgres:
+        op.execute("CREATE INDEX ix_document_parties ON document "
+                   "USING gin ((doc_metadata #> '{parties}') jsonb_path_ops)")
+        op.execute("CREATE INDEX ix_alert_user_severity ON alert (user_id, (details #>> '{analysis,severity}'))")
+    else:
+        op.execute("CREATE INDEX ix_alert_user_severity ON alert "
+                   "(user_id, json_extract(details, '$.analysis.severity'))")
+
+def downgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    op.drop_index('ix_alert_user_severity', table_name='alert')
+    if postgres:
+        op.drop_index('ix_document_parties', table_name='document')
+    for table, column in COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            if postgres:
+                batch_op.alter_column(column, type_=sa.Text(), existing_type=postgresql.JSONB(),
+                                      postgresql_using=f'{column}::text')
+            else:
+                batch_op.alter_column(column, type_=sa.Text(), existing_type=sa.JSON())
@@ -0,0 +1,24 @@
+"""Allow documents without a file URL while their upload is in progress
+
+Revision ID: nullable_file_url
+Revises: add_document_lineage
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'nullable_file_url'
+down_revision = 'add_document_lineage'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # The file URL is attached when the remote upload finishes
+    with op.batch_alter_table('document') as batch_op:
+        batch_op.alter_column('file_url', existing_type=sa.String(length=500), nullable=True)
+
+def downgrade():
+    with op.batch_alter_table('document') as batch_op:
+        batch_op.alter_column('file_url', existing_type=sa.String(length=500), nullable=False)
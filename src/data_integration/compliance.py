@@ -0,0 +1,74 @@
+"""Vectorized compliance evaluation of stored covenants."""
+import logging
+from datetime import datetime
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import select, update
+
+from src.document_processor.schedules import ScheduleIndex
+from src.models.database import DEFAULT_WARNING_BAND, Covenant, covenant_direction, db, json_path
+
+logger = logging.getLogger(__name__)
+
+# Status codes of evaluate_statuses, indexing this array
+STATUSES = np.array(['unknown', 'compliant', 'warning', 'breach'], dtype=object)
+
+def evaluate_statuses(current: np.ndarray, threshold: np.ndarray, floor: np.ndarray,
+                      band: np.ndarray) -> np.ndarray:
+    """Status codes of many covenants, same rules as ``compliance_status``.
+
+    ``floor`` is True where the value must stay at or above the threshold;
+    missing values are NaN and evaluate to 'unknown'.
+    """
+    with np.errstate(invalid='ignore'):
+        past = np.where(floor, threshold - current, current - threshold)
+        codes = np.where(past <= 0, 1, np.where(past <= np.abs(threshold) * band, 2, 3))
+    codes[np.isnan(current) | np.isnan(threshold)] = 0
+    return codes
+
+def evaluate_covenants(covenant_ids: Optional[Iterable[int]] = None, on_date=None) -> int:
+    """Re-evaluate stored covenants and write back those whose status or threshold changed.
+
+    Thresholds follow their step-down schedules on ``on_date`` (today by
+    default). All covenants are evaluated unless ``covenant_ids`` is given.
+    Changed rows are written with one bulk UPDATE in the current
+    transaction, which the caller commits. Returns the number of rows
+    updated.
+    """
+    query = select(Covenant.id, Covenant.name, Covenant.current_value, Covenant.threshold_value,
+                   Covenant.direction, Covenant.warning_band, Covenant.compliance_status,
+                   json_path(Covenant.covenant_metadata, 'threshold_schedule'))
+    if covenant_ids is not None:
+        query = query.where(Covenant.id.in_(list(covenant_ids)))
+    rows = db.session.execute(query).all()
+    if not rows:
+        return 0
+    ids, names, current, stored, directions, bands, statuses, schedules = zip(*rows)
+
+    current = np.array(current, dtype=float)
+    stored = np.array(stored, dtype=float)
+    threshold = stored.copy()
+    scheduled = [position for position, schedule in enumerate(schedules) if schedule]
+    if scheduled:
+        index = ScheduleIndex([schedules[position] for position in scheduled])
+        threshold[scheduled] = index.lookup(on_date)
+    floor = np.array([(direction or covenant_direction(name)) == 'min'
+                      for name, direction in zip(names, directions)])
+    band = np.array([DEFAULT_WARNING_BAND if value is None else value for value in bands], dtype=float)
+    new_statuses = STATUSES[evaluate_statuses(current, threshold, floor, band)]
+
+    threshold_changed = (threshold != stored) & ~(np.isnan(threshold) & np.isnan(stored))
+    changed = np.flatnonzero((new_statuses != np.array(statuses, dtype=object)) | threshold_changed)
+    if len(changed) == 0:
+        return 0
+
+    now = datetime.utcnow()
+    db.session.execute(update(Covenant), [{
+        'id': ids[position],
+        'compliance_status': new_statuses[position],
+        'threshold_value': None if np.isnan(threshold[position]) else float(threshold[position]),
+        'last_checked': now,
+    } for position in changed.tolist()])
+    logger.info(f"Compliance changed for {len(changed)} of {len(ids)} covenants")
+    return len(changed)
@@ -4,6 +4,9 @@ import pandas as pd
 from datetime import datetime, timedelta
 import logging
 from src.models.database import Covenant, Alert, db
+from src.llm.cache import cached_completion
+from src.llm.metrics import llm_scope
+from src.data_integration.compliance import evaluate_covenants
 import openai
 import json
 import os
@@ -91,16 +94,19 @@ class DatabaseConnector:
         """
         
         try:
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
+            content, _ = cached_completion(
+                openai.chat.completions.create,
+                self.model,
+                [
                     {"role": "system", "content": "You are a financial analyst who understands covenant calculations."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1
+                temperature=0.1,
+                validate=json.loads,
+                stage='metric_calculation'
             )
             
-            return json.loads(response.choices[0].message.content)
+            return json.loads(content)
         except Exception as e:
             logger.error(f"Error in GPT analysis: {str(e)}")
             return None
@@ -109,6 +115,15 @@ class DataIntegrator:
     def __init__(self, client_db_path: str):
         self.client_connector = DatabaseConnector(client_db_path)
     
+    def refresh_thresholds(self, covenants: List[Covenant], on_date=None):
+        """Apply step-downs that have taken effect, re-checking affected covenants."""
+        changed = evaluate_covenants([covenant.id for covenant in covenants], on_date)
+        if changed:
+            # The bulk update bypasses the loaded objects
+            for covenant in covenants:
+                db.session.expire(covenant, ['compliance_status', 'threshold_value', 'last_checked'])
+        return changed
+
     def update_covenant_values(self, covenants: List[Covenant]):
         """Update covenant values based on latest financial metrics"""
         for covenant in covenants:
@@ -132,7 +147,6 @@ class DataIntegrator:
                     # Update covenant
                     covenant.current_value = new_value
                     covenant.last_updated = datetime.utcnow()
-                    covenant.update_compliance_status()
                     
                     # Log the update
                     logger.info(f"Updated covenant {covenant.id}: {new_value}")
@@ -141,8 +155,10 @@ class DataIntegrator:
                 logger.error(f"Error updating covenant {covenant.id}: {str(e)}")
                 continue
         
-        # Commit all updates
+        # Commit all updates, re-checking compliance in one pass
         try:
+            db.session.flush()
+            self.refresh_thresholds(covenants)
             db.session.commit()
         except Exception as e:
             logger.error(f"Error committing updates: {str(e)}")
@@ -209,9 +225,11 @@ def setup_data_integration(app):
     integrator = DataIntegrator('path_to_client_db.sqlite')
     
     def update_covenant_data():
-        with app.app_context():
+        run_id = f"covenant-update-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}"
+        with app.app_context(), llm_scope(run=run_id) as usage:
             covenants = Covenant.query.all()
             integrator.update_covenant_values(covenants)
+        logger.info(json.dumps({'event': 'llm_run_usage', 'run': run_id, **usage.as_dict()}))
     
     # Schedule periodic updates
     from apscheduler.schedulers.background import BackgroundScheduler
@@ -0,0 +1,92 @@
+"""Section-level diffs between an agreement and its amendment."""
+import hashlib
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from src.document_processor.sections import split_sections
+
+# Above this share of changed text an amendment is re-extracted in full
+MAX_CHANGED_FRACTION = float(os.getenv('AMENDMENT_MAX_CHANGED_FRACTION', 0.6))
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\s+', ' ', text).strip().lower()
+
+def section_fingerprints(text: str) -> List[Dict[str, Any]]:
+    """Heading, span and whitespace-insensitive hash of every section."""
+    fingerprints = []
+    for section in split_sections(text):
+        body = text[section['start']:section['end']]
+        fingerprints.append({
+            'heading': section['heading'],
+            'start': section['start'],
+            'end': section['end'],
+            'hash': hashlib.sha256(_normalize(body).encode('utf-8')).hexdigest()[:16],
+        })
+    return fingerprints
+
+def diff_sections(previous: List[Dict[str, Any]], text: str) -> Dict[str, Any]:
+    """Compare the sections of ``text`` with a predecessor's fingerprints.
+
+    A section is unchanged when a section with the same hash exists in the
+    predecessor, wherever it sits, so renumbering or reordering clauses
+    does not force re-extraction.
+    """
+    sections = section_fingerprints(text)
+    previous_hashes = {section['hash'] for section in previous}
+    current_hashes = {section['hash'] for section in sections}
+    changed = [section for section in sections if section['hash'] not in previous_hashes]
+    changed_chars = sum(section['end'] - section['start'] for section in changed)
+    return {
+        'sections': sections,
+        'changed': changed,
+        'unchanged_hashes': previous_hashes & current_hashes,
+        'removed_hashes': previous_hashes - current_hashes,
+        'changed_fraction': changed_chars / len(text) if text else 0.0,
+    }
+
+def find_section(covenant: Dict[str, Any], text: str, sections: List[Dict[str, Any]]) -> Optional[str]:
+    """Hash of the section a covenant was extracted from, if it can be found.
+
+    The covenant's description is looked up first; GPT often paraphrases,
+    so failing that a section whose heading names the covenant type is used.
+    Sections merely mentioning the type, such as the definitions, are not
+    guessed at: the covenant is left unattributed.
+    """
+    description = _normalize(covenant.get('description') or '')[:80]
+    if len(description) >= 20:
+        for section in sections:
+            if description in _normalize(text[section['start']:section['end']]):
+                return section['hash']
+    phrase = (covenant.get('type') or '').replace('_', ' ').lower()
+    if phrase:
+        for section in sections:
+            if phrase in _normalize(section['heading']):
+                return section['hash']
+    return None
+
+def attribute_sections(covenants: List[Dict[str, Any]], text: str,
+                       sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Record on each covenant the hash of its source section."""
+    for covenant in covenants:
+        covenant['section_hash'] = find_section(covenant, text, sections)
+    return covenants
+
+def carry_forward(previous_covenants: List[Dict[str, Any]], diff: Dict[str, Any],
+                  extracted: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merge re-extracted covenants with those of unchanged sections.
+
+    A predecessor covenant is carried forward when its section is unchanged
+    (or could not be identified) and no re-extracted covenant of the same
+    type replaces it.
+    """
+    extracted_types = {(covenant.get('type') or '').lower() for covenant in extracted}
+    carried = []
+    for covenant in previous_covenants:
+        section_hash = covenant.get('section_hash')
+        if section_hash is not None and section_hash not in diff['unchanged_hashes']:
+            continue
+        if (covenant.get('type') or '').lower() in extracted_types:
+            continue
+        carried.append({**covenant, 'carried_forward': True})
+    return carried + extracted
@@ -0,0 +1,167 @@
+"""Asyncio document parser for batch ingest."""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from src.document_processor.parser import DocumentParser, merge_covenants, split_into_windows
+from src.llm.cache import cache_key, get_llm_cache, is_valid
+from src.llm.limiter import AsyncLLMLimiter, estimate_tokens, get_async_limiter
+from src.llm.metrics import get_llm_metrics, llm_scope
+
+logger = logging.getLogger(__name__)
+
+class AsyncDocumentParser(DocumentParser):
+    """DocumentParser whose LLM calls go through the async OpenAI client.
+
+    All calls share one AsyncLLMLimiter, so many documents can be processed
+    at once without exceeding the concurrency and token-per-minute limits.
+    The covenant, document type and parties requests for a document are
+    issued together.
+    """
+
+    def __init__(self, file_path: str, limiter: Optional[AsyncLLMLimiter] = None, **kwargs):
+        super().__init__(file_path, **kwargs)
+        self.async_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.limiter = limiter or get_async_limiter()
+
+    async def _chat_async(self, messages: List[Dict[str, str]], stage: str,
+                          validate: Optional[Callable[[str], Any]] = None) -> str:
+        """Send one chat completion request under the shared limiter."""
+        cache = get_llm_cache()
+        key = cache_key(self.model, messages, 0.1)
+        start = time.perf_counter()
+        content = await asyncio.to_thread(cache.get, key)
+        if content is not None:
+            get_llm_metrics().record(self.model, stage, time.perf_counter() - start, cache_hit=True)
+            return content
+
+        async with self.limiter.slot(estimate_tokens(messages)) as reservation:
+            start = time.perf_counter()
+            try:
+                response = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.1
+                )
+            finally:
+                self.limiter.latency.record(stage, time.perf_counter() - start)
+            usage = getattr(response, 'usage', None)
+            reservation.record_usage(usage.total_tokens if usage else None)
+            get_llm_metrics().record(self.model, stage, time.perf_counter() - start,
+                                     prompt_tokens=getattr(usage, 'prompt_tokens', None),
+                                     completion_tokens=getattr(usage, 'completion_tokens', None))
+        content = response.choices[0].message.content
+        if is_valid(content, validate):
+            await asyncio.to_thread(cache.put, key, self.model, content)
+        return content
+
+    async def process_document_async(self) -> Dict[str, Any]:
+        """Async counterpart of process_document."""
+        document_hash, cached = await asyncio.to_thread(self.cached_result)
+        if cached is not None:
+            return cached
+
+        self.llm_errors = 0
+        with llm_scope(document=os.path.basename(self.file_path)) as usage:
+            text = await asyncio.to_thread(self.extract_text)
+            covenants, document_type, parties = await self.analyze_document_async(text)
+
+        result = self.build_result(text, covenants, document_type, parties)
+        result['metadata']['llm_usage'] = usage.as_dict()
+        await asyncio.to_thread(self.store_result, document_hash, result)
+        return result
+
+    async def analyze_document_async(self, text: str) -> Tuple[List[Dict[str, Any]], str, List[str]]:
+        """Get covenants, document type and parties with concurrent calls."""
+        if self.analysis_mode == 'combined' and not (self.chunked and len(text) > self.chunk_size):
+            combined = await self.analyze_combined_async(text)
+            if combined is not None:
+                return combined
+            logger.warning("Combined analysis failed, falling back to concurrent calls")
+
+        covenants, document_type, parties = await asyncio.gather(
+            self.analyze_with_gpt_async(text),
+            self.identify_document_type_async(text),
+            self.extract_parties_async(text),
+        )
+        return covenants, document_type, parties
+
+    async def analyze_with_gpt_async(self, text: str) -> List[Dict[str, Any]]:
+        """Async counterpart of analyze_with_gpt."""
+        rule_covenants, text = self.apply_rules(self.covenant_text(text))
+        if not text.strip():
+            return rule_covenants
+        if self.chunked and len(text) > self.chunk_size:
+            windows = split_into_windows(text, self.chunk_size, self.chunk_overlap)
+            results = await asyncio.gather(*(self.analyze_window_async(window) for window in windows))
+            covenants = merge_covenants(results)
+        else:
+            covenants = await self.analyze_window_async(text[:self.chunk_size])
+        return merge_covenants([rule_covenants, covenants]) if rule_covenants else covenants
+
+    async def analyze_window_async(self, text: str) -> List[Dict[str, Any]]:
+        """Async counterpart of analyze_window."""
+        try:
+            content = await self._chat_async(self.covenant_messages(text), stage='covenants', validate=json.loads)
+            return self.parse_covenant_response(content)
+        except Exception as e:
+            logger.error(f"Error in GPT analysis: {str(e)}")
+            self.llm_errors += 1
+            return []
+
+    async def analyze_combined_async(self, text: str) -> Optional[Tuple[List[Dict[str, Any]], str, List[str]]]:
+        """Async counterpart of analyze_combined."""
+        try:
+            content = await self._chat_async(self.combined_messages(text), stage='combined', validate=json.loads)
+            return self.parse_combined_response(content)
+        except Exception as e:
+            logger.error(f"Error in combined GPT analysis: {str(e)}")
+            return None
+
+    async def identify_document_type_async(self, text: str) -> str:
+        """Async counterpart of identify_document_type."""
+        try:
+            content = await self._chat_async(self.document_type_messages(text), stage='document_type')
+            return content.strip().lower()
+        except Exception:
+            self.llm_errors += 1
+            return 'unknown'
+
+    async def extract_parties_async(self, text: str) -> List[str]:
+        """Async counterpart of extract_parties."""
+        try:
+            content = await self._chat_async(self.parties_messages(text), stage='parties', validate=json.loads)
+            return json.loads(content)
+        except Exception:
+            self.llm_errors += 1
+            return []
+
+async def process_documents(file_paths: List[str], limiter: Optional[AsyncLLMLimiter] = None,
+                            **parser_kwargs) -> List[Optional[Dict[str, Any]]]:
+    """Process many documents concurrently under one shared limiter.
+
+    Results are returned in input order; a document that fails entirely
+    gets None.
+    """
+    limiter = limiter or get_async_limiter()
+
+    async def process_one(file_path):
+        try:
+            parser = AsyncDocumentParser(file_path, limiter=limiter, **parser_kwargs)
+            return await parser.process_document_async()
+        except Exception as e:
+            logger.error(f"Error processing {file_path}: {str(e)}", exc_info=True)
+            return None
+
+    results = await asyncio.gather(*(process_one(path) for path in file_paths))
+    logger.info(f"LLM latency by stage: {limiter.latency.summary()}")
+    return results
+
+def run_batch(file_paths: List[str], **parser_kwargs) -> List[Optional[Dict[str, Any]]]:
+    """Synchronous entry point for process_documents."""
+    return asyncio.run(process_documents(file_paths, **parser_kwargs))
@@ -0,0 +1,88 @@
+"""Single-pass extraction of review, effective and termination dates."""
+import os
+import re
+from datetime import date
+from typing import Dict, List, Optional
+
+# Furthest a date may follow its keyword, in characters
+MAX_DATE_DISTANCE = int(os.getenv('DATE_MAX_DISTANCE', 200))
+
+DATE_KEYWORD_TYPES = {
+    'review': 'review_date',
+    'reporting': 'review_date',
+    'compliance': 'review_date',
+    'effective': 'effective_date',
+    'closing': 'effective_date',
+    'termination': 'termination_date',
+    'maturity': 'termination_date',
+}
+
+# Keywords share a first-character class so the scan can skip ahead quickly;
+# spurious combinations are filtered out through DATE_KEYWORD_TYPES
+DATE_KEYWORD_PATTERN = re.compile(
+    r'([rcetm](?:eview|eporting|ompliance|ffective|losing|ermination|aturity))\s*date',
+    re.IGNORECASE
+)
+
+MONTHS = {name: number for number, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+
+DATE_VALUE_PATTERN = re.compile(
+    r'(\d{1,2})[-/](\d{1,2})[-/](\d{2,4})'
+    r'|((?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*)\.?\s+(\d{1,2}),?\s+(\d{4})',
+    re.IGNORECASE
+)
+
+def _expand_year(year: str) -> int:
+    value = int(year)
+    if len(year) == 2:
+        return 2000 + value if value < 70 else 1900 + value
+    return value
+
+def normalize_date(match: re.Match) -> Optional[str]:
+    """ISO 8601 form of a DATE_VALUE_PATTERN match, or None if not a real date.
+
+    Numeric dates are read month first, falling back to day first when the
+    month would be out of range.
+    """
+    try:
+        if match.group(1):
+            first, second, year = int(match.group(1)), int(match.group(2)), _expand_year(match.group(3))
+            if first > 12:
+                first, second = second, first
+            return date(year, first, second).isoformat()
+        month = MONTHS[match.group(4)[:3].lower()]
+        return date(int(match.group(6)), month, int(match.group(5))).isoformat()
+    except (KeyError, ValueError):
+        return None
+
+def extract_dates(text: str, max_distance: int = MAX_DATE_DISTANCE) -> List[Dict[str, str]]:
+    """Find dates following review, effective and termination keywords.
+
+    One scan over the text finds the keywords; for each, the first date on
+    the same line within ``max_distance`` characters is taken. This keeps
+    the work linear in the size of the text. When several keywords of the
+    same type point at one date, only the first is reported.
+    """
+    dates = []
+    seen = set()
+    for keyword in DATE_KEYWORD_PATTERN.finditer(text):
+        date_type = DATE_KEYWORD_TYPES.get(keyword.group(1).lower())
+        if date_type is None:
+            continue
+        start = keyword.end()
+        limit = start + max_distance + 20
+        line_end = text.find('\n', start, limit)
+        match = DATE_VALUE_PATTERN.search(text, start, line_end if line_end != -1 else limit)
+        if match is None or match.start() - start > max_distance:
+            continue
+        if (date_type, match.start()) in seen:
+            continue
+        seen.add((date_type, match.start()))
+        dates.append({
+            'type': date_type,
+            'date': match.group(0),
+            'iso_date': normalize_date(match),
+            'context': text[keyword.start():match.end()]
+        })
+    return dates
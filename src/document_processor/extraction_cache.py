@@ -0,0 +1,150 @@
+"""Content-addressed cache of document extraction results."""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from contextlib import closing
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv('EXTRACTION_CACHE_PATH', os.path.join('instance', 'extraction_cache.db'))
+DEFAULT_MAX_BYTES = int(os.getenv('EXTRACTION_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Hash a file without reading it into memory at once."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def prompt_fingerprint(*prompts: str) -> str:
+    """Short hash identifying a set of prompt templates."""
+    digest = hashlib.sha256()
+    for prompt in prompts:
+        digest.update(prompt.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+class ExtractionCache:
+    """SQLite-backed cache of parser results keyed by document hash.
+
+    Entries are keyed by the SHA-256 of the PDF bytes, the parser version,
+    the model name and a fingerprint of the extraction prompts. The least
+    recently used entries are evicted once the stored payloads exceed
+    ``max_bytes``.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    document_hash TEXT NOT NULL,
+                    parser_version TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (document_hash, parser_version, model, prompt_version)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_extraction_cache_last_access "
+                "ON extraction_cache (last_access)"
+            )
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the cache database."""
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def get(self, document_hash: str, parser_version: str, model: str,
+            prompt_version: str) -> Optional[Dict[str, Any]]:
+        """Return the cached result for a document, or None on a miss."""
+        key = (document_hash, parser_version, model, prompt_version)
+        try:
+            with closing(self.connect()) as conn, conn:
+                row = conn.execute("""
+                    SELECT payload FROM extraction_cache
+                    WHERE document_hash = ? AND parser_version = ? AND model = ? AND prompt_version = ?
+                """, key).fetchone()
+                if row is None:
+                    return None
+                conn.execute("""
+                    UPDATE extraction_cache SET last_access = ?
+                    WHERE document_hash = ? AND parser_version = ? AND model = ? AND prompt_version = ?
+                """, (time.time(), *key))
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            logger.error(f"Error reading extraction cache: {str(e)}")
+            return None
+
+    def put(self, document_hash: str, parser_version: str, model: str,
+            prompt_version: str, result: Dict[str, Any]):
+        """Store a parser result and evict old entries beyond the size limit."""
+        payload = json.dumps(result, default=str)
+        try:
+            with closing(self.connect()) as conn, conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO extraction_cache
+                    (document_hash, parser_version, model, prompt_version, payload, size, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, (document_hash, parser_version, model, prompt_version,
+                      payload, len(payload), time.time()))
+                self._evict(conn)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing extraction cache: {str(e)}")
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM extraction_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT rowid, size FROM extraction_cache ORDER BY last_access").fetchall()
+        stale = []
+        for rowid, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((rowid,))
+            total -= size
+        conn.executemany("DELETE FROM extraction_cache WHERE rowid = ?", stale)
+        logger.info(f"Evicted {len(stale)} extraction cache entries")
+
+    def invalidate(self, parser_version: Optional[str] = None,
+                   prompt_version: Optional[str] = None) -> int:
+        """Drop entries not matching the current parser and prompt versions.
+
+        Called with no arguments, clears the whole cache.
+        """
+        query = "DELETE FROM extraction_cache"
+        conditions, params = [], []
+        if parser_version is not None:
+            conditions.append("parser_version != ?")
+            params.append(parser_version)
+        if prompt_version is not None:
+            conditions.append("prompt_version != ?")
+            params.append(prompt_version)
+        if conditions:
+            query += " WHERE " + " OR ".join(conditions)
+        with closing(self.connect()) as conn, conn:
+            deleted = conn.execute(query, params).rowcount
+        logger.info(f"Invalidated {deleted} extraction cache entries")
+        return deleted
+
+_default_cache = None
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Return the process-wide extraction cache, or None when disabled."""
+    global _default_cache
+    if os.getenv('EXTRACTION_CACHE_DISABLED', '').lower() in ('1', 'true', 'yes'):
+        return None
+    if _default_cache is None:
+        _default_cache = ExtractionCache()
+    return _default_cache
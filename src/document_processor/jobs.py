@@ -0,0 +1,232 @@
+"""Durable queue and background workers for uploaded document processing."""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# A running job whose worker has not renewed its lease within this many
+# seconds is assumed to belong to a crashed worker and is handed out again
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', 900))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+
+# A failed job is retried after this many seconds, doubling with each attempt
+JOB_RETRY_SECONDS = float(os.getenv('JOB_RETRY_SECONDS', 30))
+
+# Seconds an idle worker waits before checking the table for work queued elsewhere
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 2))
+
+class PermanentJobError(Exception):
+    """Raised by a job handler for failures that retrying cannot fix."""
+
+class JobQueue:
+    """SQLite table of processing jobs shared by every worker on the host.
+
+    Jobs survive restarts: a job whose worker died is claimed again once
+    its lease expires, up to ``max_attempts`` times. Workers renew the
+    lease while they run, so long jobs are not handed out twice. Claims are
+    atomic, so workers in several application processes can share one queue.
+    A queued job's ``updated_at`` is the time it becomes claimable, which
+    lets retries wait out a backoff.
+    """
+
+    def __init__(self, db_path: str, lease: int = JOB_LEASE_SECONDS,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_delay: float = JOB_RETRY_SECONDS):
+        self.db_path = db_path
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.available = threading.Event()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS processing_job (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    document_id INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_processing_job_status ON processing_job (status, id)")
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the queue database."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, document_id: int, payload: Dict[str, Any]) -> int:
+        """Queue a document for processing and wake an idle worker."""
+        now = time.time()
+        with closing(self.connect()) as conn:
+            job_id = conn.execute(
+                "INSERT INTO processing_job (document_id, payload, status, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?)",
+                (document_id, json.dumps(payload), now, now)
+            ).lastrowid
+        self.available.set()
+        logger.info(f"Queued job {job_id} for document {document_id}")
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Take the oldest queued job, or one whose lease expired; None if there is none."""
+        now = time.time()
+        with closing(self.connect()) as conn:
+            row = conn.execute("""
+                UPDATE processing_job
+                SET status = 'running', attempts = attempts + 1, updated_at = ?
+                WHERE id = (
+                    SELECT id FROM processing_job
+                    WHERE (status = 'queued' AND updated_at <= ?) OR (status = 'running' AND updated_at < ?)
+                    ORDER BY id LIMIT 1
+                )
+                RETURNING id, document_id, payload, attempts
+            """, (now, now, now - self.lease)).fetchone()
+        if row is None:
+            return None
+        job_id, document_id, payload, attempts = row
+        return {'id': job_id, 'document_id': document_id, 'payload': json.loads(payload), 'attempts': attempts,
+                'max_attempts': self.max_attempts}
+
+    def heartbeat(self, job_id: int, attempts: int) -> bool:
+        """Renew the lease of a running job; False if it was handed to another worker."""
+        with closing(self.connect()) as conn:
+            return conn.execute(
+                "UPDATE processing_job SET updated_at = ? WHERE id = ? AND status = 'running' AND attempts = ?",
+                (time.time(), job_id, attempts)
+            ).rowcount == 1
+
+    def retry(self, job_id: int, attempts: int, error: str):
+        """Queue a failed job again after a backoff that doubles with each attempt."""
+        delay = self.retry_delay * 2 ** (attempts - 1)
+        with closing(self.connect()) as conn:
+            conn.execute("UPDATE processing_job SET status = 'queued', error = ?, updated_at = ? WHERE id = ?",
+                         (error, time.time() + delay, job_id))
+        logger.info(f"Job {job_id} failed on attempt {attempts}, retrying in {delay:.0f} seconds")
+
+    def complete(self, job_id: int):
+        """Mark a job done."""
+        self._finish(job_id, 'completed', None)
+
+    def fail(self, job_id: int, error: str):
+        """Mark a job failed; it is not retried."""
+        self._finish(job_id, 'failed', error)
+
+    def _finish(self, job_id: int, status: str, error: Optional[str]):
+        with closing(self.connect()) as conn:
+            conn.execute("UPDATE processing_job SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                         (status, error, time.time(), job_id))
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Status, attempts and error of a job."""
+        with closing(self.connect()) as conn:
+            row = conn.execute("SELECT document_id, status, attempts, error FROM processing_job WHERE id = ?",
+                               (job_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('document_id', 'status', 'attempts', 'error'), row))
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status."""
+        with closing(self.connect()) as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM processing_job GROUP BY status").fetchall())
+
+class JobWorkerPool:
+    """Threads that claim queued jobs and run ``handler(job)`` inside an app context.
+
+    While a handler runs, the job's lease is renewed every third of the
+    lease. A handler that raises has its job retried with a backoff until
+    ``max_attempts`` is reached; PermanentJobError fails it at once. A job
+    claimed past ``max_attempts`` is failed without running it again, since
+    it most likely crashed its worker each time.
+    """
+
+    def __init__(self, app, queue: JobQueue, handler: Callable[[Dict[str, Any]], None],
+                 workers: int = 1, poll: float = JOB_POLL_SECONDS):
+        self.app = app
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.poll = poll
+        self.threads: List[threading.Thread] = []
+        self.stopping = threading.Event()
+
+    def start(self):
+        """Start the worker threads."""
+        for index in range(self.workers):
+            thread = threading.Thread(target=self.run, name=f"processing-worker-{index}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Started {self.workers} processing workers")
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the workers once their current jobs finish."""
+        self.stopping.set()
+        self.queue.available.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def run(self):
+        """Worker loop."""
+        while not self.stopping.is_set():
+            if not self.run_once():
+                self.queue.available.wait(self.poll)
+                self.queue.available.clear()
+
+    def run_once(self) -> bool:
+        """Run the next job, if any; returns whether one was claimed."""
+        job = self.queue.claim()
+        if job is None:
+            return False
+        if job['attempts'] > self.queue.max_attempts:
+            logger.error(f"Job {job['id']} abandoned after {job['attempts'] - 1} attempts")
+            self.queue.fail(job['id'], 'Too many attempts')
+            return True
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self.renew_lease, args=(job, finished), daemon=True)
+        heartbeat.start()
+        try:
+            with self.app.app_context():
+                self.handler(job)
+            self.queue.complete(job['id'])
+        except Exception as e:
+            logger.error(f"Job {job['id']} for document {job['document_id']} failed: {str(e)}", exc_info=True)
+            if isinstance(e, PermanentJobError) or job['attempts'] >= self.queue.max_attempts:
+                self.queue.fail(job['id'], str(e))
+            else:
+                self.queue.retry(job['id'], job['attempts'], str(e))
+        finally:
+            finished.set()
+            heartbeat.join()
+        return True
+
+    def renew_lease(self, job: Dict[str, Any], finished: threading.Event):
+        """Keep renewing a job's lease until ``finished`` is set."""
+        while not finished.wait(self.queue.lease / 3):
+            if not self.queue.heartbeat(job['id'], job['attempts']):
+                logger.warning(f"Lost the lease on job {job['id']}")
+                return
+
+_default_queue = None
+_default_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue, at the app's JOB_QUEUE_PATH."""
+    global _default_queue
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = JobQueue(current_app.config['JOB_QUEUE_PATH'])
+        return _default_queue
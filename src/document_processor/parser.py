@@ -1,32 +1,61 @@
 import pdfplumber
+import io
 import json
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, Iterator, Optional, Tuple, Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from datetime import datetime
 from openai import OpenAI
 import os
 import logging
-import re
+import math
+import time
+from src.document_processor.amendments import (MAX_CHANGED_FRACTION, attribute_sections, carry_forward,
+                                                diff_sections, section_fingerprints)
+from src.document_processor.dates import extract_dates
+from src.document_processor.rules import extract_rule_covenants
+from src.document_processor.schedules import ThresholdSchedule, build_schedule
+from src.document_processor.thresholds import parse_threshold
+from src.document_processor.sections import locate_covenant_sections
+from src.document_processor.extraction_cache import file_sha256, get_extraction_cache, prompt_fingerprint
+from src.document_processor.text_store import get_text_store, page_hash
+from src.llm.cache import cache_key, cached_completion, get_llm_cache, is_valid
+from src.llm.limiter import estimate_tokens
+from src.llm.metrics import get_llm_metrics, in_current_scope, llm_scope
+from src.llm.streaming import JSONArrayStream, recover_json_array
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class DocumentParser:
-    def __init__(self, file_path: str):
-        self.file_path = file_path
-        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
-        self.model = os.getenv('OPENAI_MODEL', 'gpt-4')
-        
-    def extract_text(self) -> str:
-        """Extract text from PDF document."""
-        text = ""
-        with pdfplumber.open(self.file_path) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        return text
-    
-    def analyze_with_gpt(self, text: str) -> List[Dict[str, Any]]:
-        """Use GPT to analyze and extract covenants from text."""
-        system_prompt = """You are a financial analyst specializing in covenant analysis. Extract all financial covenants from loan documents.
+# Upper bound on the characters kept from a single document, so very large
+# facilities cannot exhaust a web worker's memory
+MAX_TEXT_CHARS = int(os.getenv('PDF_MAX_TEXT_CHARS', 2_000_000))
+
+# Pages handed to each process pool task
+PAGE_BATCH_SIZE = int(os.getenv('PDF_PAGE_BATCH_SIZE', 16))
+
+# Documents shorter than this are always extracted in-process
+MIN_PAGES_FOR_POOL = int(os.getenv('PDF_MIN_PAGES_FOR_POOL', 32))
+
+# Chunked covenant extraction: window size and overlap in characters, and
+# the number of windows analyzed concurrently
+CHUNKED_EXTRACTION = os.getenv('COVENANT_CHUNKED', '').lower() in ('1', 'true', 'yes')
+CHUNK_SIZE = int(os.getenv('COVENANT_CHUNK_SIZE', 8000))
+CHUNK_OVERLAP = int(os.getenv('COVENANT_CHUNK_OVERLAP', 800))
+CHUNK_CONCURRENCY = int(os.getenv('COVENANT_CHUNK_CONCURRENCY', 4))
+
+# Send only the sections that look like covenants to GPT
+SECTION_LOCATOR = os.getenv('COVENANT_SECTION_LOCATOR', '').lower() in ('1', 'true', 'yes')
+
+# Resolve covenants in standard forms with rules and only send the rest to GPT
+RULES_FAST_PATH = os.getenv('COVENANT_RULES_FAST_PATH', '').lower() in ('1', 'true', 'yes')
+
+# Stream covenant responses and hand over each covenant as soon as it is complete
+STREAM_COVENANTS = os.getenv('COVENANT_STREAMING', '').lower() in ('1', 'true', 'yes')
+
+# LLM prompts; any edit changes PROMPT_VERSION and so invalidates cached
+# extractions
+COVENANT_SYSTEM_PROMPT = """You are a financial analyst specializing in covenant analysis. Extract all financial covenants from loan documents.
         For each covenant, identify:
         1. Type (e.g., leverage_ratio, interest_coverage_ratio)
         2. Threshold value (can be a single value or multiple values with conditions)
@@ -41,8 +70,8 @@ class DocumentParser:
         - Percentage values
         
         Return as a JSON array with consistent structure."""
-        
-        user_prompt = f"""Analyze this loan document and extract all financial covenants.
+
+COVENANT_USER_PROMPT = """Analyze this loan document and extract all financial covenants.
         For each covenant, provide:
         1. Type: snake_case identifier
         2. Threshold: Can be:
@@ -54,36 +83,381 @@ class DocumentParser:
         5. Calculation method: How it's calculated (if specified)
 
         Document text:
-        {text[:8000]}
+        {text}
+        """
+
+DOCUMENT_TYPE_PROMPT = "What type of financial document is this? Choose from: Loan Agreement, Bond Indenture, Credit Agreement, Amendment, Other (specify)\n\nFirst few paragraphs:\n{text}"
+
+PARTIES_PROMPT = "Identify the main parties (lender, borrower, etc.) in this agreement. Return as a JSON array of strings.\n\nFirst part of document:\n{text}"
+
+COMBINED_SYSTEM_PROMPT = "You are a financial analyst specializing in covenant analysis. Identify the document type, the parties and all financial covenants in loan documents, and respond with a single JSON object."
+
+COMBINED_ANALYSIS_PROMPT = """Analyze this loan document and return a single JSON object with these keys:
+        - document_type: one of Loan Agreement, Bond Indenture, Credit Agreement, Amendment, Other (specify)
+        - parties: JSON array of the main parties (lender, borrower, etc.) as strings
+        - covenants: JSON array of all financial covenants, each with:
+          1. Type: snake_case identifier
+          2. Threshold: Can be:
+             - Single value (number)
+             - Object with 'value' and conditions
+             - Array of objects for step-down thresholds
+          3. Description: Clear explanation of the requirement
+          4. Measurement frequency: How often it's measured
+          5. Calculation method: How it's calculated (if specified)
+
+        Document text:
+        {text}
+        """
+
+# How process_document gets covenants, document type and parties:
+# 'sequential' makes three calls one after another, 'concurrent' makes the
+# same three calls in parallel and 'combined' asks for all three in one call
+ANALYSIS_MODE = os.getenv('DOCUMENT_ANALYSIS_MODE', 'sequential').lower()
+
+# Bump when extraction or normalization logic changes
+PARSER_VERSION = '5'
+
+PROMPT_VERSION = prompt_fingerprint(COVENANT_SYSTEM_PROMPT, COVENANT_USER_PROMPT,
+                                    DOCUMENT_TYPE_PROMPT, PARTIES_PROMPT,
+                                    COMBINED_SYSTEM_PROMPT, COMBINED_ANALYSIS_PROMPT)
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract text for pages [start, stop) in a worker process."""
+    texts = []
+    with pdfplumber.open(file_path, pages=list(range(start + 1, stop + 1))) as pdf:
+        for page in pdf.pages:
+            texts.append(page.extract_text() or "")
+            page.flush_cache()
+    return texts
+
+def split_into_windows(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[str]:
+    """Split text into windows of ``size`` characters overlapping by ``overlap``.
+
+    Window ends are pulled back to the last line break when one falls in
+    the overlap, so clauses are less often cut mid-sentence.
+    """
+    if overlap >= size:
+        raise ValueError("overlap must be smaller than the window size")
+    windows = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            newline = text.rfind('\n', end - overlap, end)
+            if newline > start:
+                end = newline + 1
+        windows.append(text[start:end])
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return windows
+
+def _threshold_key(value: Any) -> Any:
+    """Hashable form of a threshold for de-duplication."""
+    if isinstance(value, (int, float)):
+        return round(float(value), 6)
+    return json.dumps(value, sort_keys=True, default=str)
+
+def merge_covenants(covenant_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Merge per-window covenant lists, dropping duplicates by type and threshold.
+
+    The first occurrence in document order wins; fields it lacks are filled
+    in from later duplicates.
+    """
+    merged = {}
+    for covenants in covenant_lists:
+        for covenant in covenants:
+            key = (str(covenant.get('type', '')).strip().lower(),
+                   _threshold_key(covenant.get('threshold_value')))
+            if key not in merged:
+                merged[key] = dict(covenant)
+                continue
+            existing = merged[key]
+            for field, value in covenant.items():
+                if existing.get(field) in (None, '', [], 'not specified', 'Not specified'):
+                    existing[field] = value
+    return list(merged.values())
+
+class DocumentParser:
+    def __init__(self, file_path: str, workers: Optional[int] = None,
+                 max_chars: int = MAX_TEXT_CHARS, use_cache: bool = True,
+                 content: Optional[bytes] = None, document_hash: Optional[str] = None):
+        """``content`` holds the file's bytes when it is in memory, in which case
+        ``file_path`` only names it; ``document_hash`` is its SHA-256 if known.
         """
+        self.file_path = file_path
+        self.content = content
+        self.client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        self.model = os.getenv('OPENAI_MODEL', 'gpt-4')
+        self.workers = workers if workers is not None else int(os.getenv('PDF_WORKERS', 1))
+        self.max_chars = max_chars
+        self.cache = get_extraction_cache() if use_cache else None
+        self.text_store = get_text_store()
+        self.document_hash = document_hash
+        self.page_texts = None
+        self.llm_errors = 0
+        self.chunked = CHUNKED_EXTRACTION
+        self.chunk_size = CHUNK_SIZE
+        self.chunk_overlap = CHUNK_OVERLAP
+        self.chunk_concurrency = CHUNK_CONCURRENCY
+        self.analysis_mode = ANALYSIS_MODE
+        self.locate_sections = SECTION_LOCATOR
+        self.section_selection = None
+        self.rules_fast_path = RULES_FAST_PATH
+        self.stream = STREAM_COVENANTS
+
+    @property
+    def cache_version(self) -> str:
+        """Parser version component of the extraction cache key."""
+        version = PARSER_VERSION
+        if self.chunked:
+            version += f":chunked:{self.chunk_size}:{self.chunk_overlap}"
+        if self.analysis_mode == 'combined':
+            version += ":combined"
+        if self.locate_sections:
+            version += ":sections"
+        if self.rules_fast_path:
+            version += ":rules"
+        return version
 
+    def iter_pages(self) -> Iterator[str]:
+        """Yield the text of each page in order, releasing page objects as we go."""
+        with pdfplumber.open(self.open_source()) as pdf:
+            for page in pdf.pages:
+                yield page.extract_text() or ""
+                page.flush_cache()
+
+    def iter_pages_parallel(self, workers: int) -> Iterator[str]:
+        """Yield page text in order, extracting batches of pages across processes."""
+        # In-memory uploads are small enough to extract in-process
+        if self.content is not None:
+            yield from self.iter_pages()
+            return
+
+        with pdfplumber.open(self.file_path) as pdf:
+            page_count = len(pdf.pages)
+
+        if workers <= 1 or page_count < MIN_PAGES_FOR_POOL:
+            yield from self.iter_pages()
+            return
+
+        ranges = [(start, min(start + PAGE_BATCH_SIZE, page_count))
+                  for start in range(0, page_count, PAGE_BATCH_SIZE)]
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            # Keep at most one batch per worker in flight so finished but
+            # unconsumed batches cannot pile up in memory
+            queue = iter(ranges)
+            pending = [executor.submit(_extract_page_range, self.file_path, *page_range)
+                       for page_range in islice(queue, workers)]
+            while pending:
+                future = pending.pop(0)
+                next_range = next(queue, None)
+                if next_range:
+                    pending.append(executor.submit(_extract_page_range, self.file_path, *next_range))
+                yield from future.result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def open_source(self):
+        """What pdfplumber opens: a reader over the in-memory bytes, or the file path."""
+        return io.BytesIO(self.content) if self.content is not None else self.file_path
+
+    def extract_text(self) -> str:
+        """Extract text from PDF document."""
+        pages = self.iter_pages_parallel(self.workers) if self.workers > 1 else self.iter_pages()
+        parts = []
+        size = 0
+        try:
+            for page_text in pages:
+                if size + len(page_text) > self.max_chars:
+                    parts.append(page_text[:self.max_chars - size])
+                    logger.warning(f"Text of {self.file_path} truncated at {self.max_chars} characters")
+                    break
+                parts.append(page_text)
+                size += len(page_text)
+        finally:
+            pages.close()
+        # Kept so the text can be stored page by page
+        self.page_texts = parts
+        return "".join(parts)
+    
+    def analyze_with_gpt(self, text: str) -> List[Dict[str, Any]]:
+        """Use GPT to analyze and extract covenants from text."""
+        rule_covenants, text = self.apply_rules(self.covenant_text(text))
+        if not text.strip():
+            return rule_covenants
+        if self.chunked and len(text) > self.chunk_size:
+            covenants = self.analyze_chunked(text)
+        else:
+            covenants = self.analyze_window(text[:self.chunk_size])
+        return merge_covenants([rule_covenants, covenants]) if rule_covenants else covenants
+
+    def apply_rules(self, text: str) -> Tuple[List[Dict[str, Any]], str]:
+        """Resolve standard-form covenants with rules.
+
+        Returns the normalized rule covenants and the text still needing GPT.
+        """
+        if not self.rules_fast_path:
+            return [], text
+        result = extract_rule_covenants(text)
+        covenants = self.normalize_covenants(result['covenants'])
+        remaining = result['unresolved_text']
+        logger.info(f"Rules resolved {len(covenants)} covenants in {self.file_path}; "
+                    f"{len(remaining)} of {len(text)} characters left for GPT")
+        return covenants, remaining
+
+    def covenant_text(self, text: str) -> str:
+        """The part of the document to send for covenant extraction."""
+        if not self.locate_sections:
+            return text
+        selection = locate_covenant_sections(text)
+        self.section_selection = {key: selection[key] for key in
+                                  ('spans', 'kept_chars', 'total_chars', 'kept_fraction')}
+        logger.info(f"Kept {selection['kept_fraction']:.1%} of {self.file_path} "
+                    f"({selection['kept_chars']} of {selection['total_chars']} characters) for covenant analysis")
+        return selection['text']
+
+    def analyze_chunked(self, text: str) -> List[Dict[str, Any]]:
+        """Extract covenants from every window of the document and merge them."""
+        windows = split_into_windows(text, self.chunk_size, self.chunk_overlap)
+        logger.info(f"Analyzing {len(windows)} windows with concurrency {self.chunk_concurrency}")
+        with ThreadPoolExecutor(max_workers=max(1, self.chunk_concurrency)) as executor:
+            results = list(executor.map(in_current_scope(self.analyze_window), windows))
+        return merge_covenants(results)
+
+    def analyze_window(self, text: str) -> List[Dict[str, Any]]:
+        """Extract covenants from a single span of text with one GPT call."""
+        if self.stream:
+            return list(self.stream_window(text))
+        try:
+            content = self._chat(self.covenant_messages(text), stage='covenants', validate=json.loads)
+            return self.parse_covenant_response(content)
+        except Exception as e:
+            logger.error(f"Error in GPT analysis: {str(e)}")
+            self.llm_errors += 1
+            return []
+
+    def stream_covenants(self, text: str) -> Iterator[Dict[str, Any]]:
+        """Yield normalized covenants as they are extracted from the document.
+
+        Rule covenants come first, then each GPT covenant as soon as its
+        object closes in the streamed response. Windows of a chunked
+        document are streamed one after another. A covenant with the same
+        type and threshold as one already yielded is dropped; unlike
+        merge_covenants, the first occurrence is not completed from later
+        duplicates since it has already been handed over.
+        """
+        rule_covenants, text = self.apply_rules(self.covenant_text(text))
+        seen = set()
+        windows = []
+        if text.strip():
+            if self.chunked and len(text) > self.chunk_size:
+                windows = split_into_windows(text, self.chunk_size, self.chunk_overlap)
+            else:
+                windows = [text[:self.chunk_size]]
+        for covenants in [rule_covenants] + [self.stream_window(window) for window in windows]:
+            for covenant in covenants:
+                key = (str(covenant.get('type', '')).strip().lower(),
+                       _threshold_key(covenant.get('threshold_value')))
+                if key not in seen:
+                    seen.add(key)
+                    yield covenant
+
+    def stream_window(self, text: str) -> Iterator[Dict[str, Any]]:
+        """Extract covenants from a span of text with one streamed GPT call.
+
+        A cached response is replayed whole. Otherwise covenants are
+        normalized and yielded as the response arrives; if it is cut off
+        or contains malformed objects, the complete covenants are kept, the
+        call counts as an LLM error and the response is not cached.
+        """
+        messages = self.covenant_messages(text)
+        cache = get_llm_cache()
+        key = cache_key(self.model, messages, 0.1)
+        start = time.perf_counter()
+        content = cache.get(key)
+        if content is not None:
+            get_llm_metrics().record(self.model, 'covenants', time.perf_counter() - start, cache_hit=True)
+            yield from self.parse_covenant_response(content)
+            return
+
+        stream = JSONArrayStream()
+        parts = []
+        count = 0
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1
+                messages=messages,
+                temperature=0.1,
+                stream=True
             )
-            
-            content = response.choices[0].message.content
-            covenants = json.loads(content)
-            
-            # Normalize the covenants
-            normalized = []
-            for covenant in covenants:
-                try:
-                    normalized.append(self.normalize_covenant(covenant))
-                except Exception as e:
-                    logger.error(f"Error normalizing covenant: {str(e)}")
+            for chunk in response:
+                if not chunk.choices:
                     continue
-                    
-            return normalized
-            
+                delta = chunk.choices[0].delta.content or ''
+                parts.append(delta)
+                for covenant in self.normalize_covenants(stream.feed(delta)):
+                    if count == 0:
+                        logger.info(f"First covenant of {self.file_path} after {time.perf_counter() - start:.2f}s")
+                    count += 1
+                    yield covenant
         except Exception as e:
-            logger.error(f"Error in GPT analysis: {str(e)}")
-            return []
+            logger.error(f"Error in streamed GPT analysis: {str(e)}")
+            self.llm_errors += 1
+            return
+        finally:
+            # Streamed responses carry no usage, so tokens are estimated
+            content = ''.join(parts)
+            get_llm_metrics().record(self.model, 'covenants', time.perf_counter() - start,
+                                     prompt_tokens=estimate_tokens(messages, completion_tokens=0),
+                                     completion_tokens=len(content) // 4)
+
+        if not stream.complete or stream.skipped:
+            logger.warning(f"Streamed covenant response for {self.file_path} was incomplete; "
+                           f"kept {count} complete covenants")
+            self.llm_errors += 1
+        elif is_valid(content, json.loads):
+            cache.put(key, self.model, content)
+
+    def _chat(self, messages: List[Dict[str, str]], stage: str,
+              validate: Optional[Callable[[str], Any]] = None) -> str:
+        """Send one chat completion request and return the message content."""
+        content, _ = cached_completion(self.client.chat.completions.create, self.model,
+                                       messages, temperature=0.1, validate=validate, stage=stage)
+        return content
+
+    def covenant_messages(self, text: str) -> List[Dict[str, str]]:
+        """Chat messages asking for the covenants in a span of text."""
+        return [
+            {"role": "system", "content": COVENANT_SYSTEM_PROMPT},
+            {"role": "user", "content": COVENANT_USER_PROMPT.format(text=text)}
+        ]
+
+    def parse_covenant_response(self, content: str) -> List[Dict[str, Any]]:
+        """Parse and normalize the covenant array returned by GPT.
+
+        A truncated or malformed array still yields its complete covenants;
+        the response then counts as an LLM error so the result is not cached.
+        """
+        try:
+            covenants = json.loads(content)
+        except ValueError:
+            covenants = recover_json_array(content)
+            logger.warning(f"Recovered {len(covenants)} covenants from a malformed response")
+            self.llm_errors += 1
+        return self.normalize_covenants(covenants)
+
+    def normalize_covenants(self, covenants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Normalize a list of covenants, skipping any that can't be normalized."""
+        normalized = []
+        for covenant in covenants:
+            try:
+                normalized.append(self.normalize_covenant(covenant))
+            except Exception as e:
+                logger.error(f"Error normalizing covenant: {str(e)}")
+                continue
+        return normalized
     
     def normalize_covenant(self, covenant: Dict[str, Any]) -> Dict[str, Any]:
         """Normalize covenant data for database storage."""
@@ -107,6 +481,12 @@ class DocumentParser:
         if isinstance(covenant['threshold_value'], str):
             covenant['threshold_value'] = self.parse_threshold_value(covenant['threshold_value'])
         
+        # Step-down thresholds apply by date; use the level in force today
+        schedule = build_schedule(covenant['thresholds'])
+        if schedule:
+            covenant['threshold_schedule'] = schedule
+            covenant['threshold_value'] = ThresholdSchedule(schedule).value_at()
+        
         # Normalize frequency
         covenant['measurement_frequency'] = self.normalize_frequency(
             covenant.get('frequency', 'not specified')
@@ -114,25 +494,13 @@ class DocumentParser:
         
         return covenant
     
-    def parse_threshold_value(self, value: str) -> float:
-        """Parse threshold value from string to float."""
-        try:
-            # Handle ratio format (e.g., "3.50:1.00")
-            if ':' in value:
-                num, denom = value.split(':')
-                return float(num) / float(denom)
-            
-            # Handle currency format (e.g., "USD 10000000")
-            value = value.replace('USD', '').replace(',', '').strip()
-            
-            # Handle percentage format
-            if '%' in value:
-                value = value.replace('%', '')
-                return float(value) / 100
-                
-            return float(value)
-        except:
-            return 0.0
+    def parse_threshold_value(self, value: str) -> Optional[float]:
+        """Parse threshold value from string to float, or None if it has no number."""
+        parsed = parse_threshold(value)
+        if math.isnan(parsed):
+            logger.warning(f"Could not parse threshold value: {value!r}")
+            return None
+        return parsed
     
     def normalize_frequency(self, freq: str) -> str:
         """Normalize measurement frequency string."""
@@ -150,73 +518,237 @@ class DocumentParser:
     
     def process_document(self) -> Dict[str, Any]:
         """Main method to process document and extract all relevant information."""
-        text = self.extract_text()
-        
-        # Use GPT to analyze the document
-        covenants = self.analyze_with_gpt(text)
+        document_hash, cached = self.cached_result()
+        if cached is not None:
+            return cached
+
+        self.llm_errors = 0
+        with llm_scope(document=os.path.basename(self.file_path)) as usage:
+            start = time.perf_counter()
+            text = self.extract_text()
+            extracted = time.perf_counter()
+            
+            # Use GPT to analyze the document
+            covenants, document_type, parties = self.analyze_document(text)
+            analyzed = time.perf_counter()
         
+        result = self.build_result(text, covenants, document_type, parties)
+        result['metadata']['llm_usage'] = usage.as_dict()
+        result['metadata']['timings'] = {'extract': extracted - start, 'analyze': analyzed - extracted}
+        self.store_result(document_hash, result)
+        return result
+
+    def process_amendment(self, previous: Dict[str, Any]) -> Dict[str, Any]:
+        """Process an amendment, re-extracting only the sections changed since ``previous``.
+
+        ``previous`` is the predecessor's result, or one rebuilt from stored
+        records, with covenants tagged with their ``section_hash``. Its
+        section fingerprints are read from the text store, or from
+        ``metadata['sections']`` for documents processed before they moved
+        there. Covenants of unchanged sections are carried forward. The
+        document is processed in full when the predecessor has no
+        fingerprints, has covenants whose section is unknown, or too much
+        of the text changed.
+        """
+        previous_metadata = previous.get('metadata') or {}
+        previous_sections = previous_metadata.get('sections') or self.stored_sections(previous_metadata)
+        if not previous_sections:
+            logger.info("Predecessor has no section fingerprints, processing amendment in full")
+            return self.process_document()
+        if any(covenant.get('section_hash') is None for covenant in previous.get('covenants') or []):
+            logger.info("Predecessor has covenants of unknown sections, processing amendment in full")
+            return self.process_document()
+
+        self.llm_errors = 0
+        with llm_scope(document=os.path.basename(self.file_path)) as usage:
+            text = self.extract_text()
+            diff = diff_sections(previous_sections, text)
+            if diff['changed_fraction'] > MAX_CHANGED_FRACTION:
+                logger.info(f"{diff['changed_fraction']:.0%} of the amendment changed, processing in full")
+                covenants, document_type, parties = self.analyze_document(text)
+            else:
+                changed_text = "\n".join(text[section['start']:section['end']] for section in diff['changed'])
+                extracted = self.analyze_with_gpt(changed_text) if changed_text.strip() else []
+                covenants = carry_forward(previous.get('covenants') or [], diff, extracted)
+                document_type = previous_metadata.get('document_type', 'unknown')
+                parties = previous_metadata.get('parties', [])
+                # The preamble names the document and its parties
+                if diff['changed'] and diff['changed'][0]['start'] == 0:
+                    document_type = self.identify_document_type(text)
+                    parties = self.extract_parties(text)
+
+        result = self.build_result(text, covenants, document_type, parties)
+        result['metadata']['llm_usage'] = usage.as_dict()
+        result['metadata']['amendment'] = {
+            'changed_sections': len(diff['changed']),
+            'unchanged_sections': len(diff['sections']) - len(diff['changed']),
+            'removed_sections': len(diff['removed_hashes']),
+            'changed_fraction': round(diff['changed_fraction'], 4),
+            'carried_forward': sum(1 for covenant in covenants if covenant.get('carried_forward')),
+            'full_reextraction': diff['changed_fraction'] > MAX_CHANGED_FRACTION,
+        }
+        return result
+
+    def cached_result(self) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Return the document hash and any cached result for this file."""
+        if self.cache is None:
+            return None, None
+        document_hash = self.document_hash or file_sha256(self.file_path)
+        self.document_hash = document_hash
+        cached = self.cache.get(document_hash, self.cache_version, self.model, PROMPT_VERSION)
+        if cached is not None:
+            # Results cached before the fingerprints moved to the text store
+            sections = cached['metadata'].pop('sections', None)
+            key = (cached['metadata'].get('text') or {}).get('key')
+            if sections and key and self.text_store is not None:
+                self.text_store.put_sections(key, sections)
+            # Timings are those of the run that filled the cache, not this one
+            cached['metadata'].pop('timings', None)
+            logger.info(f"Using cached extraction for {self.file_path} ({document_hash[:12]})")
+        return document_hash, cached
+
+    def build_result(self, text: str, covenants: List[Dict[str, Any]],
+                     document_type: str, parties: List[str]) -> Dict[str, Any]:
+        """Assemble the process_document result from the analysis outputs."""
         # Extract dates using pattern matching as backup
         dates = self.extract_dates(text)
         
+        # Fingerprint sections so amendments can be diffed against this result
+        sections = section_fingerprints(text)
+        attribute_sections(covenants, text, sections)
+        
         # Get document metadata
         metadata = {
-            'document_type': self.identify_document_type(text),
-            'parties': self.extract_parties(text),
+            'document_type': document_type,
+            'parties': parties,
             'processed_at': datetime.utcnow().isoformat()
         }
+        if self.section_selection:
+            metadata['covenant_sections'] = self.section_selection
+        
+        # The text and its fingerprints are kept out of the result, in the text store
+        stored_text = self.store_text(text, sections)
+        if stored_text:
+            metadata['text'] = stored_text
         
         return {
             'covenants': covenants,
             'dates': dates,
-            'metadata': metadata,
-            'raw_text': text
+            'metadata': metadata
         }
+
+    def store_text(self, text: str, sections: Optional[List[Dict[str, Any]]] = None) -> Optional[Dict[str, Any]]:
+        """Save the extracted text and its section fingerprints to the text store.
+
+        Both are keyed by the document hash.
+        Returns the key, page count and length to record in the metadata.
+        """
+        if self.text_store is None or not text:
+            return None
+        pages = self.page_texts
+        if not pages or sum(len(page) for page in pages) != len(text):
+            pages = [text]
+        try:
+            key = self.document_hash or file_sha256(self.file_path)
+        except OSError:
+            key = page_hash(text)
+        stored = self.text_store.put(key, pages)
+        if stored and sections is not None:
+            self.text_store.put_sections(key, sections)
+        return stored
+
+    def stored_sections(self, metadata: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Section fingerprints of a result, read from the text store next to its text."""
+        key = (metadata.get('text') or {}).get('key')
+        if self.text_store is None or not key:
+            return None
+        return self.text_store.get_sections(key)
+
+    def store_result(self, document_hash: Optional[str], result: Dict[str, Any]):
+        """Cache a result unless it was degraded by a failed API call."""
+        if self.cache is not None and document_hash and not self.llm_errors:
+            self.cache.put(document_hash, self.cache_version, self.model, PROMPT_VERSION, result)
     
+    def analyze_document(self, text: str) -> Tuple[List[Dict[str, Any]], str, List[str]]:
+        """Get covenants, document type and parties according to the analysis mode."""
+        if self.analysis_mode == 'combined' and not (self.chunked and len(text) > self.chunk_size):
+            combined = self.analyze_combined(text)
+            if combined is not None:
+                return combined
+            logger.warning("Combined analysis failed, falling back to concurrent calls")
+
+        if self.analysis_mode in ('combined', 'concurrent'):
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                covenants = executor.submit(in_current_scope(self.analyze_with_gpt), text)
+                document_type = executor.submit(in_current_scope(self.identify_document_type), text)
+                parties = executor.submit(in_current_scope(self.extract_parties), text)
+                return covenants.result(), document_type.result(), parties.result()
+
+        return self.analyze_with_gpt(text), self.identify_document_type(text), self.extract_parties(text)
+
+    def analyze_combined(self, text: str) -> Optional[Tuple[List[Dict[str, Any]], str, List[str]]]:
+        """Get covenants, document type and parties from a single GPT call.
+
+        Returns None if the response cannot be used, so the caller can fall
+        back to separate calls.
+        """
+        try:
+            content = self._chat(self.combined_messages(text), stage='combined', validate=json.loads)
+            return self.parse_combined_response(content)
+        except Exception as e:
+            logger.error(f"Error in combined GPT analysis: {str(e)}")
+            return None
+
+    def combined_messages(self, text: str) -> List[Dict[str, str]]:
+        """Chat messages asking for covenants, document type and parties at once."""
+        if self.locate_sections:
+            # Keep the preamble, which names the document and the parties
+            text = text[:2000] + "\n...\n" + self.covenant_text(text)
+        return [
+            {"role": "system", "content": COMBINED_SYSTEM_PROMPT},
+            {"role": "user", "content": COMBINED_ANALYSIS_PROMPT.format(text=text[:self.chunk_size])}
+        ]
+
+    def parse_combined_response(self, content: str) -> Tuple[List[Dict[str, Any]], str, List[str]]:
+        """Split a combined analysis response into covenants, type and parties."""
+        result = json.loads(content)
+        covenants = self.normalize_covenants(result['covenants'])
+        document_type = str(result.get('document_type') or 'unknown').strip().lower()
+        parties = result.get('parties') or []
+        return covenants, document_type, parties
+
     def extract_dates(self, text: str) -> List[Dict[str, str]]:
         """Extract relevant dates from the document."""
-        date_patterns = {
-            'review_date': r'(?:review|reporting|compliance)\s*date.*?(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
-            'effective_date': r'(?:effective|closing)\s*date.*?(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
-            'termination_date': r'(?:termination|maturity)\s*date.*?(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})'
-        }
-        
-        dates = []
-        for date_type, pattern in date_patterns.items():
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                dates.append({
-                    'type': date_type,
-                    'date': match.group(1),
-                    'context': match.group(0)
-                })
-        
-        return dates
+        return extract_dates(text)
 
     def identify_document_type(self, text: str) -> str:
         """Identify the type of document using GPT."""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Identify financial document types."},
-                    {"role": "user", "content": f"What type of financial document is this? Choose from: Loan Agreement, Bond Indenture, Credit Agreement, Amendment, Other (specify)\n\nFirst few paragraphs:\n{text[:1000]}"}
-                ],
-                temperature=0.1
-            )
-            return response.choices[0].message.content.strip().lower()
+            content = self._chat(self.document_type_messages(text), stage='document_type')
+            return content.strip().lower()
         except:
+            self.llm_errors += 1
             return 'unknown'
 
+    def document_type_messages(self, text: str) -> List[Dict[str, str]]:
+        """Chat messages asking for the document type."""
+        return [
+            {"role": "system", "content": "Identify financial document types."},
+            {"role": "user", "content": DOCUMENT_TYPE_PROMPT.format(text=text[:1000])}
+        ]
+
     def extract_parties(self, text: str) -> List[str]:
         """Extract parties involved in the agreement using GPT."""
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Extract party names from legal documents."},
-                    {"role": "user", "content": f"Identify the main parties (lender, borrower, etc.) in this agreement. Return as a JSON array of strings.\n\nFirst part of document:\n{text[:2000]}"}
-                ],
-                temperature=0.1
-            )
-            return json.loads(response.choices[0].message.content)
+            content = self._chat(self.parties_messages(text), stage='parties', validate=json.loads)
+            return json.loads(content)
         except:
+            self.llm_errors += 1
             return []
+
+    def parties_messages(self, text: str) -> List[Dict[str, str]]:
+        """Chat messages asking for the parties to the agreement."""
+        return [
+            {"role": "system", "content": "Extract party names from legal documents."},
+            {"role": "user", "content": PARTIES_PROMPT.format(text=text[:2000])}
+        ]
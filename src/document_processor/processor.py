@@ -1,131 +1,497 @@
 """Document processor module."""
-from src.models.database import db, Document, Covenant, Alert
+from src.models.database import (db, Document, Covenant, Alert, DEFAULT_WARNING_BAND, compliance_status,
+                                 covenant_direction)
+from src.document_processor.schedules import ThresholdSchedule
+from src.document_processor.mock_parser import MockDocumentParser
+from src.document_processor.parser import DocumentParser
+from src.document_processor.amendments import find_section, section_fingerprints
+from src.document_processor.jobs import PermanentJobError, get_job_queue
+from src.document_processor.storage import upload_document
+from src.document_processor.uploads import take
+from concurrent.futures import ThreadPoolExecutor
+from src.llm.metrics import llm_scope
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 import logging
-import json
+import os
 
 logger = logging.getLogger(__name__)
 
+# Use the mock parser unless real extraction is switched on
+USE_MOCK_PARSER = os.getenv('USE_MOCK_PARSER', 'true').lower() in ('1', 'true', 'yes')
+
+# Covenants stored for every document when the mock parser is used
+MOCK_COVENANTS = [
+    {
+        'name': 'Debt Service Coverage Ratio',
+        'description': 'Maintain a minimum debt service coverage ratio of 1.2x',
+        'threshold_value': 1.2,
+        'current_value': 1.5,
+        'measurement_frequency': 'quarterly'
+    },
+    {
+        'name': 'Leverage Ratio',
+        'description': 'Maintain a maximum leverage ratio of 3.5x',
+        'threshold_value': 3.5,
+        'current_value': 3.2,
+        'measurement_frequency': 'quarterly'
+    },
+    {
+        'name': 'Working Capital Ratio',
+        'description': 'Maintain minimum working capital ratio of 1.1x',
+        'threshold_value': 1.1,
+        'current_value': 1.3,
+        'measurement_frequency': 'monthly'
+    },
+    {
+        'name': 'Capital Expenditure Limit',
+        'description': 'Annual capital expenditure not to exceed $10M',
+        'threshold_value': 10000000,
+        'current_value': 8500000,
+        'measurement_frequency': 'annually'
+    },
+    {
+        'name': 'Minimum Net Worth',
+        'description': 'Maintain minimum net worth of $50M',
+        'threshold_value': 50000000,
+        'current_value': 55000000,
+        'measurement_frequency': 'quarterly'
+    },
+    {
+        'name': 'Interest Coverage Ratio',
+        'description': 'Maintain minimum interest coverage ratio of 3.0x',
+        'threshold_value': 3.0,
+        'current_value': 3.8,
+        'measurement_frequency': 'quarterly'
+    }
+]
+
 class DocumentProcessor:
     """Process documents and extract covenants."""
     
-    def __init__(self, file_path, user_id, project_id=None):
-        """Initialize processor."""
+    def __init__(self, file_path, user_id, project_id=None, predecessor_id=None, use_mock=USE_MOCK_PARSER,
+                 upload=None):
+        """Initialize processor.
+
+        ``predecessor_id`` is the document an amendment or restatement
+        replaces; only the sections that changed since it are re-extracted.
+        ``upload`` is the SpooledUpload the route read the file into; while
+        it is in memory the parser and the storage uploader read it directly.
+        """
         self.file_path = file_path
         self.user_id = user_id
         self.project_id = project_id
+        self.predecessor_id = predecessor_id
+        self.use_mock = use_mock
+        self.upload = upload
+        self.content_hash = upload.sha256 if upload is not None else None
+        self.duplicate = None  # Existing document with the same content, once found
+        if use_mock:
+            self.parser = MockDocumentParser(file_path)
+        elif upload is not None:
+            self.parser = DocumentParser(file_path, content=upload.content, document_hash=upload.sha256)
+        else:
+            self.parser = DocumentParser(file_path)
         self.file_url = None  # Will be set by the document route
         
-    def process_and_store(self):
-        """Process document and store results."""
-        try:
-            # Mock processing for now
+    def extract(self, predecessor=None) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
+        """Return the document type, metadata and covenants to store."""
+        if self.use_mock:
             logger.info("Using mock parser")
-            
-            # Create document record with JSON string for metadata
-            document = Document(
-                project_id=self.project_id,
-                filename=self.file_path.split('/')[-1],
-                file_url=self.file_url,  # Use the file_url passed from the route
-                upload_date=datetime.utcnow(),
-                user_id=self.user_id,
-                document_type='loan_agreement',
-                doc_metadata=json.dumps({
-                    'document_type': 'loan_agreement',
-                    'parties': ['TECH INNOVATIONS INC.', 'FIRST NATIONAL BANK', 'THE LENDERS'],
-                    'processed_at': datetime.utcnow().isoformat(),
-                    'effective_date': datetime.utcnow().strftime('%Y-%m-%d')
-                }),
-                processing_status='pending'
-            )
-            db.session.add(document)
-            db.session.flush()  # Get document ID without committing
-            
-            # Create mock covenants
-            covenants = [
-                {
-                    'name': 'Debt Service Coverage Ratio',
-                    'description': 'Maintain a minimum debt service coverage ratio of 1.2x',
-                    'threshold_value': 1.2,
-                    'current_value': 1.5,
-                    'measurement_frequency': 'quarterly'
-                },
-                {
-                    'name': 'Leverage Ratio',
-                    'description': 'Maintain a maximum leverage ratio of 3.5x',
-                    'threshold_value': 3.5,
-                    'current_value': 3.2,
-                    'measurement_frequency': 'quarterly'
-                },
-                {
-                    'name': 'Working Capital Ratio',
-                    'description': 'Maintain minimum working capital ratio of 1.1x',
-                    'threshold_value': 1.1,
-                    'current_value': 1.3,
-                    'measurement_frequency': 'monthly'
-                },
-                {
-                    'name': 'Capital Expenditure Limit',
-                    'description': 'Annual capital expenditure not to exceed $10M',
-                    'threshold_value': 10000000,
-                    'current_value': 8500000,
-                    'measurement_frequency': 'annually'
-                },
-                {
-                    'name': 'Minimum Net Worth',
-                    'description': 'Maintain minimum net worth of $50M',
-                    'threshold_value': 50000000,
-                    'current_value': 55000000,
-                    'measurement_frequency': 'quarterly'
-                },
-                {
-                    'name': 'Interest Coverage Ratio',
-                    'description': 'Maintain minimum interest coverage ratio of 3.0x',
-                    'threshold_value': 3.0,
-                    'current_value': 3.8,
-                    'measurement_frequency': 'quarterly'
-                }
-            ]
-            
-            # Store covenants
-            for covenant_data in covenants:
-                covenant = Covenant(
-                    document_id=document.id,
-                    user_id=self.user_id,
-                    name=covenant_data['name'],
-                    description=covenant_data['description'],
-                    threshold_value=covenant_data['threshold_value'],
-                    current_value=covenant_data['current_value'],
-                    measurement_frequency=covenant_data['measurement_frequency'],
-                    covenant_metadata=json.dumps({
-                        'measurement_frequency': covenant_data['measurement_frequency'],
-                        'last_updated': datetime.utcnow().isoformat()
-                    })
-                )
-                covenant.update_compliance_status()
-                db.session.add(covenant)
-            
+            metadata = {
+                'document_type': 'loan_agreement',
+                'parties': ['TECH INNOVATIONS INC.', 'FIRST NATIONAL BANK', 'THE LENDERS'],
+                'processed_at': datetime.utcnow().isoformat(),
+                'effective_date': datetime.utcnow().strftime('%Y-%m-%d')
+            }
+            return 'loan_agreement', metadata, MOCK_COVENANTS
+
+        if predecessor is not None:
+            logger.info(f"Re-extracting changes since document {predecessor.id}")
+            result = self.parser.process_amendment(self.previous_result(predecessor))
+        else:
+            result = self.parser.process_document()
+        return self.result_records(result)
+
+    def result_records(self, result: Dict[str, Any]) -> Tuple[str, Dict[str, Any], List[Dict[str, Any]]]:
+        """Document type, metadata and covenant fields of a parser result."""
+        metadata = {**result['metadata'], 'dates': result['dates']}
+        covenants = [self.covenant_fields(covenant) for covenant in result['covenants']]
+        return metadata.get('document_type', 'unknown'), metadata, covenants
+
+    def covenant_fields(self, covenant: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a parser covenant onto Covenant columns and metadata."""
+        covenant_type = covenant.get('type') or 'unknown'
+        return {
+            'name': covenant.get('name') or covenant_type.replace('_', ' ').title(),
+            'description': covenant.get('description'),
+            'threshold_value': covenant.get('threshold_value'),
+            'current_value': covenant.get('current_value'),
+            'measurement_frequency': covenant.get('measurement_frequency'),
+            'direction': covenant.get('direction') if covenant.get('direction') in ('min', 'max') else None,
+            'metadata': {
+                'type': covenant_type,
+                'thresholds': covenant.get('thresholds'),
+                'threshold_schedule': covenant.get('threshold_schedule'),
+                'section_hash': covenant.get('section_hash'),
+                'source': covenant.get('source', 'gpt'),
+                'carried_forward': covenant.get('carried_forward', False)
+            }
+        }
+
+    def previous_result(self, document) -> Dict[str, Any]:
+        """Rebuild a parser result from a stored document and its covenants."""
+        covenants = []
+        for covenant in document.covenants:
+            metadata = covenant.covenant_metadata or {}
+            covenants.append({
+                'type': metadata.get('type') or covenant.name.lower().replace(' ', '_'),
+                'name': covenant.name,
+                'description': covenant.description,
+                'threshold_value': covenant.threshold_value,
+                'thresholds': metadata.get('thresholds'),
+                'threshold_schedule': metadata.get('threshold_schedule'),
+                'current_value': covenant.current_value,
+                'measurement_frequency': covenant.measurement_frequency,
+                'direction': covenant.direction,
+                'section_hash': metadata.get('section_hash'),
+                'source': metadata.get('source')
+            })
+        metadata = dict(document.doc_metadata or {})
+        if 'sections' not in metadata:
+            sections = self.parser.stored_sections(metadata)
+            if sections:
+                metadata['sections'] = sections
+        return {'metadata': metadata, 'covenants': covenants}
+
+    def new_document(self, document_type: str, metadata: Dict[str, Any], predecessor=None,
+                     status: str = 'pending') -> Document:
+        """Add the document record to the session and flush to get its ID."""
+        document = Document(
+            project_id=self.project_id,
+            filename=os.path.basename(self.file_path),
+            file_url=self.file_url,  # Use the file_url passed from the route
+            upload_date=datetime.utcnow(),
+            user_id=self.user_id,
+            document_type=document_type,
+            doc_metadata=metadata,
+            processing_status=status,
+            parent_document_id=predecessor.id if predecessor else self.predecessor_id,
+            content_hash=self.content_hash
+        )
+        db.session.add(document)
+        db.session.flush()  # Get document ID without committing
+        return document
+
+    def add_covenant(self, document: Document, covenant_data: Dict[str, Any]) -> Covenant:
+        """Add one covenant of a document to the session with its compliance status."""
+        covenant = Covenant(
+            document_id=document.id,
+            user_id=self.user_id,
+            name=covenant_data['name'],
+            description=covenant_data['description'],
+            threshold_value=covenant_data['threshold_value'],
+            current_value=covenant_data['current_value'],
+            measurement_frequency=covenant_data['measurement_frequency'],
+            direction=covenant_data.get('direction'),
+            covenant_metadata={
+                **covenant_data.get('metadata', {}),
+                'measurement_frequency': covenant_data['measurement_frequency'],
+                'last_updated': datetime.utcnow().isoformat()
+            }
+        )
+        covenant.update_compliance_status()
+        db.session.add(covenant)
+        return covenant
+
+    def alert_fields(self, covenant_id: int, name: str, status: str, current_value, threshold_value,
+                     measurement_frequency) -> Dict[str, Any]:
+        """Column values of the alert for a covenant out of compliance."""
+        return {
+            'covenant_id': covenant_id,
+            'user_id': self.user_id,
+            'alert_type': status,
+            'message': f"{name} is in {status} status. Current value: {current_value}, Threshold: {threshold_value}",
+            'details': {
+                'covenant_name': name,
+                'current_value': current_value,
+                'threshold_value': threshold_value,
+                'measurement_frequency': measurement_frequency,
+                'last_updated': datetime.utcnow().isoformat()
+            }
+        }
+
+    def add_alerts(self, covenants: List[Covenant]):
+        """Add alerts for stored covenants out of compliance."""
+        for covenant in covenants:
+            if covenant.compliance_status in ['warning', 'breach']:
+                db.session.add(Alert(**self.alert_fields(
+                    covenant.id, covenant.name, covenant.compliance_status, covenant.current_value,
+                    covenant.threshold_value, covenant.measurement_frequency)))
+
+    def covenant_row(self, document_id: int, covenant_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Column values of a covenant, with the threshold in force today and its compliance status."""
+        metadata = covenant_data.get('metadata', {})
+        threshold_value = covenant_data['threshold_value']
+        schedule = metadata.get('threshold_schedule')
+        if schedule:
+            threshold_value = ThresholdSchedule(schedule).value_at()
+        direction = covenant_data.get('direction') or covenant_direction(covenant_data['name'])
+        now = datetime.utcnow()
+        return {
+            'document_id': document_id,
+            'user_id': self.user_id,
+            'name': covenant_data['name'],
+            'description': covenant_data['description'],
+            'threshold_value': threshold_value,
+            'current_value': covenant_data['current_value'],
+            'measurement_frequency': covenant_data['measurement_frequency'],
+            'compliance_status': compliance_status(covenant_data['current_value'], threshold_value, direction),
+            'direction': direction,
+            'warning_band': DEFAULT_WARNING_BAND,
+            'last_checked': now,
+            'covenant_metadata': {
+                **metadata,
+                'measurement_frequency': covenant_data['measurement_frequency'],
+                'last_updated': now.isoformat()
+            }
+        }
+
+    def insert_covenants(self, document: Document, covenants: List[Dict[str, Any]]) -> int:
+        """Insert a document's covenants and their alerts with one statement each.
+
+        The covenant insert returns the new IDs in input order, so alerts are
+        built without loading the covenants back. Returns the number of
+        alerts inserted.
+        """
+        if not covenants:
+            return 0
+        rows = [self.covenant_row(document.id, covenant_data) for covenant_data in covenants]
+        ids = db.session.scalars(
+            insert(Covenant).returning(Covenant.id, sort_by_parameter_order=True), rows
+        ).all()
+        alerts = [
+            self.alert_fields(covenant_id, row['name'], row['compliance_status'], row['current_value'],
+                              row['threshold_value'], row['measurement_frequency'])
+            for covenant_id, row in zip(ids, rows)
+            if row['compliance_status'] in ('warning', 'breach')
+        ]
+        if alerts:
+            db.session.execute(insert(Alert), alerts)
+        # The inserted rows bypass the session; load them on next access
+        db.session.expire(document, ['covenants'])
+        return len(alerts)
+
+    def add_records(self, document_type: str, metadata: Dict[str, Any], covenants: List[Dict[str, Any]],
+                    predecessor=None, document=None) -> Document:
+        """Add the document, its covenants and their alerts to the session without committing.
+
+        ``document`` is a record already created by the upload route; without
+        it a new one is added.
+        """
+        if document is None:
+            document = self.new_document(document_type, metadata, predecessor)
+        else:
+            document.document_type = document_type
+            document.doc_metadata = metadata
+            self.set_status(document, 'storing')
+        self.insert_covenants(document, covenants)
+        document.processing_status = 'completed'
+        return document
+
+    def find_predecessor(self) -> Optional[Document]:
+        """The document named by ``predecessor_id``, if it belongs to this project and user."""
+        if not self.predecessor_id:
+            return None
+        return Document.query.filter_by(id=self.predecessor_id, project_id=self.project_id,
+                                        user_id=self.user_id).first()
+
+    def find_duplicate(self) -> Optional[Document]:
+        """The document of this project with the same content, if there is one."""
+        if not self.content_hash or self.project_id is None:
+            return None
+        return Document.query.filter_by(project_id=self.project_id, content_hash=self.content_hash).first()
+
+    def create_document(self) -> Document:
+        """Commit the document record with status 'queued' before it is processed.
+
+        A document with the same content that failed to process is reset and
+        reused. If another request stores the same content first, that
+        document is returned and recorded in ``duplicate``.
+        """
+        existing = self.find_duplicate()
+        if existing is not None and existing.processing_status == 'error':
+            logger.info(f"Reprocessing document {existing.id} after a failed attempt")
+            self.clear_records(existing)
+            existing.document_type = 'unknown'
+            existing.doc_metadata = {}
+            existing.processing_status = 'queued'
+            db.session.commit()
+            return existing
+        try:
+            document = self.new_document('unknown', {}, status='queued')
+            db.session.commit()
+            return document
+        except IntegrityError:
+            db.session.rollback()
+            self.duplicate = self.find_duplicate()
+            if self.duplicate is None:
+                raise
+            logger.info(f"Content already stored as document {self.duplicate.id}")
+            return self.duplicate
+
+    def queue_document(self, upload: bool = True) -> Document:
+        """Create the document record and queue it for the background workers.
+
+        With ``upload`` the worker also sends the file to remote storage. The
+        file must stay in place until its job has run; the worker removes it.
+        """
+        document = self.create_document()
+        if self.duplicate is not None:
+            return document
+        try:
+            get_job_queue().enqueue(document.id, {'file_path': self.file_path, 'remove_file': True,
+                                                  'upload': upload,
+                                                  'sha256': self.upload.sha256 if self.upload else None})
+        except Exception:
+            self.set_status(document, 'error')
+            raise
+        return document
+
+    def process_with_upload(self, document: Document) -> Document:
+        """Upload the file to remote storage while the document is processed.
+
+        The upload runs in a thread alongside extraction, and ``file_url`` is
+        attached once it finishes, so the two take as long as the slower one.
+        Both sides always run to completion:
+
+        - extraction fails: the document is marked 'error' and the URL is
+          still attached if the upload succeeded; the extraction error is
+          raised.
+        - upload fails: the extracted covenants are kept, the document is
+          marked 'error' with the reason under 'storage_error' in its
+          metadata, and the upload error is raised.
+        """
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            upload = executor.submit(self.upload_file)
+            processing_error = None
+            try:
+                document = self.process_and_store(document)
+            except Exception as e:
+                processing_error = e
+            try:
+                document.file_url = upload.result()
+                db.session.commit()
+                logger.info(f"Attached file URL to document {document.id}")
+            except Exception as e:
+                logger.error(f"Error uploading document {document.id}: {str(e)}", exc_info=True)
+                db.session.rollback()
+                if processing_error is None:
+                    document.doc_metadata = {**(document.doc_metadata or {}), 'storage_error': str(e)}
+                    self.set_status(document, 'error')
+                    raise
+        if processing_error is not None:
+            raise processing_error
+        return document
+
+    def upload_file(self) -> str:
+        """Send the file to remote storage, from memory when the upload is held there."""
+        filename = os.path.basename(self.file_path)
+        if self.upload is None or not self.upload.in_memory:
+            return upload_document(self.file_path, self.project_id, filename=filename)
+        with self.upload.open() as source:
+            return upload_document(source, self.project_id, filename=filename)
+
+    def set_status(self, document: Document, status: str):
+        """Record a processing step of a queued document so the process page can show it."""
+        document.processing_status = status
+        db.session.commit()
+
+    def clear_records(self, document: Document):
+        """Delete the covenants and alerts left by an interrupted attempt."""
+        covenant_ids = [covenant_id for (covenant_id,) in
+                        db.session.query(Covenant.id).filter_by(document_id=document.id)]
+        if covenant_ids:
+            Alert.query.filter(Alert.covenant_id.in_(covenant_ids)).delete(synchronize_session=False)
+            Covenant.query.filter(Covenant.id.in_(covenant_ids)).delete(synchronize_session=False)
+            db.session.commit()
+            logger.info(f"Cleared {len(covenant_ids)} covenants of document {document.id} before retrying")
+
+    def streams(self, predecessor=None) -> bool:
+        """Whether covenants are stored one by one as they are extracted."""
+        return not self.use_mock and self.parser.stream and predecessor is None
+
+    def stream_and_store(self, document=None) -> Document:
+        """Store covenants as the parser streams them, committing each one.
+
+        The document is committed first with status 'extracting', so the
+        process page can show covenants while the rest are still being
+        extracted. Type, parties, dates and alerts follow once the covenant
+        response is complete. On failure the covenants stored so far are
+        kept and the document is marked 'error'.
+        """
+        document_hash, cached = self.parser.cached_result()
+        if cached is not None:
+            document = self.add_records(*self.result_records(cached), document=document)
+            db.session.commit()
+            return document
+
+        if document is None:
+            document = self.new_document('unknown', {}, status='extracting')
+            db.session.commit()
+        else:
+            self.set_status(document, 'extracting')
+        parser = self.parser
+        parser.llm_errors = 0
+        try:
+            with llm_scope(document=os.path.basename(self.file_path)) as usage:
+                text = parser.extract_text()
+                sections = section_fingerprints(text)
+                extracted, stored = [], []
+                for covenant in parser.stream_covenants(text):
+                    covenant['section_hash'] = find_section(covenant, text, sections)
+                    extracted.append(covenant)
+                    stored.append(self.add_covenant(document, self.covenant_fields(covenant)))
+                    db.session.commit()
+                document_type = parser.identify_document_type(text)
+                parties = parser.extract_parties(text)
+
+            self.set_status(document, 'storing')
+            result = parser.build_result(text, extracted, document_type, parties)
+            result['metadata']['llm_usage'] = usage.as_dict()
+            parser.store_result(document_hash, result)
+            document_type, metadata, _ = self.result_records(result)
+            document.document_type = document_type
+            document.doc_metadata = metadata
+            self.add_alerts(stored)
             document.processing_status = 'completed'
             db.session.commit()
-            
-            # Create alerts after commit
-            for covenant in document.covenants:
-                if covenant.compliance_status in ['warning', 'breach']:
-                    alert = Alert(
-                        covenant_id=covenant.id,
-                        user_id=self.user_id,
-                        alert_type=covenant.compliance_status,
-                        message=f"{covenant.name} is in {covenant.compliance_status} status. Current value: {covenant.current_value}, Threshold: {covenant.threshold_value}",
-                        details=json.dumps({
-                            'covenant_name': covenant.name,
-                            'current_value': covenant.current_value,
-                            'threshold_value': covenant.threshold_value,
-                            'measurement_frequency': covenant.measurement_frequency,
-                            'last_updated': datetime.utcnow().isoformat()
-                        })
-                    )
-                    db.session.add(alert)
-            
+            logger.info(f"Streamed {len(stored)} covenants into document {document.id}")
+            return document
+        except Exception:
+            db.session.rollback()
+            self.set_status(document, 'error')
+            raise
+
+    def process_and_store(self, document=None):
+        """Process document and store results.
+
+        ``document`` is a record queued by the upload route; its status moves
+        through extracting and storing to completed, or to error on failure.
+        Without it the document record is created once extraction is done.
+        """
+        try:
+            predecessor = self.find_predecessor()
+            if self.predecessor_id and predecessor is None:
+                raise ValueError(f"Predecessor document {self.predecessor_id} not found in project {self.project_id}")
+            if self.streams(predecessor):
+                return self.stream_and_store(document)
+            if document is not None:
+                self.set_status(document, 'extracting')
+            document_type, metadata, covenants = self.extract(predecessor)
+            document = self.add_records(document_type, metadata, covenants, predecessor, document)
             db.session.commit()
             
             logger.info(f"Stored document with {len(covenants)} covenants")
@@ -134,4 +500,41 @@ class DocumentProcessor:
         except Exception as e:
             logger.error(f"Error processing document: {str(e)}", exc_info=True)
             db.session.rollback()
+            if document is not None:
+                self.set_status(document, 'error')
             raise
+
+def process_job(job: Dict[str, Any]):
+    """Process an uploaded document queued by the upload route; run by the job workers."""
+    payload = job['payload']
+    document = Document.query.get(job['document_id'])
+    if document is None:
+        logger.warning(f"Document {job['document_id']} of job {job['id']} no longer exists")
+        return
+    processor = DocumentProcessor(payload['file_path'], document.user_id, document.project_id,
+                                  predecessor_id=document.parent_document_id,
+                                  upload=take(payload['file_path']))
+    processor.file_url = document.file_url
+    if document.parent_document_id and processor.find_predecessor() is None:
+        # Checked before the upload starts; the route rejects these, so the row was tampered with
+        processor.set_status(document, 'error')
+        raise PermanentJobError(f"Predecessor document {document.parent_document_id} of document {document.id} "
+                                f"not found in project {document.project_id}")
+    retrying = False
+    try:
+        if job['attempts'] > 1:
+            processor.clear_records(document)
+        if payload.get('upload') and not document.file_url:
+            processor.process_with_upload(document)
+        else:
+            processor.process_and_store(document)
+    except Exception as e:
+        # The worker retries the job after a backoff, which needs the file again
+        retrying = not isinstance(e, PermanentJobError) and job['attempts'] < job.get('max_attempts', 1)
+        if retrying:
+            processor.set_status(document, 'queued')
+        raise
+    finally:
+        # A crashed worker never gets here, so the file stays for the retry
+        if payload.get('remove_file') and not retrying and os.path.exists(payload['file_path']):
+            os.remove(payload['file_path'])
@@ -0,0 +1,159 @@
+"""Rule-based extraction of covenants stated in standard forms."""
+import math
+import os
+import re
+from typing import Any, Dict, Optional
+
+from src.document_processor.sections import COVENANT_KEYWORDS, NUMERIC_THRESHOLD, split_sections
+from src.document_processor.thresholds import THRESHOLD_PATTERN, match_value
+
+# Covenants scoring below this are left for GPT
+MIN_CONFIDENCE = float(os.getenv('RULES_MIN_CONFIDENCE', 0.8))
+
+# Metric phrases, the covenant type they map to, the direction of the
+# limit and the kind of value expected
+METRICS = [
+    (r'fixed charge coverage(?: ratio)?', 'fixed_charge_coverage_ratio', 'min', 'ratio'),
+    (r'debt service coverage(?: ratio)?', 'debt_service_coverage_ratio', 'min', 'ratio'),
+    (r'interest coverage(?: ratio)?', 'interest_coverage_ratio', 'min', 'ratio'),
+    (r'(?:total |senior |net )?leverage ratio', 'leverage_ratio', 'max', 'ratio'),
+    (r'current ratio', 'current_ratio', 'min', 'ratio'),
+    (r'(?:minimum )?liquidity', 'minimum_liquidity', 'min', 'amount'),
+    (r'(?:minimum )?(?:tangible )?net worth', 'minimum_net_worth', 'min', 'amount'),
+    (r'capital expenditures?', 'capital_expenditures', 'max', 'amount'),
+    (r'(?:additional )?indebtedness', 'additional_indebtedness', 'max', 'amount'),
+]
+
+METRIC_PATTERN = re.compile('|'.join(f'(?P<m{i}>\\b{phrase}\\b)' for i, (phrase, _, _, _) in enumerate(METRICS)),
+                            re.IGNORECASE)
+
+# "No distributions if ...", "shall not declare or pay any dividends ... if"
+DISTRIBUTION_PATTERN = re.compile(
+    r'\b(?:no|not\b[^.;]{0,40}?)\s*(?:any\s+)?(?:dividends|distributions|restricted payments)\b[^.;]{0,120}?\bif\b',
+    re.IGNORECASE
+)
+
+MAX_COMPARATORS = re.compile(
+    r'\b(?:not\s+(?:to\s+)?exceed(?:ing)?|shall\s+not\s+exceed|not\s+(?:more|greater)\s+than|'
+    r'no\s+(?:more|greater)\s+than|exceed(?:s|ing)?|in\s+excess\s+of|maximum\s+of|less\s+than\s+or\s+equal\s+to)\b',
+    re.IGNORECASE
+)
+
+MIN_COMPARATORS = re.compile(
+    r'\b(?:(?:of\s+)?not\s+less\s+than|no\s+less\s+than|at\s+least|minimum\s+of|greater\s+than\s+or\s+equal\s+to)\b',
+    re.IGNORECASE
+)
+
+FREQUENCY_PATTERN = re.compile(
+    r'\b(?:fiscal quarter|quarterly|each quarter|fiscal month|monthly|fiscal year|annual(?:ly)?|per year|at all times)\b',
+    re.IGNORECASE
+)
+
+MINIMUM = re.compile(r'\bminimum\b', re.IGNORECASE)
+
+DEFINITION = re.compile(r'["\u201c][^"\u201d]{1,60}["\u201d]\s+(?:means|shall mean)\b', re.IGNORECASE)
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.;])\s+(?=[A-Z(])|\n+')
+
+def parse_value(match: re.Match) -> Optional[Dict[str, Any]]:
+    """Numeric value and kind ('ratio', 'amount' or 'percent') of a THRESHOLD_PATTERN match.
+
+    Bare numbers, e.g. section numbers and dates, have no kind and give None,
+    as do ratios with a zero denominator.
+    """
+    if match.group('denominator') or match.group('multiple'):
+        kind = 'ratio'
+    elif match.group('percent'):
+        kind = 'percent'
+    elif match.group('currency'):
+        kind = 'amount'
+    else:
+        return None
+    value = match_value(match)
+    return None if math.isnan(value) else {'value': value, 'kind': kind}
+
+def match_sentence(sentence: str) -> Optional[Dict[str, Any]]:
+    """Extract one covenant from a sentence, with a confidence score."""
+    metric = METRIC_PATTERN.search(sentence)
+    if metric is None:
+        return None
+    index = int(metric.lastgroup[1:])
+    _, covenant_type, direction, expected_kind = METRICS[index]
+
+    # A payment blocker keyed on another metric, e.g. "No distributions if
+    # Leverage Ratio exceeds 2.75:1.0"
+    if DISTRIBUTION_PATTERN.search(sentence[:metric.start()]):
+        covenant_type, direction = 'distributions', 'max'
+
+    tail = sentence[metric.end():]
+    values = [(match, parse_value(match)) for match in THRESHOLD_PATTERN.finditer(tail)]
+    values = [(match, value) for match, value in values if value is not None]
+    if not values:
+        return None
+    value_match, value = values[0]
+
+    between = tail[:value_match.start()]
+    confidence = 0.5
+    if MAX_COMPARATORS.search(between) or MIN_COMPARATORS.search(between):
+        found = 'max' if MAX_COMPARATORS.search(between) else 'min'
+        if covenant_type == 'distributions' or found == direction:
+            confidence += 0.3
+        else:
+            confidence -= 0.2
+    elif MINIMUM.search(sentence[:metric.end()]) and direction == 'min':
+        confidence += 0.3
+    if value['kind'] == expected_kind:
+        confidence += 0.1
+    else:
+        confidence -= 0.3
+    # Several values (e.g. a step-down grid) need GPT to pair them with periods
+    if len(values) > 1:
+        confidence -= 0.4
+
+    frequency = FREQUENCY_PATTERN.search(sentence)
+    if frequency:
+        confidence += 0.1
+
+    return {
+        'type': covenant_type,
+        'threshold': value['value'],
+        'description': sentence.strip(),
+        'frequency': frequency.group(0) if frequency else 'not specified',
+        'calculation_method': 'Not specified',
+        'direction': direction,
+        'confidence': round(max(0.0, min(confidence, 1.0)), 2),
+        'source': 'rules',
+    }
+
+def has_covenant_signal(sentence: str) -> bool:
+    """Whether a sentence looks like it states a covenant."""
+    return bool(COVENANT_KEYWORDS.search(sentence) and NUMERIC_THRESHOLD.search(sentence)
+                and not DEFINITION.search(sentence))
+
+def extract_rule_covenants(text: str, min_confidence: float = MIN_CONFIDENCE) -> Dict[str, Any]:
+    """Resolve covenants stated in standard forms without GPT.
+
+    Returns the confidently matched covenants and the text of the sections
+    holding covenant-like sentences that could not be resolved, which
+    still need GPT. When no covenant is resolved at all, the whole text is
+    returned as unresolved.
+    """
+    covenants = []
+    unresolved = []
+    for section in split_sections(text):
+        body = text[section['start']:section['end']]
+        resolved_section = True
+        for sentence in SENTENCE_BOUNDARY.split(body):
+            if not has_covenant_signal(sentence):
+                continue
+            covenant = match_sentence(sentence)
+            if covenant is not None and covenant['confidence'] >= min_confidence:
+                covenants.append(covenant)
+            else:
+                resolved_section = False
+        if not resolved_section:
+            unresolved.append(body)
+
+    if not covenants:
+        return {'covenants': [], 'unresolved_text': text}
+    return {'covenants': covenants, 'unresolved_text': "\n".join(unresolved)}
@@ -0,0 +1,149 @@
+"""Date-indexed step-down threshold schedules."""
+import re
+from bisect import bisect_right
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.document_processor.dates import DATE_VALUE_PATTERN, normalize_date
+from src.document_processor.thresholds import parse_thresholds
+
+# Words before a date that make it the first or last day of a step
+BOUNDARY_PATTERN = re.compile(
+    r'\b(?P<keyword>on or after|after|from|beginning(?: on)?|commencing(?: on)?|starting(?: on)?|'
+    r'on or before|prior to|before|through|to|until|ending(?: on)?)\W*(?:the\s+)?$',
+    re.IGNORECASE
+)
+
+START_KEYWORDS = ('on or after', 'after', 'from', 'beginning', 'commencing', 'starting')
+
+THEREAFTER = re.compile(r'\bthereafter\b', re.IGNORECASE)
+
+# Ordinals of each covenant's steps are offset by this much in a ScheduleIndex,
+# comfortably above date.max.toordinal()
+_ORDINAL_SPAN = 4_000_000
+
+DateLike = Union[date, str, int]
+
+def _ordinal(value: Optional[DateLike]) -> int:
+    """Day ordinal of a date, ISO string or ordinal; 0 for an open start."""
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal()
+
+def parse_condition(condition: str) -> Dict[str, Any]:
+    """First and last day of a step from its condition text.
+
+    "from January 1, 2025, through December 31, 2025" gives both bounds;
+    "ending on or before June 30, 2025" only the last day. A step that
+    says "thereafter" starts the day after the previous step ends.
+    """
+    bounds = {'start': None, 'end': None, 'thereafter': bool(THEREAFTER.search(condition or ''))}
+    for match in DATE_VALUE_PATTERN.finditer(condition or ''):
+        iso = normalize_date(match)
+        if iso is None:
+            continue
+        day = date.fromisoformat(iso)
+        boundary = BOUNDARY_PATTERN.search(condition[max(0, match.start() - 40):match.start()])
+        keyword = boundary.group('keyword').lower() if boundary else ''
+        if keyword.startswith(START_KEYWORDS):
+            bounds['start'] = day + timedelta(days=1) if keyword == 'after' else day
+        elif keyword in ('before', 'prior to'):
+            bounds['end'] = day - timedelta(days=1)
+        else:
+            bounds['end'] = day
+    return bounds
+
+def build_schedule(thresholds: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Sorted steps {'start', 'end', 'value', 'condition'} of a step-down threshold.
+
+    Steps without a start begin the day after the previous step ends; the
+    first step may be open-ended (e.g. "from the Closing Date"). Returns an
+    empty list when there is a single threshold or the steps cannot be
+    placed in time, e.g. conditions that are not about dates.
+    """
+    if not isinstance(thresholds, list) or len(thresholds) < 2:
+        return []
+    if not all(isinstance(threshold, dict) for threshold in thresholds):
+        return []
+    values, failed = parse_thresholds([threshold.get('value') for threshold in thresholds])
+    if failed.any():
+        return []
+    steps = []
+    previous_end = None
+    for index, (threshold, value) in enumerate(zip(thresholds, values.tolist())):
+        bounds = parse_condition(threshold.get('condition', ''))
+        start = bounds['start']
+        if start is None and previous_end is not None:
+            start = previous_end + timedelta(days=1)
+        if start is None and index > 0:
+            return []
+        if bounds['end'] is None and not bounds['thereafter'] and start is None:
+            return []
+        steps.append({
+            'start': start.isoformat() if start else None,
+            'end': bounds['end'].isoformat() if bounds['end'] else None,
+            'value': value,
+            'condition': threshold.get('condition'),
+        })
+        previous_end = bounds['end']
+    return sorted(steps, key=lambda step: _ordinal(step['start']))
+
+class ThresholdSchedule:
+    """Bisection lookup of the threshold in force on a date."""
+
+    def __init__(self, steps: List[Dict[str, Any]]):
+        self.starts = [_ordinal(step['start']) for step in steps]
+        self.values = [step['value'] for step in steps]
+
+    def value_at(self, on: Optional[DateLike] = None) -> Optional[float]:
+        """Value of the latest step started by ``on`` (today by default).
+
+        Dates before the first step get the first step's value.
+        """
+        if not self.values:
+            return None
+        index = bisect_right(self.starts, _ordinal(on or date.today())) - 1
+        return self.values[max(index, 0)]
+
+class ScheduleIndex:
+    """Effective thresholds of many covenants resolved in one vectorized lookup.
+
+    The steps of every covenant are laid out in one sorted array keyed by
+    covenant position and start date, so a single ``np.searchsorted``
+    finds the step in force for all covenants. Covenants without a
+    schedule resolve to their default threshold (NaN if None).
+    """
+
+    def __init__(self, schedules: Sequence[List[Dict[str, Any]]],
+                 defaults: Optional[Sequence[Optional[float]]] = None):
+        keys, values, offsets = [], [], []
+        for position, steps in enumerate(schedules):
+            offsets.append(len(keys))
+            if not steps:
+                default = defaults[position] if defaults is not None else None
+                steps = [{'start': None, 'value': np.nan if default is None else default}]
+            for step in steps:
+                keys.append(position * _ORDINAL_SPAN + _ordinal(step['start']))
+                values.append(step['value'])
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def lookup(self, on: Union[DateLike, Sequence[DateLike], None] = None) -> np.ndarray:
+        """Thresholds in force on one date, or on one date per covenant."""
+        if on is None or isinstance(on, (date, str, int)):
+            ordinals = np.full(len(self), _ordinal(on or date.today()), dtype=np.int64)
+        else:
+            ordinals = np.asarray([_ordinal(value) for value in on], dtype=np.int64)
+        queries = np.arange(len(self), dtype=np.int64) * _ORDINAL_SPAN + ordinals
+        positions = np.searchsorted(self.keys, queries, side='right') - 1
+        return self.values[np.maximum(positions, self.offsets)]
@@ -0,0 +1,106 @@
+"""Locate the covenant sections of an agreement before sending it to GPT."""
+import re
+from typing import Any, Dict, List, Tuple
+
+# Minimum covenant signals per 1,000 characters for a section without a
+# covenant heading to be kept
+MIN_SIGNAL_DENSITY = 2.0
+
+# ARTICLE headings and all-caps lines start top-level parts of the agreement
+ARTICLE_HEADING = re.compile(r'^\s*(?:ARTICLE\s+[IVXLC\d]+\b.*|[A-Z][A-Z0-9 ,;&\'()-]{3,79})$')
+
+# Section headings and numbered clauses start subsections
+SECTION_HEADING = re.compile(r'^\s*(?:Section|SECTION|§)\s*\d+(?:\.\d+)*|^\s*\d+(?:\.\d+)*\.?\s+[A-Z]')
+
+COVENANT_HEADING = re.compile(r'\b(?:financial|negative|affirmative)\s+covenants?\b', re.IGNORECASE)
+
+EXCLUDED_HEADING = re.compile(r'\b(?:definitions?|defined terms|signature|in witness whereof)\b', re.IGNORECASE)
+
+COVENANT_KEYWORDS = re.compile(
+    r'\b(?:leverage|coverage|liquidity|net worth|capital expenditures?|indebtedness|'
+    r'distributions?|restricted payments?|dividends?|ebitda|fixed charge|debt service|'
+    r'shall not (?:exceed|be less than)|not (?:exceeding|less than)|at least|minimum|maximum)\b',
+    re.IGNORECASE
+)
+
+NUMERIC_THRESHOLD = re.compile(
+    r'\d+(?:\.\d+)?\s*:\s*1(?:\.0+)?\b|\b\d+(?:\.\d+)?x\b|\$\s?\d[\d,]*(?:\.\d+)?|\b\d+(?:\.\d+)?\s?%'
+    r'|\b(?:USD|EUR|GBP)\s?\d[\d,]*'
+)
+
+def split_sections(text: str) -> List[Dict[str, Any]]:
+    """Split text at heading lines into sections with their character spans."""
+    sections = []
+    current = {'start': 0, 'heading': '', 'level': 0}
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        level = None
+        if stripped and len(stripped) <= 100:
+            if ARTICLE_HEADING.match(stripped):
+                level = 0
+            elif SECTION_HEADING.match(stripped):
+                level = 1
+        if level is not None and offset > current['start']:
+            current['end'] = offset
+            sections.append(current)
+            current = {'start': offset, 'heading': stripped, 'level': level}
+        elif level is not None:
+            current.update(heading=stripped, level=level)
+        offset += len(line)
+    current['end'] = len(text)
+    sections.append(current)
+    return sections
+
+def _section_is_relevant(text: str, section: Dict[str, Any]) -> bool:
+    heading = section['heading']
+    if EXCLUDED_HEADING.search(heading):
+        return False
+    if COVENANT_HEADING.search(heading):
+        return True
+    body = text[section['start']:section['end']]
+    if not body.strip():
+        return False
+    keywords = len(COVENANT_KEYWORDS.findall(body))
+    numbers = len(NUMERIC_THRESHOLD.findall(body))
+    if not keywords or not numbers:
+        return False
+    return 1000.0 * (keywords + numbers) / len(body) >= MIN_SIGNAL_DENSITY
+
+def _merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def locate_covenant_sections(text: str) -> Dict[str, Any]:
+    """Select the spans of an agreement likely to state covenants.
+
+    Sections under a top-level Financial/Negative/Affirmative Covenants
+    heading are kept whole; other sections are kept when covenant keywords
+    and numeric thresholds are dense enough. Definitions and signature
+    pages are dropped. If nothing qualifies, the whole text is returned.
+    """
+    sections = split_sections(text)
+    spans = []
+    in_covenant_article = False
+    for section in sections:
+        if section['level'] == 0:
+            in_covenant_article = bool(COVENANT_HEADING.search(section['heading']))
+        if in_covenant_article or _section_is_relevant(text, section):
+            spans.append((section['start'], section['end']))
+
+    spans = _merge_spans(spans)
+    if not spans:
+        spans = [(0, len(text))]
+    kept = sum(end - start for start, end in spans)
+    return {
+        'text': "\n".join(text[start:end] for start, end in spans),
+        'spans': spans,
+        'kept_chars': kept,
+        'total_chars': len(text),
+        'kept_fraction': kept / len(text) if text else 1.0,
+    }
@@ -0,0 +1,28 @@
+"""Remote storage of uploaded documents."""
+import logging
+import os
+from typing import BinaryIO, Optional, Union
+
+import cloudinary.uploader
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = ["pdf", "doc", "docx"]
+
+def upload_document(source: Union[str, BinaryIO], project_id, filename: Optional[str] = None) -> str:
+    """Upload a document, given as a path or an open file, to Cloudinary and return its URL.
+
+    An in-memory stream has no name of its own, so pass ``filename`` to keep
+    the original name and extension on the stored file.
+    """
+    filename = filename or os.path.basename(getattr(source, 'name', source))
+    logger.info(f"Uploading {filename} to Cloudinary")
+    result = cloudinary.uploader.upload(
+        source,
+        filename=filename,
+        folder=f"covenant-monitor/documents/{project_id}",
+        resource_type="raw",
+        allowed_formats=ALLOWED_FORMATS
+    )
+    logger.debug(f"Cloudinary upload result: {result}")
+    return result['secure_url']
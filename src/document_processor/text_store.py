@@ -0,0 +1,218 @@
+"""Compressed, content-addressed store of extracted document text."""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import closing
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.getenv('TEXT_STORE_PATH', os.path.join('instance', 'text_store.db'))
+COMPRESSION_LEVEL = int(os.getenv('TEXT_STORE_COMPRESSION_LEVEL', 6))
+
+# Bytes of the store file SQLite may memory-map for reads
+MMAP_BYTES = int(os.getenv('TEXT_STORE_MMAP_BYTES', 256 * 1024 * 1024))
+
+def page_hash(text: str) -> str:
+    """Content address of one page of text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class StoredText:
+    """Lazy view of a stored document's text.
+
+    Only the list of page hashes is loaded up front; each page is read and
+    decompressed when it is asked for.
+    """
+
+    def __init__(self, store: 'TextStore', key: str, pages: List[str], chars: int):
+        self.store = store
+        self.key = key
+        self.page_hashes = pages
+        self.chars = chars
+
+    def __len__(self) -> int:
+        return self.chars
+
+    @property
+    def page_count(self) -> int:
+        return len(self.page_hashes)
+
+    def page(self, index: int) -> str:
+        """Text of one page."""
+        return self.store.read_pages([self.page_hashes[index]])[0]
+
+    def iter_pages(self) -> Iterator[str]:
+        """Yield the text of each page in order."""
+        for digest in self.page_hashes:
+            yield self.store.read_pages([digest])[0]
+
+    def text(self) -> str:
+        """The whole document text."""
+        return "".join(self.store.read_pages(self.page_hashes))
+
+class TextStore:
+    """SQLite side store of zlib-compressed page text keyed by document hash.
+
+    Pages are stored once per distinct content, so an amendment repeating
+    most of its predecessor's pages only adds the pages that changed. A
+    document entry is the ordered list of its page hashes. The section
+    fingerprints amendments are diffed against are kept alongside, so they
+    stay out of the document table too.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_STORE_PATH, level: int = COMPRESSION_LEVEL):
+        self.db_path = db_path
+        self.level = level
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS text_page (
+                    hash TEXT PRIMARY KEY,
+                    chars INTEGER NOT NULL,
+                    data BLOB NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_text (
+                    document_hash TEXT PRIMARY KEY,
+                    pages TEXT NOT NULL,
+                    chars INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_sections (
+                    document_hash TEXT PRIMARY KEY,
+                    sections TEXT NOT NULL
+                )
+            """)
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the store with memory-mapped reads."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute(f"PRAGMA mmap_size = {int(MMAP_BYTES)}")
+        return conn
+
+    def put(self, document_hash: str, pages: Sequence[str]) -> Optional[Dict[str, object]]:
+        """Store a document's pages; returns its key, page count and length."""
+        hashes = [page_hash(page) for page in pages]
+        chars = sum(len(page) for page in pages)
+        try:
+            with closing(self.connect()) as conn, conn:
+                known = set()
+                for start in range(0, len(hashes), 500):
+                    batch = hashes[start:start + 500]
+                    rows = conn.execute(
+                        f"SELECT hash FROM text_page WHERE hash IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    known.update(row[0] for row in rows)
+                new_pages = {}
+                for digest, page in zip(hashes, pages):
+                    if digest not in known and digest not in new_pages:
+                        new_pages[digest] = (digest, len(page), zlib.compress(page.encode('utf-8'), self.level))
+                conn.executemany("INSERT OR IGNORE INTO text_page (hash, chars, data) VALUES (?, ?, ?)",
+                                 new_pages.values())
+                conn.execute(
+                    "INSERT OR REPLACE INTO document_text (document_hash, pages, chars, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (document_hash, json.dumps(hashes), chars, time.time())
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error writing text store: {str(e)}")
+            return None
+        logger.info(f"Stored text of {document_hash[:12]}: {len(hashes)} pages, "
+                    f"{len(new_pages)} new after de-duplication")
+        return {'key': document_hash, 'pages': len(hashes), 'chars': chars}
+
+    def get(self, document_hash: str) -> Optional[StoredText]:
+        """Lazy view of a document's text, or None if it was not stored."""
+        try:
+            with closing(self.connect()) as conn:
+                row = conn.execute("SELECT pages, chars FROM document_text WHERE document_hash = ?",
+                                   (document_hash,)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading text store: {str(e)}")
+            return None
+        if row is None:
+            return None
+        return StoredText(self, document_hash, json.loads(row[0]), row[1])
+
+    def put_sections(self, document_hash: str, sections: List[Dict[str, Any]]) -> bool:
+        """Store a document's section fingerprints; False if the write failed."""
+        try:
+            with closing(self.connect()) as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO document_sections (document_hash, sections) VALUES (?, ?)",
+                             (document_hash, json.dumps(sections)))
+        except sqlite3.Error as e:
+            logger.error(f"Error writing text store: {str(e)}")
+            return False
+        return True
+
+    def get_sections(self, document_hash: str) -> Optional[List[Dict[str, Any]]]:
+        """A document's section fingerprints, or None if they were not stored."""
+        try:
+            with closing(self.connect()) as conn:
+                row = conn.execute("SELECT sections FROM document_sections WHERE document_hash = ?",
+                                   (document_hash,)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading text store: {str(e)}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def read_pages(self, hashes: Sequence[str]) -> List[str]:
+        """Decompressed text of pages in the given order."""
+        with closing(self.connect()) as conn:
+            found = {}
+            distinct = list(dict.fromkeys(hashes))
+            for start in range(0, len(distinct), 500):
+                batch = distinct[start:start + 500]
+                for digest, data in conn.execute(
+                        f"SELECT hash, data FROM text_page WHERE hash IN ({','.join('?' * len(batch))})", batch):
+                    found[digest] = zlib.decompress(data).decode('utf-8')
+        return [found[digest] for digest in hashes]
+
+    def delete(self, document_hash: str) -> int:
+        """Remove a document entry and any pages no other document uses."""
+        with closing(self.connect()) as conn, conn:
+            conn.execute("DELETE FROM document_text WHERE document_hash = ?", (document_hash,))
+            conn.execute("DELETE FROM document_sections WHERE document_hash = ?", (document_hash,))
+            used = set()
+            for (pages,) in conn.execute("SELECT pages FROM document_text"):
+                used.update(json.loads(pages))
+            orphans = [(digest,) for (digest,) in conn.execute("SELECT hash FROM text_page")
+                       if digest not in used]
+            conn.executemany("DELETE FROM text_page WHERE hash = ?", orphans)
+        return len(orphans)
+
+    def stats(self) -> Dict[str, int]:
+        """Documents, distinct pages and stored bytes against uncompressed characters."""
+        with closing(self.connect()) as conn:
+            documents, document_chars = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chars), 0) FROM document_text").fetchone()
+            pages, page_chars, stored_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chars), 0), COALESCE(SUM(LENGTH(data)), 0) FROM text_page"
+            ).fetchone()
+        return {
+            'documents': documents,
+            'document_chars': document_chars,
+            'pages': pages,
+            'page_chars': page_chars,
+            'stored_bytes': stored_bytes,
+        }
+
+_default_store = None
+
+def get_text_store() -> Optional[TextStore]:
+    """Return the process-wide text store, or None when disabled."""
+    global _default_store
+    if os.getenv('TEXT_STORE_DISABLED', '').lower() in ('1', 'true', 'yes'):
+        return None
+    if _default_store is None:
+        _default_store = TextStore()
+    return _default_store
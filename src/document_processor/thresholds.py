@@ -0,0 +1,110 @@
+"""Batch parsing of covenant threshold strings."""
+import math
+import re
+from typing import Any, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+SCALES = {
+    'k': 1e3, 'thousand': 1e3,
+    'm': 1e6, 'mm': 1e6, 'mn': 1e6, 'million': 1e6,
+    'b': 1e9, 'bn': 1e9, 'billion': 1e9,
+}
+
+# One number with its optional sign, currency, scale and unit: "$25 million",
+# "EUR 10mm", "3.50x", "3.50:1.00", "3.50 to 1.00", "12.5%", "-2.0", "($5 million)".
+# Enumeration markers such as "(1)" are skipped when more text follows them.
+THRESHOLD_PATTERN = re.compile(
+    r'(?!\(?\d{1,3}\)\s*\S)'
+    r'(?:(?<![\w.])(?P<sign>[-\u2212(]))?\s*'
+    r'(?P<currency>[$€£]|\b(?:usd|eur|gbp|cad|chf)\b)?\s*'
+    r'(?P<number>\d[\d,]*(?:\.\d+)?|\.\d+)\s*'
+    r'(?:(?P<scale>thousand|million|billion|mm|mn|bn|k|m|b)\b\.?)?\s*'
+    r'(?:(?P<percent>%|percent\b)|(?P<multiple>x\b|times\b)|'
+    r'(?::|\bto\b)\s*(?P<denominator>\d+(?:\.\d+)?)\s*x?)?'
+    r'(?P<close>\s*\))?',
+    re.IGNORECASE
+)
+
+def match_value(match: re.Match) -> float:
+    """Value of one THRESHOLD_PATTERN match, by the same rules as parse_thresholds; NaN if not finite."""
+    number = float(match.group('number').replace(',', ''))
+    if match.group('denominator') is not None:
+        denominator = float(match.group('denominator'))
+        value = number / denominator if denominator else math.nan
+    else:
+        value = number * SCALES.get((match.group('scale') or '').lower(), 1.0)
+    if match.group('percent'):
+        value /= 100
+    sign = match.group('sign')
+    if sign in ('-', '\u2212') or (sign == '(' and match.group('close') and
+                                   (match.group('currency') or match.group('scale') or match.group('percent'))):
+        value = -value
+    return value if math.isfinite(value) else math.nan
+
+def _parse_unique(strings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse distinct strings with one vectorized regex pass and NumPy arithmetic."""
+    parts = pd.Series(strings, dtype=object).str.extract(THRESHOLD_PATTERN)
+    number = pd.to_numeric(parts['number'].str.replace(',', '', regex=False), errors='coerce').to_numpy(np.float64)
+    scale = parts['scale'].str.lower().map(SCALES).fillna(1.0).to_numpy(np.float64)
+    denominator = pd.to_numeric(parts['denominator'], errors='coerce').to_numpy(np.float64)
+    percent = parts['percent'].notna().to_numpy()
+    sign = parts['sign'].fillna('').to_numpy(dtype=object)
+    closed = parts['close'].notna().to_numpy()
+    # Parentheses only mark a negative amount or percentage, not a bare number or ratio
+    accounting = (parts['currency'].notna() | parts['scale'].notna()).to_numpy() | percent
+
+    values = number * scale
+    ratio = ~np.isnan(denominator)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = np.where(ratio, number / denominator, values)
+    values = np.where(percent, values / 100, values)
+    negative = (sign == '-') | (sign == '\u2212') | ((sign == '(') & closed & accounting)
+    values = np.where(negative, -values, values)
+    failed = ~np.isfinite(values)
+    return np.where(failed, np.nan, values), failed
+
+def parse_thresholds(values: Sequence[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """Normalize a column of thresholds to floats.
+
+    Handles currency symbols and codes, scale words (thousand/million/
+    billion, k/mm/bn), multiples ("3.50x"), ratios ("3.50:1.00"),
+    percentages (returned as fractions) and negatives written with a
+    leading minus or in parentheses. Numbers pass through unchanged.
+    Returns the values and a mask of entries that could not be parsed,
+    whose values are NaN. Each distinct value is parsed once, so columns
+    with many repeats stay cheap.
+    """
+    codes, unique = pd.factorize(pd.Series(list(values), dtype=object))
+    unique = np.asarray(unique, dtype=object)
+    parsed = np.full(len(unique), np.nan, dtype=np.float64)
+    unparsed = np.ones(len(unique), dtype=bool)
+
+    numeric = np.array([isinstance(v, (int, float)) and not isinstance(v, bool) for v in unique], dtype=bool)
+    if numeric.any():
+        parsed[numeric] = unique[numeric].astype(np.float64)
+        unparsed[numeric] = np.isnan(parsed[numeric])
+    strings = np.array([isinstance(v, str) for v in unique], dtype=bool)
+    if strings.any():
+        parsed[strings], unparsed[strings] = _parse_unique(unique[strings])
+
+    # Missing values (None, NaN) have code -1
+    missing = codes < 0
+    result = np.where(missing, np.nan, parsed[codes])
+    failed = np.where(missing, True, unparsed[codes])
+    return result, failed
+
+def parse_threshold(value: Any) -> float:
+    """Parse a single threshold; NaN if it cannot be parsed.
+
+    Same rules as parse_thresholds without its pandas overhead, for callers
+    parsing values one at a time.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        match = THRESHOLD_PATTERN.search(value)
+        if match:
+            return match_value(match)
+    return math.nan
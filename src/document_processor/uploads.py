@@ -0,0 +1,124 @@
+"""Spooled buffers for uploaded documents, hashed while they are read."""
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Optional
+
+logger = logging.getLogger(__name__)
+
+# Uploads up to this many bytes stay in memory; larger ones are written to disk as they arrive
+UPLOAD_MEMORY_LIMIT = int(os.getenv('UPLOAD_MEMORY_LIMIT', 8 * 1024 * 1024))
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Bytes of queued uploads kept in memory for the workers; the oldest are
+# dropped first and read back from disk instead
+UPLOAD_HELD_BYTES = int(os.getenv('UPLOAD_HELD_BYTES', 64 * 1024 * 1024))
+
+class SpooledUpload:
+    """An uploaded file held in memory, or at ``path`` once it outgrows the limit.
+
+    The SHA-256 and size are computed while the request stream is read.
+    Readers from ``open()`` share the buffer rather than copying it, so the
+    storage uploader and the parser can read it concurrently.
+    """
+
+    def __init__(self, path: str, limit: int = UPLOAD_MEMORY_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.size = 0
+        self.sha256 = None
+        self._digest = hashlib.sha256()
+        self._buffer: Optional[io.BytesIO] = io.BytesIO()
+        self._file: Optional[BinaryIO] = None
+        self._content: Optional[bytes] = None
+        self.on_disk = False
+
+    @classmethod
+    def read(cls, stream: BinaryIO, path: str, limit: int = UPLOAD_MEMORY_LIMIT,
+             chunk_size: int = UPLOAD_CHUNK_SIZE) -> 'SpooledUpload':
+        """Consume a request stream into a new upload."""
+        upload = cls(path, limit)
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            upload.write(chunk)
+        upload.finish()
+        return upload
+
+    def write(self, chunk: bytes):
+        """Append a chunk, spilling to disk when the limit is passed."""
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        if self._buffer is not None and self.size > self.limit:
+            self._file = open(self.path, 'wb')
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+            self.on_disk = True
+            logger.info(f"Upload larger than {self.limit} bytes, spooling to {self.path}")
+        if self._buffer is not None:
+            self._buffer.write(chunk)
+        else:
+            self._file.write(chunk)
+
+    def finish(self):
+        """Complete the upload once the stream is exhausted."""
+        self.sha256 = self._digest.hexdigest()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._buffer is not None:
+            self._content = self._buffer.getvalue()
+            self._buffer = None
+
+    @property
+    def in_memory(self) -> bool:
+        return self._content is not None
+
+    @property
+    def content(self) -> Optional[bytes]:
+        """The file's bytes while it is held in memory."""
+        return self._content
+
+    def open(self) -> BinaryIO:
+        """An independent reader positioned at the start of the file."""
+        if self._content is not None:
+            # BytesIO shares an initial bytes object until it is written to
+            return io.BytesIO(self._content)
+        return open(self.path, 'rb')
+
+    def persist(self) -> str:
+        """Make sure the file exists at ``path``, writing the buffer once if needed."""
+        if not self.on_disk:
+            with open(self.path, 'wb') as f:
+                f.write(self._content)
+            self.on_disk = True
+        return self.path
+
+    def discard(self):
+        """Release the buffer and remove any file on disk."""
+        self._content = None
+        if self.on_disk and os.path.exists(self.path):
+            os.remove(self.path)
+        self.on_disk = False
+
+# Uploads queued by the route, kept so a worker in the same process can skip
+# reading the persisted file back
+_held = OrderedDict()
+_held_lock = threading.Lock()
+
+def hold(upload: SpooledUpload):
+    """Keep an in-memory upload for the worker that processes it."""
+    if not upload.in_memory:
+        return
+    with _held_lock:
+        _held[upload.path] = upload
+        # Jobs picked up by another process never take theirs
+        while sum(held.size for held in _held.values()) > UPLOAD_HELD_BYTES:
+            _held.popitem(last=False)
+
+def take(path: str) -> Optional[SpooledUpload]:
+    """The held upload for ``path``, if this process still has it."""
+    with _held_lock:
+        return _held.pop(path, None)
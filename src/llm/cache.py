@@ -0,0 +1,213 @@
+"""Persistent cache of LLM responses shared by every caller."""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.llm.metrics import get_llm_metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join('instance', 'llm_cache.db'))
+DEFAULT_TTL_SECONDS = int(os.getenv('LLM_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+DEFAULT_MEMORY_ENTRIES = int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', 1024))
+CACHE_DISABLED = os.getenv('LLM_CACHE_DISABLED', '').lower() in ('1', 'true', 'yes')
+
+_bypass = ContextVar('llm_cache_bypass', default=False)
+
+def normalize_prompt(text: str) -> str:
+    """Collapse whitespace so formatting-only prompt changes share a key."""
+    return re.sub(r'\s+', ' ', text or '').strip()
+
+def cache_key(model: str, messages: List[Dict[str, str]], temperature: float) -> str:
+    """Hash of the model, sampling temperature and normalized messages."""
+    payload = json.dumps({
+        'model': model,
+        'temperature': temperature,
+        'messages': [[m.get('role'), normalize_prompt(m.get('content'))] for m in messages],
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class LLMResponseCache:
+    """In-memory LRU in front of an SQLite store of completion contents."""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, ttl: int = DEFAULT_TTL_SECONDS,
+                 memory_entries: int = DEFAULT_MEMORY_ENTRIES, enabled: bool = not CACHE_DISABLED):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.enabled = enabled
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with closing(self.connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_expires_at ON llm_cache (expires_at)")
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the cache database."""
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @property
+    def active(self) -> bool:
+        """Whether lookups and stores are currently performed."""
+        return self.enabled and not _bypass.get()
+
+    @contextmanager
+    def bypass(self):
+        """Skip the cache for calls made inside this block."""
+        token = _bypass.set(True)
+        try:
+            yield
+        finally:
+            _bypass.reset(token)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on a miss or expired entry."""
+        if not self.active:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return response
+                del self._memory[key]
+
+        row = None
+        try:
+            with closing(self.connect()) as conn:
+                row = conn.execute(
+                    "SELECT response, expires_at FROM llm_cache WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading LLM cache: {str(e)}")
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, row[0], row[1])
+        return row[0]
+
+    def put(self, key: str, model: str, response: str, ttl: Optional[int] = None):
+        """Store a response for ``ttl`` seconds (the cache default if None)."""
+        if not self.active:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, response, expires_at)
+        try:
+            with closing(self.connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, model, response, now, expires_at)
+                )
+                conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            logger.error(f"Error writing LLM cache: {str(e)}")
+
+    def _remember(self, key: str, response: str, expires_at: float):
+        """Add an entry to the in-memory LRU; caller holds the lock."""
+        self._memory[key] = (response, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached response."""
+        with self._lock:
+            self._memory.clear()
+        with closing(self.connect()) as conn, conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def stats(self) -> Dict[str, int]:
+        """Hit and miss counters since the cache was created."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_hits': self.memory_hits,
+                'memory_entries': len(self._memory),
+            }
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMResponseCache:
+    """Return the process-wide LLM response cache."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMResponseCache()
+        return _default_cache
+
+def is_valid(content: str, validate: Optional[Callable[[str], Any]]) -> bool:
+    """Whether a response passes the caller's validation and may be cached."""
+    if validate is None:
+        return True
+    try:
+        validate(content)
+        return True
+    except Exception:
+        return False
+
+def cached_completion(create: Callable, model: str, messages: List[Dict[str, str]],
+                      temperature: float = 0.1, ttl: Optional[int] = None,
+                      validate: Optional[Callable[[str], Any]] = None,
+                      stage: str = 'unspecified') -> Tuple[str, bool]:
+    """Return (content, cache_hit) for a chat completion, calling ``create`` on a miss.
+
+    ``create`` is a ``chat.completions.create`` callable from either the
+    OpenAI client or the ``openai`` module. Responses are only stored if
+    ``validate`` (e.g. ``json.loads``) accepts them, so a malformed answer
+    is retried next time rather than replayed. Every call is recorded in
+    the LLM metrics under ``stage``.
+    """
+    metrics = get_llm_metrics()
+    cache = get_llm_cache()
+    key = cache_key(model, messages, temperature)
+    start = time.perf_counter()
+    content = cache.get(key)
+    if content is not None:
+        metrics.record(model, stage, time.perf_counter() - start, cache_hit=True)
+        return content, True
+    start = time.perf_counter()
+    response = create(model=model, messages=messages, temperature=temperature)
+    usage = getattr(response, 'usage', None)
+    metrics.record(model, stage, time.perf_counter() - start,
+                   prompt_tokens=getattr(usage, 'prompt_tokens', None),
+                   completion_tokens=getattr(usage, 'completion_tokens', None))
+    content = response.choices[0].message.content
+    if is_valid(content, validate):
+        cache.put(key, model, content, ttl=ttl)
+    return content, False
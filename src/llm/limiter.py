@@ -0,0 +1,107 @@
+"""Process-wide concurrency and token-rate limiting for async LLM calls."""
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from src.llm.metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+TOKENS_PER_MINUTE = int(os.getenv('LLM_TOKENS_PER_MINUTE', 40000))
+
+# Completion tokens reserved per call before the real usage is known
+EXPECTED_COMPLETION_TOKENS = int(os.getenv('LLM_EXPECTED_COMPLETION_TOKENS', 1000))
+
+def estimate_tokens(messages: List[Dict[str, str]],
+                    completion_tokens: int = EXPECTED_COMPLETION_TOKENS) -> int:
+    """Rough token estimate for a request: ~4 characters per prompt token."""
+    prompt_chars = sum(len(message.get('content') or '') for message in messages)
+    return prompt_chars // 4 + completion_tokens
+
+class TokenBudget:
+    """Token bucket refilled continuously up to ``tokens_per_minute``."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: int):
+        """Wait until ``tokens`` are available and take them."""
+        tokens = min(tokens, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return
+            await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def adjust(self, tokens: int):
+        """Charge (or refund, if negative) the difference from an estimate."""
+        self._refill()
+        self.tokens -= tokens
+
+class Reservation:
+    """Tokens reserved for one in-flight call."""
+
+    def __init__(self, budget: TokenBudget, estimated: int):
+        self.budget = budget
+        self.estimated = estimated
+
+    def record_usage(self, actual: Optional[int]):
+        """Reconcile the reservation with the tokens the call actually used."""
+        if actual is not None:
+            self.budget.adjust(actual - self.estimated)
+
+class AsyncLLMLimiter:
+    """Bounds in-flight LLM calls and their token rate across the process.
+
+    The asyncio primitives are bound to the running event loop, so they are
+    recreated if the limiter is used from a new loop. The token budget
+    itself carries over.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY,
+                 tokens_per_minute: int = TOKENS_PER_MINUTE):
+        self.max_concurrency = max_concurrency
+        self.budget = TokenBudget(tokens_per_minute)
+        self.latency = LatencyStats()
+        self._loop = None
+        self._semaphore = None
+        self._budget_lock = None
+
+    def _bind(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._budget_lock = asyncio.Lock()
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        """Hold one concurrency slot and reserve tokens for a call."""
+        self._bind()
+        async with self._semaphore:
+            # The lock makes waiters take tokens in arrival order
+            async with self._budget_lock:
+                await self.budget.acquire(estimated_tokens)
+            yield Reservation(self.budget, estimated_tokens)
+
+_limiter = None
+
+def get_async_limiter() -> AsyncLLMLimiter:
+    """Return the process-wide limiter."""
+    global _limiter
+    if _limiter is None:
+        _limiter = AsyncLLMLimiter()
+    return _limiter
@@ -0,0 +1,214 @@
+"""Latency, token and cost metrics for LLM calls."""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from typing import Any, Callable, Dict, Optional
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+class LatencyStats:
+    """Thread-safe per-stage record of call latencies in seconds."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(list)
+
+    def record(self, stage: str, seconds: float):
+        """Record the latency of one call."""
+        with self._lock:
+            self._latencies[stage].append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, mean, p50, p95 and max latency in milliseconds per stage."""
+        with self._lock:
+            latencies = {stage: list(values) for stage, values in self._latencies.items()}
+        return {
+            stage: {
+                'count': len(values),
+                'mean_ms': 1000 * sum(values) / len(values),
+                'p50_ms': 1000 * percentile(values, 0.50),
+                'p95_ms': 1000 * percentile(values, 0.95),
+                'max_ms': 1000 * max(values),
+            }
+            for stage, values in latencies.items()
+        }
+
+    def reset(self):
+        """Forget all recorded latencies."""
+        with self._lock:
+            self._latencies.clear()
+
+# USD per 1,000 prompt and completion tokens, matched by model name prefix
+MODEL_PRICES = {
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-4o': (0.005, 0.015),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4-1106': (0.01, 0.03),
+    'gpt-4-32k': (0.06, 0.12),
+    'gpt-4': (0.03, 0.06),
+    'gpt-3.5-turbo': (0.0005, 0.0015),
+}
+
+# Most recent calls kept for the metrics endpoint, and the number of
+# documents and runs with a retained rollup
+MAX_RECENT_CALLS = int(os.getenv('LLM_METRICS_RECENT_CALLS', 200))
+MAX_ROLLUP_KEYS = int(os.getenv('LLM_METRICS_ROLLUP_KEYS', 500))
+
+call_logger = logging.getLogger('llm.calls')
+
+_scopes = ContextVar('llm_scopes', default=())
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Approximate USD cost of a call; 0.0 for models without a known price."""
+    for prefix in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(prefix):
+            prompt_price, completion_price = MODEL_PRICES[prefix]
+            return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+    return 0.0
+
+class UsageRollup:
+    """Aggregated calls, tokens, cost and latency, overall and per stage."""
+
+    FIELDS = ('calls', 'cache_hits', 'prompt_tokens', 'completion_tokens', 'cost_usd', 'latency_ms')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = dict.fromkeys(self.FIELDS, 0)
+        self.by_stage = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+
+    def add(self, record: Dict[str, Any]):
+        """Add one call record."""
+        values = {
+            'calls': 1,
+            'cache_hits': 1 if record['cache_hit'] else 0,
+            'prompt_tokens': record['prompt_tokens'],
+            'completion_tokens': record['completion_tokens'],
+            'cost_usd': record['cost_usd'],
+            'latency_ms': record['latency_ms'],
+        }
+        with self._lock:
+            for bucket in (self.totals, self.by_stage[record['stage']]):
+                for field, value in values.items():
+                    bucket[field] += value
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Plain-dict copy of the rollup."""
+        with self._lock:
+            return {
+                **{field: round(value, 6) if isinstance(value, float) else value
+                   for field, value in self.totals.items()},
+                'by_stage': {stage: dict(values) for stage, values in self.by_stage.items()},
+            }
+
+@contextmanager
+def llm_scope(document: Optional[str] = None, run: Optional[str] = None):
+    """Attribute LLM calls made inside the block to a document or run.
+
+    Yields a UsageRollup of just the calls made in this scope. Scopes nest,
+    so a document processed during a run counts towards both.
+    """
+    rollup = UsageRollup()
+    token = _scopes.set(_scopes.get() + ((document, run, rollup),))
+    try:
+        yield rollup
+    finally:
+        _scopes.reset(token)
+
+def in_current_scope(func: Callable) -> Callable:
+    """Wrap ``func`` so calls from worker threads keep the caller's scopes."""
+    context = copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return run
+
+class LLMMetrics:
+    """Process-wide record of LLM calls with rollups by stage, model, document and run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget all recorded calls."""
+        with self._lock:
+            self.totals = UsageRollup()
+            self.by_model = defaultdict(UsageRollup)
+            self.by_document = OrderedDict()
+            self.by_run = OrderedDict()
+            self.recent = deque(maxlen=MAX_RECENT_CALLS)
+
+    def record(self, model: str, stage: str, latency: float, cache_hit: bool = False,
+               prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None) -> Dict[str, Any]:
+        """Record one call and emit it as a structured log line."""
+        prompt_tokens = prompt_tokens or 0
+        completion_tokens = completion_tokens or 0
+        scopes = _scopes.get()
+        document = next((d for d, _, _ in reversed(scopes) if d), None)
+        run = next((r for _, r, _ in reversed(scopes) if r), None)
+        record = {
+            'timestamp': time.time(),
+            'model': model,
+            'stage': stage,
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'cost_usd': 0.0 if cache_hit else estimate_cost(model, prompt_tokens, completion_tokens),
+            'latency_ms': round(1000 * latency, 3),
+            'cache_hit': cache_hit,
+            'document': document,
+            'run': run,
+        }
+        with self._lock:
+            rollups = [self.totals, self.by_model[model]]
+            if document:
+                rollups.append(self._keyed(self.by_document, document))
+            if run:
+                rollups.append(self._keyed(self.by_run, run))
+            self.recent.append(record)
+        rollups.extend(rollup for _, _, rollup in scopes)
+        for rollup in rollups:
+            rollup.add(record)
+        call_logger.info(json.dumps(record))
+        return record
+
+    def _keyed(self, rollups: OrderedDict, key: str) -> UsageRollup:
+        """Rollup for a document or run, evicting the oldest beyond MAX_ROLLUP_KEYS."""
+        if key not in rollups:
+            rollups[key] = UsageRollup()
+            while len(rollups) > MAX_ROLLUP_KEYS:
+                rollups.popitem(last=False)
+        rollups.move_to_end(key)
+        return rollups[key]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Everything recorded so far, as plain dicts."""
+        with self._lock:
+            by_model = dict(self.by_model)
+            by_document = dict(self.by_document)
+            by_run = dict(self.by_run)
+            recent = list(self.recent)
+        return {
+            'totals': self.totals.as_dict(),
+            'by_model': {key: rollup.as_dict() for key, rollup in by_model.items()},
+            'by_document': {key: rollup.as_dict() for key, rollup in by_document.items()},
+            'by_run': {key: rollup.as_dict() for key, rollup in by_run.items()},
+            'recent_calls': recent,
+        }
+
+_metrics = LLMMetrics()
+
+def get_llm_metrics() -> LLMMetrics:
+    """Return the process-wide LLM call metrics."""
+    return _metrics
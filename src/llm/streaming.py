@@ -0,0 +1,77 @@
+"""Incremental parsing of JSON arrays streamed by the LLM."""
+import json
+import logging
+from typing import Any, List
+
+logger = logging.getLogger(__name__)
+
+class JSONArrayStream:
+    """Emit the objects of a JSON array as soon as each one closes.
+
+    Text before the first opening bracket, such as prose or a ```json
+    fence, is skipped. An object that fails to decode is logged and
+    skipped, so a malformed character costs that object rather than the
+    whole array. An object cut off by a truncated response is never
+    emitted; ``complete`` tells whether the closing bracket arrived.
+    """
+
+    def __init__(self):
+        self._object = []
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.complete = False
+        self.skipped = 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume a chunk of the response and return the objects it closed."""
+        objects = []
+        for char in chunk:
+            if self.complete:
+                break
+            if not self._started:
+                self._started = char == '['
+                continue
+            if self._depth == 0:
+                # Between elements: only the start of an object or the end of the array matter
+                if char == '{':
+                    self._depth = 1
+                    self._object = ['{']
+                elif char == ']':
+                    self.complete = True
+                continue
+
+            self._object.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(''.join(self._object), objects)
+        return objects
+
+    def _emit(self, text: str, objects: List[Any]):
+        try:
+            objects.append(json.loads(text))
+        except ValueError as e:
+            self.skipped += 1
+            logger.warning(f"Skipping malformed object in streamed response: {str(e)}")
+
+    @property
+    def pending(self) -> bool:
+        """Whether an object was started but not closed."""
+        return self._depth > 0
+
+def recover_json_array(content: str) -> List[Any]:
+    """Every complete object of a possibly malformed or truncated JSON array."""
+    return JSONArrayStream().feed(content or '')
@@ -0,0 +1,106 @@
+"""Triggers keeping the document and covenant counters on projects and documents current.
+
+The counters are maintained by the database rather than the ORM so that
+bulk inserts, bulk updates and query deletes keep them right as well.
+"""
+from typing import List
+
+# Covenant statuses with their own counter; the rest are only in covenant_count
+COUNTED_STATUSES = ('compliant', 'warning', 'breach')
+
+COVENANT_COUNTERS = ['covenant_count'] + [f"{status}_count" for status in COUNTED_STATUSES]
+
+def _covenant_deltas(row: str, sign: str, is_status) -> str:
+    """SET clause adding (sign '+') or removing (sign '-') covenant ``row`` from the counters."""
+    return ", ".join(
+        ["covenant_count = covenant_count " + sign + " 1"]
+        + [f"{status}_count = {status}_count {sign} {is_status(f'{row}.compliance_status', status)}"
+           for status in COUNTED_STATUSES]
+    )
+
+def _covenant_statements(row: str, sign: str, is_status) -> List[str]:
+    deltas = _covenant_deltas(row, sign, is_status)
+    return [
+        f"UPDATE document SET {deltas} WHERE id = {row}.document_id;",
+        f"UPDATE project SET {deltas} WHERE id = (SELECT project_id FROM document WHERE id = {row}.document_id);",
+    ]
+
+def _document_removal(row: str) -> str:
+    # Covenants left behind by a document delete can no longer reach the project
+    counters = ", ".join(f"{counter} = {counter} - {row}.{counter}" for counter in COVENANT_COUNTERS)
+    return f"UPDATE project SET document_count = document_count - 1, {counters} WHERE id = {row}.project_id;"
+
+def _sqlite_triggers() -> List[str]:
+    is_status = lambda column, status: f"({column} IS '{status}')"
+    body = lambda statements: "BEGIN\n" + "\n".join(statements) + "\nEND"
+    return [
+        "CREATE TRIGGER IF NOT EXISTS document_counters_insert AFTER INSERT ON document\n" + body([
+            "UPDATE project SET document_count = document_count + 1 WHERE id = NEW.project_id;"]),
+        "CREATE TRIGGER IF NOT EXISTS document_counters_delete AFTER DELETE ON document\n" + body([
+            _document_removal('OLD')]),
+        "CREATE TRIGGER IF NOT EXISTS covenant_counters_insert AFTER INSERT ON covenant\n" + body(
+            _covenant_statements('NEW', '+', is_status)),
+        "CREATE TRIGGER IF NOT EXISTS covenant_counters_delete AFTER DELETE ON covenant\n" + body(
+            _covenant_statements('OLD', '-', is_status)),
+        "CREATE TRIGGER IF NOT EXISTS covenant_counters_update AFTER UPDATE OF compliance_status, document_id "
+        "ON covenant\nWHEN OLD.compliance_status IS NOT NEW.compliance_status "
+        "OR OLD.document_id IS NOT NEW.document_id\n" + body(
+            _covenant_statements('OLD', '-', is_status) + _covenant_statements('NEW', '+', is_status)),
+    ]
+
+def _postgres_triggers() -> List[str]:
+    is_status = lambda column, status: f"({column} IS NOT DISTINCT FROM '{status}')::int"
+    indent = lambda statements: "\n".join(f"        {statement}" for statement in statements)
+    return [
+        f"""CREATE OR REPLACE FUNCTION document_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE project SET document_count = document_count + 1 WHERE id = NEW.project_id;
+    ELSE
+{indent([_document_removal('OLD')])}
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql""",
+        "CREATE OR REPLACE TRIGGER document_counters AFTER INSERT OR DELETE ON document "
+        "FOR EACH ROW EXECUTE FUNCTION document_counters()",
+        f"""CREATE OR REPLACE FUNCTION covenant_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+{indent(_covenant_statements('OLD', '-', is_status))}
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+{indent(_covenant_statements('NEW', '+', is_status))}
+    END IF;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql""",
+        "CREATE OR REPLACE TRIGGER covenant_counters "
+        "AFTER INSERT OR DELETE OR UPDATE OF compliance_status, document_id ON covenant "
+        "FOR EACH ROW EXECUTE FUNCTION covenant_counters()",
+    ]
+
+def counter_triggers(dialect: str) -> List[str]:
+    """Statements creating the counter triggers on ``dialect`` ('sqlite' or 'postgresql')."""
+    return _postgres_triggers() if dialect == 'postgresql' else _sqlite_triggers()
+
+def drop_counter_triggers(dialect: str) -> List[str]:
+    """Statements removing the counter triggers."""
+    if dialect == 'postgresql':
+        return ["DROP FUNCTION IF EXISTS covenant_counters() CASCADE",
+                "DROP FUNCTION IF EXISTS document_counters() CASCADE"]
+    return [f"DROP TRIGGER IF EXISTS {name}" for name in (
+        'document_counters_insert', 'document_counters_delete',
+        'covenant_counters_insert', 'covenant_counters_delete', 'covenant_counters_update')]
+
+def recount_statements() -> List[str]:
+    """Statements recomputing every counter from the rows, e.g. after adding the columns."""
+    covenant_counts = ", ".join(
+        ["covenant_count = (SELECT COUNT(*) FROM covenant WHERE covenant.document_id = document.id)"]
+        + [f"{status}_count = (SELECT COUNT(*) FROM covenant WHERE covenant.document_id = document.id "
+           f"AND covenant.compliance_status = '{status}')" for status in COUNTED_STATUSES]
+    )
+    project_counts = ", ".join(
+        ["document_count = (SELECT COUNT(*) FROM document WHERE document.project_id = project.id)"]
+        + [f"{counter} = (SELECT COALESCE(SUM(document.{counter}), 0) FROM document "
+           f"WHERE document.project_id = project.id)" for counter in COVENANT_COUNTERS]
+    )
+    return [f"UPDATE document SET {covenant_counts}", f"UPDATE project SET {project_counts}"]
@@ -1,33 +1,156 @@
 """Database models module."""
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.ext.mutable import MutableDict
+from sqlalchemy.sql.functions import FunctionElement
+from src.document_processor.schedules import ThresholdSchedule
+from src.document_processor.text_store import get_text_store
+from src.models.counters import counter_triggers, drop_counter_triggers
 
 db = SQLAlchemy()
 
+# Values up to this fraction past their threshold are a warning rather than a breach
+DEFAULT_WARNING_BAND = 0.1
+
+# JSON objects: JSON1 text on SQLite, JSONB on Postgres. Values are decoded
+# once when a row loads and edits in place are tracked, so callers work
+# with the dict rather than re-parsing the column.
+JSONObject = MutableDict.as_mutable(db.JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), 'postgresql'))
+
+class json_path(FunctionElement):
+    """JSON value at a fixed path in a JSON column.
+
+    The path is rendered inline rather than bound, so the expression is the
+    same text as in the index definition and the database can use the index.
+    """
+    inherit_cache = True
+    type = db.JSON()
+
+    def __init__(self, column, *path):
+        super().__init__(column, *(db.literal_column(key) for key in path))
+
+class json_path_text(json_path):
+    """Text value at a fixed path in a JSON column."""
+    inherit_cache = True
+    type = db.String()
+
+def _path_parts(element, compiler, **kw):
+    column, *path = element.clauses
+    return compiler.process(column, **kw), [key.name for key in path]
+
+@compiles(json_path)
+def _json_path(element, compiler, **kw):
+    column, path = _path_parts(element, compiler, **kw)
+    return f"json_extract({column}, '$.{'.'.join(path)}')"
+
+@compiles(json_path, 'postgresql')
+def _jsonb_path(element, compiler, **kw):
+    column, path = _path_parts(element, compiler, **kw)
+    operator = '#>>' if isinstance(element, json_path_text) else '#>'
+    return f"({column} {operator} '{{{','.join(path)}}}')"
+
+class json_array_contains(FunctionElement):
+    """True where the JSON array ``array`` contains the string ``value``."""
+    inherit_cache = True
+    type = db.Boolean()
+
+    def __init__(self, array, value):
+        super().__init__(array, db.literal(value, db.String))
+
+@compiles(json_array_contains)
+def _json_array_contains(element, compiler, **kw):
+    array, value = (compiler.process(clause, **kw) for clause in element.clauses)
+    return f"EXISTS (SELECT 1 FROM json_each({array}) WHERE json_each.value = {value})"
+
+@compiles(json_array_contains, 'postgresql')
+def _jsonb_array_contains(element, compiler, **kw):
+    array, value = (compiler.process(clause, **kw) for clause in element.clauses)
+    # @> can use the GIN index on the array
+    return f"({array} @> jsonb_build_array({value}))"
+
 class Project(db.Model):
     """Project model."""
+    __table_args__ = (
+        db.Index('ix_project_user_id', 'user_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     user_id = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Kept current by database triggers, see src/models/counters.py
+    document_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    covenant_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    compliant_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    warning_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    breach_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     documents = db.relationship('Document', backref='project', lazy=True)
 
 class Document(db.Model):
     """Document model."""
+    __table_args__ = (
+        # The same file is stored once per project; also serves lookups by project
+        db.Index('uq_document_project_content_hash', 'project_id', 'content_hash', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=False)
     filename = db.Column(db.String(255), nullable=False)
-    file_url = db.Column(db.String(500), nullable=False)
+    file_url = db.Column(db.String(500))  # Set once the remote upload finishes
     upload_date = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.String(50), nullable=False)
     document_type = db.Column(db.String(50))
-    doc_metadata = db.Column(db.Text)  # Store JSON as text in SQLite
+    doc_metadata = db.Column(JSONObject)
     processing_status = db.Column(db.String(20), default='pending')
+    parent_document_id = db.Column(db.Integer, db.ForeignKey('document.id'))  # Agreement this one amends
+    content_hash = db.Column(db.String(64))  # SHA-256 of the uploaded file
+    # Kept current by database triggers, see src/models/counters.py
+    covenant_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    compliant_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    warning_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    breach_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     covenants = db.relationship('Covenant', backref='document', lazy=True)
+    amendments = db.relationship('Document', backref=db.backref('predecessor', remote_side=[id]), lazy=True)
+
+    @hybrid_property
+    def parties(self):
+        """Parties named in the agreement."""
+        return (self.doc_metadata or {}).get('parties') or []
+
+    @parties.inplace.expression
+    @classmethod
+    def _parties_expression(cls):
+        return json_path(cls.doc_metadata, 'parties')
+
+    @classmethod
+    def has_party(cls, party):
+        """Filter clause for documents that name ``party``."""
+        return json_array_contains(cls.parties, party)
+
+    def raw_text(self):
+        """Lazy view of the extracted text in the text store, or None if it was not stored.
+
+        The text is never part of the row; pages are only read when asked for.
+        """
+        store = get_text_store()
+        key = ((self.doc_metadata or {}).get('text') or {}).get('key')
+        if store is None or not key:
+            return None
+        return store.get(key)
 
 class Covenant(db.Model):
     """Covenant model."""
+    __table_args__ = (
+        # Covers per-document status counts as well as lookups by document
+        db.Index('ix_covenant_document_status', 'document_id', 'compliance_status'),
+        db.Index('ix_covenant_status', 'compliance_status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     document_id = db.Column(db.Integer, db.ForeignKey('document.id'), nullable=False)
     user_id = db.Column(db.String(50), nullable=False)
@@ -38,34 +161,71 @@ class Covenant(db.Model):
     measurement_frequency = db.Column(db.String(20))  # e.g., 'monthly', 'quarterly', 'annually'
     compliance_status = db.Column(db.String(20), default='unknown')  # e.g., 'compliant', 'warning', 'breach'
     last_checked = db.Column(db.DateTime, default=datetime.utcnow)
-    covenant_metadata = db.Column(db.Text)  # Store JSON as text in SQLite
+    covenant_metadata = db.Column(JSONObject)
+    direction = db.Column(db.String(3))  # 'min' (value must stay at or above the threshold) or 'max'
+    warning_band = db.Column(db.Float, default=DEFAULT_WARNING_BAND)  # Fraction past the threshold reported as a warning
     alerts = db.relationship('Alert', backref='covenant', lazy=True)
 
-    def update_compliance_status(self):
+    def threshold_schedule(self):
+        """Step-down schedule stored in the covenant metadata, if any."""
+        return (self.covenant_metadata or {}).get('threshold_schedule') or []
+
+    def effective_threshold(self, on_date=None):
+        """Threshold in force on ``on_date`` (today by default)."""
+        schedule = self.threshold_schedule()
+        if schedule:
+            return ThresholdSchedule(schedule).value_at(on_date)
+        return self.threshold_value
+
+    def update_compliance_status(self, on_date=None):
         """Update compliance status based on current and threshold values."""
-        if self.current_value is None or self.threshold_value is None:
-            self.compliance_status = 'unknown'
-            return
-
-        # For metrics where higher is better (e.g., coverage ratios)
-        if 'coverage' in self.name.lower() or 'net worth' in self.name.lower():
-            if self.current_value >= self.threshold_value:
-                self.compliance_status = 'compliant'
-            elif self.current_value >= self.threshold_value * 0.9:  # Within 90% of threshold
-                self.compliance_status = 'warning'
-            else:
-                self.compliance_status = 'breach'
-        # For metrics where lower is better (e.g., leverage ratios)
-        else:
-            if self.current_value <= self.threshold_value:
-                self.compliance_status = 'compliant'
-            elif self.current_value <= self.threshold_value * 1.1:  # Within 110% of threshold
-                self.compliance_status = 'warning'
-            else:
-                self.compliance_status = 'breach'
+        if self.direction is None:
+            self.direction = covenant_direction(self.name)
+        self.threshold_value = self.effective_threshold(on_date)
+        self.compliance_status = compliance_status(
+            self.current_value, self.threshold_value, self.direction,
+            DEFAULT_WARNING_BAND if self.warning_band is None else self.warning_band)
+
+# Name fragments of covenants whose threshold is a floor
+FLOOR_TERMS = ('minimum', 'coverage', 'liquidity', 'current ratio', 'working capital', 'net worth')
+
+def covenant_direction(name):
+    """Direction of a covenant inferred from its name, for covenants extracted without one.
+
+    Minimums, coverage ratios, liquidity, current ratio, working capital and
+    net worth are floors ('min'): the value must stay at or above the
+    threshold. Everything else, e.g. leverage, is a ceiling ('max').
+    """
+    name = (name or '').lower()
+    return 'min' if any(term in name for term in FLOOR_TERMS) else 'max'
+
+def compliance_status(current_value, threshold_value, direction, warning_band=DEFAULT_WARNING_BAND):
+    """Compliance status of a covenant's current value against its threshold.
+
+    A value past the threshold by at most ``warning_band`` of its magnitude
+    is a warning, so negative thresholds get a band as well.
+    """
+    if current_value is None or threshold_value is None:
+        return 'unknown'
+    # How far the value is past the threshold in the wrong direction
+    past = threshold_value - current_value if direction == 'min' else current_value - threshold_value
+    if past <= 0:
+        return 'compliant'
+    elif past <= abs(threshold_value) * warning_band:
+        return 'warning'
+    else:
+        return 'breach'
 
 class Alert(db.Model):
     """Alert model."""
+    __table_args__ = (
+        # Active alerts newest first, and counts by type, without touching the table
+        db.Index('ix_alert_user_status_created', 'user_id', 'status', 'created_at', 'alert_type'),
+        # Alert history over a date range
+        db.Index('ix_alert_user_created', 'user_id', 'created_at', 'alert_type'),
+        db.Index('ix_alert_covenant_status', 'covenant_id', 'status'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     covenant_id = db.Column(db.Integer, db.ForeignKey('covenant.id'), nullable=False)
     user_id = db.Column(db.String(50), nullable=False)
@@ -73,4 +233,27 @@ class Alert(db.Model):
     message = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     status = db.Column(db.String(20), default='new')  # e.g., 'new', 'read', 'resolved'
-    details = db.Column(db.Text)  # Store JSON as text in SQLite
+    details = db.Column(JSONObject)
+
+    @hybrid_property
+    def severity(self):
+        """Severity from the breach analysis, if the alert was analyzed."""
+        return ((self.details or {}).get('analysis') or {}).get('severity')
+
+    @severity.inplace.expression
+    @classmethod
+    def _severity_expression(cls):
+        return json_path_text(cls.details, 'analysis', 'severity')
+
+# Expression indexes on the JSON paths that queries filter on. SQLite cannot
+# index array membership, so parties are only indexed on Postgres.
+db.Index('ix_document_parties', Document.parties.label('parties'), postgresql_using='gin',
+         postgresql_ops={'parties': 'jsonb_path_ops'}).ddl_if(dialect='postgresql')
+db.Index('ix_alert_user_severity', Alert.user_id, Alert.severity)
+
+# Counter triggers are created once all tables exist
+for dialect in ('sqlite', 'postgresql'):
+    for statement in counter_triggers(dialect):
+        event.listen(db.metadata, 'after_create', DDL(statement).execute_if(dialect=dialect))
+    for statement in drop_counter_triggers(dialect):
+        event.listen(db.metadata, 'before_drop', DDL(statement).execute_if(dialect=dialect))
@@ -42,6 +42,7 @@ def init_app(app):
     from .document import document_bp
     from .dashboard import dashboard_bp
     from .alert import alert_bp
+    from .metrics import metrics_bp
     
     # Register error handlers
     @app.errorhandler(404)
@@ -82,6 +83,7 @@ def init_app(app):
     app.register_blueprint(document_bp, url_prefix='/documents')
     app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
     app.register_blueprint(alert_bp, url_prefix='/alerts')
+    app.register_blueprint(metrics_bp)
     
     # Register context processors
     @app.context_processor
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, jsonify, request, session
 from src.models.database import Alert, Covenant, db
 from src.auth import requires_auth
+from src.llm.cache import cached_completion
 from datetime import datetime, timedelta
 import logging
 import openai
@@ -40,16 +41,19 @@ class AlertAnalyzer:
         """
 
         try:
-            response = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
+            content, _ = cached_completion(
+                openai.chat.completions.create,
+                self.model,
+                [
                     {"role": "system", "content": "You are a financial risk analyst specializing in covenant compliance."},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1
+                temperature=0.1,
+                validate=json.loads,
+                stage='breach_analysis'
             )
             
-            return json.loads(response.choices[0].message.content)
+            return json.loads(content)
         except Exception as e:
             logger.error(f"Error in GPT analysis: {str(e)}")
             return None
@@ -58,10 +62,14 @@ class AlertAnalyzer:
 @requires_auth
 def alerts():
     user_id = session['user'].get('sub')
-    active_alerts = Alert.query.filter_by(
+    query = Alert.query.filter_by(
         user_id=user_id,
         status='new'
-    ).order_by(Alert.created_at.desc()).all()
+    )
+    severity = request.args.get('severity')
+    if severity:
+        query = query.filter(Alert.severity == severity)
+    active_alerts = query.order_by(Alert.created_at.desc()).all()
     
     return render_template('alerts.html', alerts=active_alerts)
 
@@ -90,13 +98,7 @@ def analyze_alert(covenant_id):
                     message=f"Covenant breach detected for {covenant.name}"
                 )
             
-            if alert.details:
-                details = alert.details.copy()
-                details['analysis'] = analysis
-            else:
-                details = {'analysis': analysis}
-            
-            alert.details = details
+            alert.details = {**(alert.details or {}), 'analysis': analysis}
             db.session.add(alert)
             db.session.commit()
             
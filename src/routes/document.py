@@ -3,12 +3,12 @@ from flask import Blueprint, request, jsonify, render_template, current_app, red
 from werkzeug.utils import secure_filename
 from src.models.database import db, Document, Project, Covenant
 from src.document_processor.processor import DocumentProcessor
+from src.document_processor.uploads import SpooledUpload, hold
 from src.auth import requires_auth
 from datetime import datetime
 import logging
 import os
 import cloudinary
-import cloudinary.uploader
 import tempfile
 import json
 
@@ -66,6 +66,7 @@ def upload():
         
         file = request.files['file']
         project_id = request.form.get('project_id')
+        predecessor_id = request.form.get('predecessor_id', type=int)
         user_id = session['user']['sub']
         
         logger.debug(f"File: {file}")
@@ -93,37 +94,54 @@ def upload():
         # Ensure upload directory exists
         upload_dir = ensure_upload_dir()
         
-        # Save file temporarily with a unique name
+        # Read the file into memory, or to a unique temporary path once it is too large
         filename = secure_filename(file.filename)
         temp_path = os.path.join(upload_dir, f"{datetime.utcnow().timestamp()}_{filename}")
-        logger.debug(f"Saving file temporarily to: {temp_path}")
-        file.save(temp_path)
+        spooled = SpooledUpload.read(file.stream, temp_path)
+        logger.debug(f"Read {spooled.size} bytes ({'in memory' if spooled.in_memory else 'spooled to ' + temp_path}), "
+                     f"sha256 {spooled.sha256}")
+        queued = False
         
         try:
-            # Upload to Cloudinary
-            logger.info("Uploading file to Cloudinary")
-            result = cloudinary.uploader.upload(
-                temp_path,
-                folder=f"covenant-monitor/documents/{project_id}",
-                resource_type="raw",
-                allowed_formats=["pdf", "doc", "docx"]
-            )
-            logger.debug(f"Cloudinary upload result: {result}")
+            # The upload to Cloudinary runs alongside extraction and attaches the file URL when done
+            processor = DocumentProcessor(temp_path, user_id, project_id, predecessor_id=predecessor_id,
+                                          upload=spooled)
+            
+            # Amendments can only follow a document of the same project and user
+            if predecessor_id and processor.find_predecessor() is None:
+                logger.warning(f"Predecessor document {predecessor_id} not found in project {project_id}")
+                return jsonify({'error': 'Predecessor document not found'}), 404
+            
+            # The same file uploaded again links to the stored document; nothing is parsed or uploaded
+            duplicate = processor.find_duplicate()
+            if duplicate is not None and duplicate.processing_status != 'error':
+                logger.info(f"Upload duplicates document {duplicate.id}")
+                return redirect(url_for('document_bp.process', document_id=duplicate.id, duplicate=1))
             
-            # Process document
-            logger.info("Processing document")
-            processor = DocumentProcessor(temp_path, user_id, project_id)
-            processor.file_url = result['secure_url']  # Pass the file URL to the processor
-            document = processor.process_and_store()
+            if current_app.config.get('PROCESSING_WORKERS', 0) > 0:
+                # Background workers extract the document; the process page polls its status.
+                # The job needs the file on disk, but workers in this process read the buffer.
+                logger.info("Queueing document for processing")
+                spooled.persist()
+                if 'processing_workers' in current_app.extensions:
+                    hold(spooled)
+                document = processor.queue_document()
+                queued = processor.duplicate is None
+            else:
+                logger.info("Processing document")
+                document = processor.create_document()
+                if processor.duplicate is None:
+                    processor.process_with_upload(document)
+                    logger.info("Document processed successfully")
             
-            logger.info("Document processed successfully")
             # Redirect to process page instead of project detail
-            return redirect(url_for('document_bp.process', document_id=document.id))
+            return redirect(url_for('document_bp.process', document_id=document.id,
+                                    duplicate=1 if processor.duplicate is not None else None))
             
         finally:
-            # Clean up temporary file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            # Clean up temporary file unless a worker still needs it
+            if not queued:
+                spooled.discard()
         
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}", exc_info=True)
@@ -138,6 +156,36 @@ def process(document_id):
     document = Document.query.get_or_404(document_id)
     return render_template('process.html', document=document)
 
+@document_bp.route('/process/<int:document_id>/status')
+@requires_auth
+def process_status(document_id):
+    """Processing status and covenant count, polled by the process page"""
+    row = db.session.query(Document.processing_status, Document.covenant_count).filter_by(id=document_id).first()
+    if row is None:
+        return jsonify({'error': 'Document not found'}), 404
+    return jsonify({'status': row.processing_status, 'covenant_count': row.covenant_count})
+
+@document_bp.route('/process/<int:document_id>/covenants')
+@requires_auth
+def process_covenants(document_id):
+    """Processing status and covenants stored so far, for polling while a document streams in"""
+    document = Document.query.get_or_404(document_id)
+    after = request.args.get('after', 0, type=int)
+    covenants = Covenant.query.filter(Covenant.document_id == document_id, Covenant.id > after)\
+        .order_by(Covenant.id).all()
+    return jsonify({
+        'status': document.processing_status,
+        'covenants': [{
+            'id': covenant.id,
+            'name': covenant.name,
+            'description': covenant.description,
+            'threshold_value': covenant.threshold_value,
+            'current_value': covenant.current_value,
+            'measurement_frequency': covenant.measurement_frequency,
+            'compliance_status': covenant.compliance_status
+        } for covenant in covenants]
+    })
+
 @document_bp.route('/projects', methods=['GET', 'POST'])
 @requires_auth
 def projects():
@@ -179,18 +227,14 @@ def project_detail(project_id):
     """Display project details"""
     project = Project.query.get_or_404(project_id)
     
-    # Get document count
-    document_count = Document.query.filter_by(project_id=project_id).count()
-    
-    # Get covenant count
-    covenant_count = db.session.query(Covenant).join(Document).filter(Document.project_id == project_id).count()
-    
-    logger.debug(f"Found {document_count} documents and {covenant_count} covenants for project {project_id}")
+    # Counters are kept on the rows, so no covenant is loaded
+    logger.debug(f"Found {project.document_count} documents and {project.covenant_count} covenants "
+                 f"for project {project_id}")
     
     return render_template('project_detail.html', 
                          project=project,
-                         document_count=document_count,
-                         covenant_count=covenant_count)
+                         document_count=project.document_count,
+                         covenant_count=project.covenant_count)
 
 @document_bp.route('/project/<int:project_id>/delete', methods=['POST'])
 @requires_auth
@@ -0,0 +1,23 @@
+"""Internal LLM usage metrics routes."""
+from flask import Blueprint, current_app, jsonify, request, session
+from src.auth import requires_auth
+from src.llm.cache import get_llm_cache
+from src.llm.metrics import get_llm_metrics
+
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+@metrics_bp.route('/api/llm/metrics')
+@requires_auth
+def llm_metrics():
+    """Token, cost and latency rollups of LLM calls since startup.
+
+    The rollups name documents of every tenant, so only the users listed in
+    METRICS_ADMIN_USERS may read them.
+    """
+    if session['user']['sub'] not in current_app.config.get('METRICS_ADMIN_USERS', []):
+        return jsonify({'error': 'Forbidden'}), 403
+    snapshot = get_llm_metrics().snapshot()
+    if request.args.get('recent', '1') == '0':
+        snapshot.pop('recent_calls')
+    snapshot['cache'] = get_llm_cache().stats()
+    return jsonify(snapshot)
@@ -0,0 +1,117 @@
+"""Test incremental re-extraction of amendments."""
+import json
+import os
+import unittest
+from unittest import mock
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('LLM_CACHE_DISABLED', '1')
+
+from src.document_processor.amendments import carry_forward, diff_sections, find_section, section_fingerprints
+from src.document_processor.parser import DocumentParser
+from test_parser import FakeOpenAI, disable_llm_cache
+
+PREAMBLE = "CREDIT AGREEMENT\nThis Credit Agreement is made among Borrower and the Lenders.\n"
+
+ORIGINAL = PREAMBLE + (
+    "Section 7.1 Leverage Ratio. The Borrower shall maintain a Leverage Ratio of not more than 3.50:1.00.\n"
+    "Section 7.2 Liquidity. The Borrower shall maintain Minimum Liquidity of at least $10,000,000.\n"
+    "Section 8.1 Notices. All notices shall be in writing and delivered by hand or by mail.\n"
+)
+
+AMENDED = ORIGINAL.replace("3.50:1.00", "3.25:1.00")
+
+def respond(kwargs):
+    system = kwargs['messages'][0]['content']
+    prompt = kwargs['messages'][-1]['content']
+    if 'party names' in system:
+        return '["Borrower"]'
+    if 'document types' in system:
+        return 'credit agreement'
+    found = []
+    if '3.50:1.00' in prompt:
+        found.append({'type': 'leverage_ratio', 'threshold': 3.5, 'description': 'Leverage Ratio not more than 3.50'})
+    if '3.25:1.00' in prompt:
+        found.append({'type': 'leverage_ratio', 'threshold': 3.25, 'description': 'Leverage Ratio not more than 3.25'})
+    if 'Minimum Liquidity' in prompt:
+        found.append({'type': 'minimum_liquidity', 'threshold': 10000000,
+                      'description': 'The Borrower shall maintain Minimum Liquidity of at least $10,000,000.'})
+    return json.dumps(found)
+
+class SectionDiffTests(unittest.TestCase):
+    def test_only_edited_section_changes(self):
+        """Whitespace and unchanged clauses do not count as changes"""
+        previous = section_fingerprints(ORIGINAL)
+        diff = diff_sections(previous, AMENDED.replace("by hand", "by  hand"))
+        self.assertEqual([section['heading'] for section in diff['changed']],
+                         ["Section 7.1 Leverage Ratio. The Borrower shall maintain a Leverage Ratio of not more than 3.25:1.00."])
+        self.assertEqual(len(diff['removed_hashes']), 1)
+        self.assertLess(diff['changed_fraction'], 0.5)
+
+    def test_covenant_only_defined_is_unattributed(self):
+        """A type named only in the definitions is not guessed to come from there"""
+        text = ("Section 1.1 Definitions.\n\"Leverage Ratio\" means the ratio of Debt to EBITDA.\n"
+                + ORIGINAL[len(PREAMBLE):].replace("Leverage Ratio", "Debt Ratio"))
+        sections = section_fingerprints(text)
+        self.assertIsNone(find_section({'type': 'leverage_ratio', 'description': 'Leverage Ratio at most 3.5'},
+                                       text, sections))
+        self.assertEqual(find_section({'type': 'leverage_ratio'}, ORIGINAL, section_fingerprints(ORIGINAL)),
+                         section_fingerprints(ORIGINAL)[1]['hash'])
+
+    def test_replaced_covenants_are_not_carried(self):
+        """Covenants of changed sections, or re-extracted by type, are dropped"""
+        diff = {'unchanged_hashes': {'a'}, 'removed_hashes': {'b'}}
+        previous = [
+            {'type': 'leverage_ratio', 'section_hash': 'b'},
+            {'type': 'minimum_liquidity', 'section_hash': 'a'},
+            {'type': 'capital_expenditures', 'section_hash': None},
+            {'type': 'current_ratio', 'section_hash': 'a'},
+        ]
+        merged = carry_forward(previous, diff, [{'type': 'current_ratio', 'threshold_value': 1.5}])
+        self.assertEqual([c['type'] for c in merged],
+                         ['minimum_liquidity', 'capital_expenditures', 'current_ratio'])
+        self.assertTrue(merged[0]['carried_forward'])
+        self.assertNotIn('carried_forward', merged[-1])
+
+class ProcessAmendmentTests(unittest.TestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+
+    def process(self, text, previous=None):
+        parser = DocumentParser('agreement.pdf', use_cache=False)
+        parser.client = FakeOpenAI(respond)
+        with mock.patch.object(parser, 'extract_text', return_value=text):
+            result = parser.process_amendment(previous) if previous else parser.process_document()
+        return parser, result
+
+    def test_amendment_reextracts_changed_section_only(self):
+        """Only the amended clause is sent to GPT; other covenants are carried forward"""
+        _, original = self.process(ORIGINAL)
+        self.assertNotIn('sections', original['metadata'])
+        parser, amended = self.process(AMENDED, previous=original)
+
+        self.assertEqual(len(parser.client.calls), 1)
+        self.assertIn('3.25:1.00', parser.client.calls[0]['messages'][-1]['content'])
+        self.assertNotIn('Minimum Liquidity', parser.client.calls[0]['messages'][-1]['content'])
+
+        thresholds = {c['type']: c['threshold_value'] for c in amended['covenants']}
+        self.assertEqual(thresholds, {'minimum_liquidity': 10000000, 'leverage_ratio': 3.25})
+        self.assertEqual(amended['metadata']['amendment']['carried_forward'], 1)
+        self.assertEqual(amended['metadata']['parties'], ['Borrower'])
+
+    def test_missing_fingerprints_fall_back_to_full_parse(self):
+        """A predecessor processed before fingerprinting is parsed in full"""
+        parser, amended = self.process(AMENDED, previous={'metadata': {}, 'covenants': []})
+        self.assertEqual(len(parser.client.calls), 3)
+        self.assertNotIn('amendment', amended['metadata'])
+
+    def test_unattributed_covenants_force_full_parse(self):
+        """Covenants whose section is unknown are re-extracted rather than carried"""
+        _, original = self.process(ORIGINAL)
+        original['covenants'][0]['section_hash'] = None
+        parser, amended = self.process(AMENDED, previous=original)
+        self.assertEqual(len(parser.client.calls), 3)
+        self.assertNotIn('amendment', amended['metadata'])
+
+if __name__ == '__main__':
+    unittest.main()
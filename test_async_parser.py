@@ -0,0 +1,111 @@
+"""Test the async parser and the shared LLM limiter."""
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('LLM_CACHE_DISABLED', '1')
+
+from src.document_processor import async_parser
+from src.document_processor.extraction_cache import ExtractionCache, file_sha256
+from src.document_processor.parser import PROMPT_VERSION
+from src.llm.limiter import AsyncLLMLimiter, TokenBudget
+from test_parser import build_pdf, disable_llm_cache
+
+class FakeAsyncOpenAI:
+    """Async OpenAI stand-in that tracks how many calls are in flight."""
+    in_flight = 0
+    peak = 0
+    calls = 0
+
+    def __init__(self, **kwargs):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        cls = FakeAsyncOpenAI
+        cls.calls += 1
+        cls.in_flight += 1
+        cls.peak = max(cls.peak, cls.in_flight)
+        await asyncio.sleep(0.01)
+        cls.in_flight -= 1
+        system = kwargs['messages'][0]['content']
+        if 'party names' in system:
+            content = '["Borrower", "Agent"]'
+        elif 'document types' in system:
+            content = 'Credit Agreement'
+        else:
+            content = json.dumps([{'type': 'leverage_ratio', 'threshold': '3.50:1.00'}])
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(total_tokens=50),
+        )
+
+class AsyncParserTests(unittest.TestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+        FakeAsyncOpenAI.in_flight = FakeAsyncOpenAI.peak = FakeAsyncOpenAI.calls = 0
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.paths = []
+        for i in range(6):
+            path = os.path.join(self.tmpdir.name, f'agreement_{i}.pdf')
+            with open(path, 'wb') as f:
+                f.write(build_pdf([f'Agreement {i} Leverage Ratio 3.50:1.00']))
+            self.paths.append(path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_batch_respects_shared_concurrency_limit(self):
+        """All documents share one limiter bounding in-flight calls"""
+        limiter = AsyncLLMLimiter(max_concurrency=3, tokens_per_minute=10_000_000)
+        with mock.patch.object(async_parser, 'AsyncOpenAI', FakeAsyncOpenAI):
+            results = async_parser.run_batch(self.paths, limiter=limiter, use_cache=False)
+
+        self.assertEqual(len(results), 6)
+        for result in results:
+            self.assertEqual(result['metadata']['document_type'], 'credit agreement')
+            self.assertEqual(result['metadata']['parties'], ['Borrower', 'Agent'])
+            self.assertEqual(result['covenants'][0]['threshold_value'], 3.5)
+        self.assertEqual(FakeAsyncOpenAI.calls, 18)
+        self.assertEqual(FakeAsyncOpenAI.peak, 3)
+        summary = limiter.latency.summary()
+        self.assertEqual(summary['covenants']['count'], 6)
+        self.assertGreater(summary['parties']['p95_ms'], 0)
+
+    def test_cache_hit_drops_stored_timings(self):
+        """A cached result does not report the timings of the run that cached it"""
+        parser = async_parser.AsyncDocumentParser(self.paths[0])
+        parser.cache = ExtractionCache(os.path.join(self.tmpdir.name, 'cache.db'), 10_000_000)
+        parser.cache.put(file_sha256(self.paths[0]), parser.cache_version, parser.model, PROMPT_VERSION,
+                         {'covenants': [], 'metadata': {'timings': {'extract': 1.0, 'analyze': 2.0}}})
+        with mock.patch.object(async_parser, 'AsyncOpenAI', FakeAsyncOpenAI):
+            result = asyncio.run(parser.process_document_async())
+        self.assertNotIn('timings', result['metadata'])
+        self.assertEqual(FakeAsyncOpenAI.calls, 0)
+
+class TokenBudgetTests(unittest.TestCase):
+    def test_acquire_waits_for_refill(self):
+        """Requests beyond the remaining budget wait for the bucket to refill"""
+        async def scenario():
+            budget = TokenBudget(tokens_per_minute=6000)
+            await budget.acquire(6000)
+            start = time.monotonic()
+            await budget.acquire(10)
+            return time.monotonic() - start
+
+        self.assertGreater(asyncio.run(scenario()), 0.05)
+
+    def test_adjust_reconciles_estimate(self):
+        """Actual usage above the estimate is charged to the budget"""
+        budget = TokenBudget(tokens_per_minute=600)
+        asyncio.run(budget.acquire(100))
+        budget.adjust(200)
+        self.assertLess(budget.tokens, 301)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""Test set-based covenant and alert persistence."""
+import unittest
+
+from src.document_processor.processor import DocumentProcessor
+from src.models.database import Alert, Covenant, Project, db
+from test_support import DatabaseTestCase
+
+def covenant_data(index, current_value, name=None):
+    return {
+        'name': name or f"Leverage Ratio {index}",
+        'description': f"Covenant {index}",
+        'threshold_value': 3.5,
+        'current_value': current_value,
+        'measurement_frequency': 'quarterly',
+        'metadata': {'section': str(index)},
+    }
+
+class BulkInsertTests(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project = Project(name='Bulk', user_id='user-1')
+        db.session.add(project)
+        db.session.commit()
+        self.processor = DocumentProcessor('agreement.pdf', 'user-1', project.id, use_mock=True)
+
+    def test_alerts_reference_their_covenants(self):
+        """Returned IDs line up with the input rows, so each alert points at its covenant"""
+        covenants = [covenant_data(index, [3.0, 3.7, 5.0][index % 3]) for index in range(300)]
+        covenants.append(covenant_data(300, 0.95, name='Interest Coverage Ratio'))
+        document = self.processor.add_records('loan_agreement', {}, covenants)
+        db.session.commit()
+
+        self.assertEqual(len(document.covenants), 301)
+        statuses = {covenant.name: covenant.compliance_status for covenant in document.covenants}
+        self.assertEqual(statuses['Leverage Ratio 0'], 'compliant')
+        self.assertEqual(statuses['Leverage Ratio 1'], 'warning')
+        self.assertEqual(statuses['Leverage Ratio 2'], 'breach')
+        self.assertEqual(statuses['Interest Coverage Ratio'], 'breach')
+
+        alerts = Alert.query.all()
+        self.assertEqual(len(alerts), 201)
+        for alert in alerts:
+            self.assertEqual(alert.alert_type, alert.covenant.compliance_status)
+            self.assertTrue(alert.message.startswith(f"{alert.covenant.name} is in"))
+            self.assertEqual(alert.user_id, 'user-1')
+
+    def test_scheduled_threshold_is_applied(self):
+        """The threshold in force today decides the stored status"""
+        data = covenant_data(0, 4.0)
+        data['metadata']['threshold_schedule'] = [{'start': '2000-01-01', 'value': 4.5}]
+        document = self.processor.add_records('loan_agreement', {}, [data])
+        db.session.commit()
+        covenant = Covenant.query.filter_by(document_id=document.id).one()
+        self.assertEqual((covenant.threshold_value, covenant.compliance_status), (4.5, 'compliant'))
+        self.assertEqual(Alert.query.count(), 0)
+
+    def test_extracted_direction_is_kept(self):
+        """A direction given by the parser wins over the one guessed from the name"""
+        fields = self.processor.covenant_fields({'name': 'Senior Ratio', 'threshold_value': 3.5,
+                                                 'current_value': 3.0, 'direction': 'min'})
+        document = self.processor.add_records('loan_agreement', {}, [fields, covenant_data(1, 3.0)])
+        db.session.commit()
+        covenants = {covenant.name: covenant for covenant in document.covenants}
+        self.assertEqual((covenants['Senior Ratio'].direction, covenants['Senior Ratio'].compliance_status),
+                         ('min', 'breach'))
+        self.assertEqual((covenants['Leverage Ratio 1'].direction, covenants['Leverage Ratio 1'].compliance_status),
+                         ('max', 'compliant'))
+
+if __name__ == '__main__':
+    unittest.main()
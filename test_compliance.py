@@ -0,0 +1,121 @@
+"""Test vectorized compliance evaluation against the per-covenant rules."""
+import unittest
+from datetime import date
+
+import numpy as np
+from sqlalchemy import event
+
+from src.data_integration.compliance import STATUSES, evaluate_covenants, evaluate_statuses
+from src.models.database import Covenant, Document, Project, compliance_status, covenant_direction, db
+from test_support import DatabaseTestCase
+
+class EvaluateStatusesTests(unittest.TestCase):
+    def test_matches_scalar_rules(self):
+        """Every status agrees with compliance_status, including missing values"""
+        rng = np.random.default_rng(0)
+        size = 5000
+        current = rng.uniform(0, 6, size)
+        threshold = rng.choice([-2.0, 1.5, 3.5, 5.0], size)
+        current[rng.random(size) < 0.05] = np.nan
+        threshold[rng.random(size) < 0.05] = np.nan
+        floor = rng.random(size) < 0.5
+        band = rng.choice([0.0, 0.1, 0.25], size)
+
+        statuses = STATUSES[evaluate_statuses(current, threshold, floor, band)]
+        for position in range(size):
+            expected = compliance_status(
+                None if np.isnan(current[position]) else current[position],
+                None if np.isnan(threshold[position]) else threshold[position],
+                'min' if floor[position] else 'max', band[position])
+            self.assertEqual(statuses[position], expected)
+
+class CovenantDirectionTests(unittest.TestCase):
+    def test_floors_are_recognized_by_name(self):
+        """Minimums, liquidity, current ratio and working capital are floors; leverage is a ceiling"""
+        for name in ['Minimum EBITDA', 'Minimum Liquidity', 'Liquidity', 'Current Ratio', 'Working Capital',
+                     'Interest Coverage Ratio', 'Tangible Net Worth']:
+            self.assertEqual(covenant_direction(name), 'min', name)
+        for name in ['Leverage Ratio', 'Capital Expenditures', None]:
+            self.assertEqual(covenant_direction(name), 'max', name)
+
+class EvaluateCovenantsTests(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project = Project(name='Portfolio', user_id='user-1')
+        db.session.add(project)
+        db.session.flush()
+        document = Document(project_id=project.id, filename='agreement.pdf', user_id='user-1')
+        db.session.add(document)
+        db.session.flush()
+        self.document_id = document.id
+
+    def add(self, name, current_value, threshold_value, **fields):
+        covenant = Covenant(document_id=self.document_id, user_id='user-1', name=name,
+                            current_value=current_value, threshold_value=threshold_value, **fields)
+        covenant.update_compliance_status(date(2024, 1, 1))
+        db.session.add(covenant)
+        return covenant
+
+    def statements(self):
+        executed = []
+        listener = lambda conn, cursor, statement, *args: executed.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        self.addCleanup(event.remove, db.engine, 'before_cursor_execute', listener)
+        return executed
+
+    def test_only_changed_rows_are_written(self):
+        """Unchanged covenants are left alone; changes go out in one UPDATE"""
+        for index in range(100):
+            self.add(f"Leverage Ratio {index}", 3.0, 3.5)
+        moved = self.add('Interest Coverage Ratio', 2.5, 2.0)
+        db.session.commit()
+        self.assertEqual(evaluate_covenants(), 0)
+
+        Covenant.query.filter_by(id=moved.id).update({'current_value': 1.9})
+        Covenant.query.filter(Covenant.name == 'Leverage Ratio 7').update({'current_value': 5.0})
+        db.session.commit()
+        executed = self.statements()
+        self.assertEqual(evaluate_covenants(), 2)
+        db.session.commit()
+        self.assertEqual(sum(statement.startswith('UPDATE') for statement in executed), 1)
+
+        statuses = dict(db.session.query(Covenant.name, Covenant.compliance_status))
+        self.assertEqual(statuses['Interest Coverage Ratio'], 'warning')
+        self.assertEqual(statuses['Leverage Ratio 7'], 'breach')
+        self.assertEqual(statuses['Leverage Ratio 8'], 'compliant')
+
+    def test_stored_direction_and_band_decide(self):
+        """The stored definition wins over the name"""
+        self.add('Minimum Liquidity', 90.0, 100.0, direction='min', warning_band=0.05)
+        self.add('Capex Limit', 104.0, 100.0, warning_band=0.05)
+        db.session.commit()
+        statuses = dict(db.session.query(Covenant.name, Covenant.compliance_status))
+        self.assertEqual(statuses, {'Minimum Liquidity': 'breach', 'Capex Limit': 'warning'})
+        self.assertEqual(evaluate_covenants(), 0)
+
+    def test_negative_threshold_has_warning_band(self):
+        """A small miss of a negative threshold is a warning, not a breach"""
+        self.add('Minimum EBITDA', -2.1, -2.0, direction='min')
+        self.add('Net Loss Limit', -1.9, -2.0, direction='max')
+        self.add('Minimum Liquidity', -2.5, -2.0, direction='min')
+        db.session.commit()
+        statuses = dict(db.session.query(Covenant.name, Covenant.compliance_status))
+        self.assertEqual(statuses, {'Minimum EBITDA': 'warning', 'Net Loss Limit': 'warning',
+                                    'Minimum Liquidity': 'breach'})
+        current, threshold = np.array([-2.1, -1.9, -2.5]), np.full(3, -2.0)
+        codes = evaluate_statuses(current, threshold, np.array([True, False, True]), np.full(3, 0.1))
+        self.assertEqual(STATUSES[codes].tolist(), ['warning', 'warning', 'breach'])
+
+    def test_step_down_changes_threshold_and_status(self):
+        """A schedule step taking effect updates the threshold with the status"""
+        schedule = [{'start': None, 'value': 3.5}, {'start': '2025-07-01', 'value': 3.25}]
+        covenant = self.add('Leverage Ratio', 3.4, 3.5, covenant_metadata={'threshold_schedule': schedule})
+        db.session.commit()
+        self.assertEqual(evaluate_covenants([covenant.id], date(2025, 1, 1)), 0)
+        self.assertEqual(evaluate_covenants([covenant.id], date(2025, 9, 30)), 1)
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual((covenant.threshold_value, covenant.compliance_status), (3.25, 'warning'))
+
+if __name__ == '__main__':
+    unittest.main()
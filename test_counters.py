@@ -0,0 +1,90 @@
+"""Test the trigger-maintained project and document counters."""
+import unittest
+
+from sqlalchemy import event
+
+from src.data_integration.compliance import evaluate_covenants
+from src.document_processor.processor import DocumentProcessor
+from src.models.counters import recount_statements
+from src.models.database import Covenant, Document, Project, db
+from test_support import DatabaseTestCase
+
+COUNTERS = ('covenant_count', 'compliant_count', 'warning_count', 'breach_count')
+
+def covenant_data(name, current_value):
+    return {'name': name, 'description': name, 'threshold_value': 3.5, 'current_value': current_value,
+            'measurement_frequency': 'quarterly', 'metadata': {}}
+
+class CounterTests(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project = Project(name='Counters', user_id='user-1')
+        db.session.add(project)
+        db.session.commit()
+        self.project_id = project.id
+        self.processor = DocumentProcessor('agreement.pdf', 'user-1', project.id, use_mock=True)
+
+    def counts(self, model, row_id):
+        db.session.expire_all()
+        row = db.session.get(model, row_id)
+        return tuple(getattr(row, counter) for counter in COUNTERS)
+
+    def assertMatchesRecount(self):
+        """The maintained counters equal a recount from the rows."""
+        read = lambda: ([tuple(row) for row in db.session.query(Project.document_count, *[
+                            getattr(Project, counter) for counter in COUNTERS]).order_by(Project.id)],
+                        [tuple(row) for row in db.session.query(*[
+                            getattr(Document, counter) for counter in COUNTERS]).order_by(Document.id)])
+        maintained = read()
+        for statement in recount_statements():
+            db.session.execute(db.text(statement))
+        self.assertEqual(read(), maintained)
+        db.session.rollback()
+
+    def test_counters_follow_every_write_path(self):
+        """ORM adds, bulk inserts, bulk status updates and query deletes all update the counters"""
+        first = self.processor.add_records('loan_agreement', {}, [
+            covenant_data('Leverage Ratio', 3.0), covenant_data('Senior Leverage Ratio', 3.7),
+            covenant_data('Total Leverage Ratio', 5.0)])
+        second = self.processor.new_document('amendment', {})
+        self.processor.add_covenant(second, covenant_data('Capex Limit', None))
+        db.session.commit()
+        self.assertEqual(self.counts(Document, first.id), (3, 1, 1, 1))
+        self.assertEqual(self.counts(Document, second.id), (1, 0, 0, 0))
+        self.assertEqual(self.counts(Project, self.project_id), (4, 1, 1, 1))
+        self.assertEqual(db.session.get(Project, self.project_id).document_count, 2)
+
+        Covenant.query.filter(Covenant.document_id == first.id).update({'current_value': 3.0})
+        evaluate_covenants()
+        db.session.commit()
+        self.assertEqual(self.counts(Document, first.id), (3, 3, 0, 0))
+        self.assertMatchesRecount()
+
+        self.processor.clear_records(first)
+        self.assertEqual(self.counts(Project, self.project_id), (1, 0, 0, 0))
+        Document.query.filter_by(id=second.id).delete()
+        db.session.commit()
+        self.assertEqual(self.counts(Project, self.project_id), (0, 0, 0, 0))
+        self.assertEqual(db.session.get(Project, self.project_id).document_count, 1)
+        self.assertMatchesRecount()
+
+    def test_project_page_loads_no_covenants(self):
+        """Project counts and per-document counts come from the project and document rows"""
+        for index in range(3):
+            self.processor.content_hash = str(index)
+            self.processor.add_records('loan_agreement', {}, [covenant_data('Leverage Ratio', 3.0)] * 5)
+        db.session.commit()
+        db.session.expire_all()
+
+        executed = []
+        listener = lambda conn, cursor, statement, *args: executed.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        self.addCleanup(event.remove, db.engine, 'before_cursor_execute', listener)
+        project = db.session.get(Project, self.project_id)
+        self.assertEqual((project.document_count, project.covenant_count), (3, 15))
+        self.assertEqual([document.covenant_count for document in project.documents], [5, 5, 5])
+        self.assertEqual(len(executed), 2)
+        self.assertFalse(any('FROM covenant' in statement for statement in executed))
+
+if __name__ == '__main__':
+    unittest.main()
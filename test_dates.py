@@ -0,0 +1,44 @@
+"""Test single-pass date extraction."""
+import time
+import unittest
+
+from src.document_processor.dates import extract_dates
+from bench_extract_dates import agreement_text, legacy_extract_dates
+
+class ExtractDatesTests(unittest.TestCase):
+    def test_types_and_iso_normalization(self):
+        """Dates are classified by keyword and normalized to ISO format"""
+        text = (
+            "The Effective Date of this Agreement is 10/28/2024.\n"
+            "The Maturity Date shall be October 28, 2029.\n"
+            "Each Compliance Date falls on 31/03/25.\n"
+        )
+        found = [(d['type'], d['date'], d['iso_date']) for d in extract_dates(text)]
+        self.assertEqual(found, [
+            ('effective_date', '10/28/2024', '2024-10-28'),
+            ('termination_date', 'October 28, 2029', '2029-10-28'),
+            ('review_date', '31/03/25', '2025-03-31'),
+        ])
+
+    def test_distance_is_bounded(self):
+        """Dates too far from their keyword or on another line are ignored"""
+        self.assertEqual(extract_dates("closing date " + "x" * 300 + " 01/02/2024"), [])
+        self.assertEqual(extract_dates("closing date\n01/02/2024"), [])
+        self.assertEqual(len(extract_dates("closing date " + "x" * 100 + " 01/02/2024")), 1)
+
+    def test_matches_legacy_results_on_agreement_text(self):
+        """Same dates as the previous three-pass implementation"""
+        text = agreement_text(200 * 1024)
+        legacy = {(d['type'], d['date']) for d in legacy_extract_dates(text)}
+        current = {(d['type'], d['date']) for d in extract_dates(text)}
+        self.assertEqual(current, legacy)
+
+    def test_long_line_without_dates_is_linear(self):
+        """Keywords with no date after them don't cause rescanning"""
+        text = "the review date shall be determined by the agent " * 20000
+        start = time.perf_counter()
+        self.assertEqual(extract_dates(text), [])
+        self.assertLess(time.perf_counter() - start, 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@ from flask import Flask
 from src.models.database import db, Document, Covenant, Alert
 import os
 from datetime import datetime
+from test_support import SCRATCH_DIR
 
 def test_database():
     """Test basic database operations."""
@@ -10,7 +11,7 @@ def test_database():
     
     # Get absolute paths
     base_dir = os.path.abspath(os.path.dirname(__file__))
-    instance_dir = os.path.join(base_dir, 'instance')
+    instance_dir = os.path.join(SCRATCH_DIR, 'instance')  # never the real instance/covenant.db
     db_path = os.path.join(instance_dir, 'covenant.db')
     
     # Create instance directory
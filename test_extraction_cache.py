@@ -0,0 +1,65 @@
+"""Test the content-addressed extraction cache."""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('LLM_CACHE_DISABLED', '1')
+
+from src.document_processor.extraction_cache import ExtractionCache, file_sha256
+from src.document_processor.parser import DocumentParser, PARSER_VERSION, PROMPT_VERSION
+from test_parser import build_pdf
+
+class ExtractionCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ExtractionCache(os.path.join(self.tmpdir.name, 'cache.db'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip(self):
+        """Stored results come back only for the same key"""
+        result = {'covenants': [{'type': 'leverage_ratio', 'threshold_value': 3.5}]}
+        self.cache.put('abc', '1', 'gpt-4', 'p1', result)
+        self.assertEqual(self.cache.get('abc', '1', 'gpt-4', 'p1'), result)
+        self.assertIsNone(self.cache.get('abc', '1', 'gpt-4o', 'p1'))
+        self.assertIsNone(self.cache.get('abc', '1', 'gpt-4', 'p2'))
+
+    def test_eviction_drops_least_recently_used(self):
+        """Entries beyond max_bytes are evicted oldest access first"""
+        self.cache.max_bytes = 120
+        self.cache.put('first', '1', 'm', 'p', {'text': 'x' * 40})
+        self.cache.put('second', '1', 'm', 'p', {'text': 'y' * 40})
+        self.cache.get('first', '1', 'm', 'p')
+        self.cache.put('third', '1', 'm', 'p', {'text': 'z' * 40})
+        self.assertIsNotNone(self.cache.get('first', '1', 'm', 'p'))
+        self.assertIsNone(self.cache.get('second', '1', 'm', 'p'))
+        self.assertIsNotNone(self.cache.get('third', '1', 'm', 'p'))
+
+    def test_invalidate_stale_prompt_versions(self):
+        """Invalidation keeps only entries for the current prompt version"""
+        self.cache.put('doc', '1', 'm', 'old', {})
+        self.cache.put('doc', '1', 'm', 'new', {})
+        self.assertEqual(self.cache.invalidate(prompt_version='new'), 1)
+        self.assertIsNone(self.cache.get('doc', '1', 'm', 'old'))
+        self.assertIsNotNone(self.cache.get('doc', '1', 'm', 'new'))
+
+    def test_repeat_document_skips_extraction(self):
+        """A second parse of the same bytes is served from the cache"""
+        pdf_path = os.path.join(self.tmpdir.name, 'agreement.pdf')
+        with open(pdf_path, 'wb') as f:
+            f.write(build_pdf(['Leverage Ratio not exceeding 3.50:1.00']))
+        cached = {'covenants': [], 'dates': [], 'metadata': {}, 'raw_text': 'cached'}
+        self.cache.put(file_sha256(pdf_path), PARSER_VERSION, 'gpt-4', PROMPT_VERSION, cached)
+
+        parser = DocumentParser(pdf_path)
+        parser.cache = self.cache
+        parser.model = 'gpt-4'
+        with mock.patch.object(parser, 'extract_text') as extract_text:
+            self.assertEqual(parser.process_document(), cached)
+            extract_text.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ import sqlite3
 from flask import Flask
 from src.models.database import db, Document, Covenant, Alert
 from datetime import datetime
+from test_support import SCRATCH_DIR
 
 def test_database_operations():
     """Test database operations step by step."""
@@ -11,7 +12,7 @@ def test_database_operations():
     
     # Step 1: Setup paths
     base_dir = os.path.abspath(os.path.dirname(__file__))
-    instance_dir = os.path.join(base_dir, 'instance')
+    instance_dir = os.path.join(SCRATCH_DIR, 'instance')  # never the real instance/covenant.db
     db_path = os.path.join(instance_dir, 'covenant.db')
     
     print(f"Base directory: {base_dir}")
@@ -0,0 +1,78 @@
+"""Test the batch-ingest command."""
+import json
+import os
+import unittest
+
+from ingest import Checkpoint, find_documents, ingest
+from src.document_processor.extraction_cache import file_sha256
+from src.models.database import Covenant, Document, Project, db
+from test_support import DatabaseTestCase
+
+class IngestTests(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.documents = os.path.join(self.tmpdir.name, 'documents')
+        os.makedirs(os.path.join(self.documents, 'nested'))
+        for i, name in enumerate(['b.pdf', 'a.PDF', 'nested/c.pdf', 'notes.txt']):
+            with open(os.path.join(self.documents, name), 'w') as f:
+                f.write(f"document {i}")
+        self.checkpoint = os.path.join(self.tmpdir.name, 'checkpoint.jsonl')
+
+        project = Project(name='Batch', user_id='batch-ingest')
+        db.session.add(project)
+        db.session.commit()
+        self.project_id = project.id
+
+    def test_finds_documents_in_stable_order(self):
+        """Only PDFs are found, sorted within each directory"""
+        found = [os.path.relpath(path, self.documents) for path in find_documents(self.documents)]
+        self.assertEqual(found, ['a.PDF', 'b.pdf', os.path.join('nested', 'c.pdf')])
+
+    def test_ingest_resumes_from_checkpoint(self):
+        """A second run skips documents already committed"""
+        summary = ingest(self.documents, self.project_id, workers=2, batch_size=2,
+                         checkpoint_path=self.checkpoint, use_mock=True)
+        self.assertEqual((summary['stored'], summary['failed'], summary['skipped']), (3, 0, 0))
+        self.assertEqual(Document.query.count(), 3)
+        self.assertEqual(Covenant.query.count(), 18)
+        self.assertEqual(set(summary['stages']), {'parse', 'store'})
+        self.assertGreater(summary['docs_per_sec'], 0)
+
+        summary = ingest(self.documents, self.project_id, workers=2,
+                         checkpoint_path=self.checkpoint, use_mock=True)
+        self.assertEqual((summary['stored'], summary['skipped']), (0, 3))
+        self.assertEqual(Document.query.count(), 3)
+
+    def test_ingest_skips_documents_already_in_project(self):
+        """A file uploaded to the project before is not ingested again"""
+        db.session.add(Document(project_id=self.project_id, filename='b.pdf', user_id='user-1',
+                                content_hash=file_sha256(os.path.join(self.documents, 'b.pdf'))))
+        db.session.commit()
+        summary = ingest(self.documents, self.project_id, workers=1,
+                         checkpoint_path=self.checkpoint, use_mock=True)
+        self.assertEqual((summary['stored'], summary['skipped']), (2, 1))
+        self.assertEqual(Document.query.filter(Document.content_hash.isnot(None)).count(), 3)
+
+    def test_checkpoint_ignores_torn_line(self):
+        """An entry cut short by a crash does not stop the resume"""
+        with open(self.checkpoint, 'w') as f:
+            f.write(json.dumps({'project_id': 1, 'sha256': 'abc', 'path': 'a.pdf'}) + "\n" + '{"sha256": "de')
+        checkpoint = Checkpoint(self.checkpoint)
+        self.assertIn((1, 'abc'), checkpoint)
+        self.assertEqual(len(checkpoint.done), 1)
+        checkpoint.record([{'project_id': 1, 'sha256': 'fgh', 'path': 'b.pdf'}])
+        self.assertIn((1, 'fgh'), Checkpoint(self.checkpoint))
+        self.assertNotIn((2, 'fgh'), Checkpoint(self.checkpoint))
+
+    def test_checkpoint_is_per_project(self):
+        """A directory ingested into one project is ingested in full into another"""
+        ingest(self.documents, self.project_id, workers=1, checkpoint_path=self.checkpoint, use_mock=True)
+        other = Project(name='Other', user_id='batch-ingest')
+        db.session.add(other)
+        db.session.commit()
+        summary = ingest(self.documents, other.id, workers=1, checkpoint_path=self.checkpoint, use_mock=True)
+        self.assertEqual((summary['stored'], summary['skipped']), (3, 0))
+        self.assertEqual(Document.query.filter_by(project_id=other.id).count(), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,355 @@
+"""Test the durable processing queue and its workers."""
+import hashlib
+import importlib
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+from src.document_processor import jobs as jobs_module
+from src.document_processor.jobs import JobQueue, JobWorkerPool, PermanentJobError
+from src.document_processor.processor import DocumentProcessor, process_job
+from src.document_processor.uploads import SpooledUpload
+from src.models.database import Covenant, Document, Project, db
+from test_support import DatabaseTestCase
+
+class JobQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.queue = JobQueue(os.path.join(self.tmpdir.name, 'jobs.db'), lease=60)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_jobs_are_claimed_once_in_order(self):
+        """Each queued job goes to exactly one claim, oldest first"""
+        first = self.queue.enqueue(1, {'file_path': 'a.pdf'})
+        second = self.queue.enqueue(2, {'file_path': 'b.pdf'})
+        self.assertEqual(self.queue.claim()['id'], first)
+        job = self.queue.claim()
+        self.assertEqual((job['id'], job['payload'], job['attempts']), (second, {'file_path': 'b.pdf'}, 1))
+        self.assertIsNone(self.queue.claim())
+
+        self.queue.complete(first)
+        self.queue.fail(second, 'boom')
+        self.assertEqual(self.queue.counts(), {'completed': 1, 'failed': 1})
+        self.assertEqual(self.queue.get(second)['error'], 'boom')
+
+    def test_expired_lease_is_claimed_again(self):
+        """A job left running by a crashed worker is retried after its lease"""
+        job_id = self.queue.enqueue(1, {})
+        self.queue.claim()
+        self.assertIsNone(self.queue.claim())
+        with mock.patch('src.document_processor.jobs.time.time', return_value=time.time() + 61):
+            job = self.queue.claim()
+        self.assertEqual((job['id'], job['attempts']), (job_id, 2))
+
+    def test_heartbeat_keeps_lease(self):
+        """A job whose worker renews its lease is not handed out again"""
+        job_id = self.queue.enqueue(1, {})
+        job = self.queue.claim()
+        with mock.patch('src.document_processor.jobs.time.time', return_value=time.time() + 50):
+            self.assertTrue(self.queue.heartbeat(job_id, job['attempts']))
+        with mock.patch('src.document_processor.jobs.time.time', return_value=time.time() + 61):
+            self.assertIsNone(self.queue.claim())
+        with mock.patch('src.document_processor.jobs.time.time', return_value=time.time() + 111):
+            self.assertEqual(self.queue.claim()['attempts'], 2)
+        self.assertFalse(self.queue.heartbeat(job_id, job['attempts']))
+
+    def test_retry_waits_for_backoff(self):
+        """A retried job is claimable again once its backoff has passed"""
+        queue = JobQueue(os.path.join(self.tmpdir.name, 'retry.db'), retry_delay=10)
+        job_id = queue.enqueue(1, {})
+        queue.retry(job_id, queue.claim()['attempts'], 'timeout')
+        self.assertIsNone(queue.claim())
+        self.assertEqual(queue.get(job_id), {'document_id': 1, 'status': 'queued', 'attempts': 1,
+                                             'error': 'timeout'})
+        with mock.patch('src.document_processor.jobs.time.time', return_value=time.time() + 11):
+            self.assertEqual(queue.claim()['attempts'], 2)
+
+    def test_worker_renews_lease_of_slow_job(self):
+        """A job running longer than its lease stays with its worker"""
+        queue = JobQueue(os.path.join(self.tmpdir.name, 'slow.db'), lease=0.3)
+        queue.enqueue(1, {})
+        claims = []
+
+        def slow_handler(job):
+            time.sleep(0.5)
+            claims.append(queue.claim())
+
+        JobWorkerPool(Flask(__name__), queue, slow_handler, workers=0).run_once()
+        self.assertEqual(claims, [None])
+        self.assertEqual(queue.counts(), {'completed': 1})
+
+class WorkerConfigTests(unittest.TestCase):
+    def test_workers_are_opt_in_and_off_on_vercel(self):
+        """Uploads are processed in the request unless workers are configured, and always on Vercel"""
+        import config
+        self.addCleanup(importlib.reload, config)
+        with mock.patch.dict(os.environ):
+            os.environ.pop('PROCESSING_WORKERS', None)
+            os.environ.pop('VERCEL', None)
+            self.assertEqual(importlib.reload(config).Config.PROCESSING_WORKERS, 0)
+        with mock.patch.dict(os.environ, {'PROCESSING_WORKERS': '4', 'VERCEL': '1'}):
+            os.environ.pop('JOB_QUEUE_PATH', None)
+            Config = importlib.reload(config).Config
+            self.assertEqual((Config.PROCESSING_WORKERS, Config.JOB_QUEUE_PATH), (0, '/tmp/jobs.db'))
+
+    def test_app_import_starts_no_workers(self):
+        """Workers only start from an explicit entry point"""
+        with mock.patch.object(JobWorkerPool, 'start') as start:
+            from app import app
+            self.assertNotIn('processing_workers', app.extensions)
+            app.config['PROCESSING_WORKERS'] = 0
+            from app import start_processing_workers
+            self.assertIsNone(start_processing_workers(app))
+        start.assert_not_called()
+
+class QueuedDocumentTestCase(DatabaseTestCase):
+    """App database, job queue and stubbed remote storage for processing tests."""
+
+    def setUp(self):
+        super().setUp()
+        self.queue = JobQueue(os.path.join(self.tmpdir.name, 'jobs.db'))
+        patcher = mock.patch.object(jobs_module, '_default_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        project = Project(name='Queued', user_id='user-1')
+        db.session.add(project)
+        db.session.commit()
+        self.project_id = project.id
+
+        self.file_path = os.path.join(self.tmpdir.name, 'agreement.pdf')
+        with open(self.file_path, 'w') as f:
+            f.write('document')
+        self.pool = JobWorkerPool(self.app, self.queue, process_job, workers=0)
+        self.uploads = []
+        patcher = mock.patch('src.document_processor.processor.upload_document', side_effect=self.upload)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, file_path, project_id, filename=None):
+        self.uploads.append(file_path)
+        return f"https://example.com/{os.path.basename(file_path)}"
+
+    def queue_document(self):
+        processor = DocumentProcessor(self.file_path, 'user-1', self.project_id, use_mock=True)
+        return processor.queue_document()
+
+class JobWorkerTests(QueuedDocumentTestCase):
+    def test_queued_document_is_processed_by_worker(self):
+        """The route's document is filled in by a worker and the file removed"""
+        document = self.queue_document()
+        self.assertEqual(document.processing_status, 'queued')
+        self.assertEqual(self.queue.counts(), {'queued': 1})
+
+        self.assertTrue(self.pool.run_once())
+        db.session.expire_all()
+        document = Document.query.get(document.id)
+        self.assertEqual(document.processing_status, 'completed')
+        self.assertEqual(document.document_type, 'loan_agreement')
+        self.assertEqual(document.file_url, 'https://example.com/agreement.pdf')
+        self.assertEqual(Covenant.query.filter_by(document_id=document.id).count(), 6)
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertEqual(self.queue.counts(), {'completed': 1})
+        self.assertFalse(self.pool.run_once())
+
+    def test_retry_replaces_partial_records(self):
+        """A retried job does not duplicate covenants of the interrupted attempt"""
+        document = self.queue_document()
+        job = self.queue.claim()
+        with mock.patch.object(self.queue, 'claim', return_value={**job, 'attempts': 2}):
+            process_job(job)
+            self.pool.run_once()
+        self.assertEqual(Covenant.query.filter_by(document_id=document.id).count(), 6)
+
+    def test_failed_processing_is_retried(self):
+        """An exception requeues the job until its attempts run out, then fails it and the document"""
+        self.queue.retry_delay = 0
+        document = self.queue_document()
+        with mock.patch.object(DocumentProcessor, 'extract', side_effect=RuntimeError('parse failed')):
+            self.pool.run_once()
+            db.session.expire_all()
+            self.assertEqual(Document.query.get(document.id).processing_status, 'queued')
+            self.assertEqual(self.queue.counts(), {'queued': 1})
+            self.assertTrue(os.path.exists(self.file_path))
+            for _ in range(self.queue.max_attempts - 1):
+                self.pool.run_once()
+        db.session.expire_all()
+        self.assertEqual(Document.query.get(document.id).processing_status, 'error')
+        self.assertEqual(self.queue.counts(), {'failed': 1})
+
+    def test_transient_failure_recovers(self):
+        """A job that fails once completes on its retry"""
+        self.queue.retry_delay = 0
+        document = self.queue_document()
+        extract = DocumentProcessor.extract
+        failures = [RuntimeError('timeout')]
+
+        def flaky_extract(processor, predecessor=None):
+            if failures:
+                raise failures.pop()
+            return extract(processor, predecessor)
+
+        with mock.patch.object(DocumentProcessor, 'extract', flaky_extract):
+            self.pool.run_once()
+            self.pool.run_once()
+        db.session.expire_all()
+        self.assertEqual(Document.query.get(document.id).processing_status, 'completed')
+        self.assertEqual(self.queue.counts(), {'completed': 1})
+
+    def test_permanent_error_is_not_retried(self):
+        """PermanentJobError fails the job on its first attempt"""
+        document = self.queue_document()
+        with mock.patch.object(DocumentProcessor, 'extract', side_effect=PermanentJobError('unreadable')):
+            self.pool.run_once()
+        db.session.expire_all()
+        self.assertEqual(Document.query.get(document.id).processing_status, 'error')
+        self.assertEqual(self.queue.counts(), {'failed': 1})
+
+class UploadOverlapTests(QueuedDocumentTestCase):
+    """Remote upload running alongside extraction."""
+
+    def process(self):
+        processor = DocumentProcessor(self.file_path, 'user-1', self.project_id, use_mock=True)
+        document = processor.create_document()
+        return processor, document
+
+    def test_upload_overlaps_extraction(self):
+        """Upload and extraction take as long as the slower of the two"""
+        def slow_upload(file_path, project_id, filename=None):
+            time.sleep(0.3)
+            return 'https://example.com/slow.pdf'
+
+        extract = DocumentProcessor.extract
+
+        def slow_extract(processor, predecessor=None):
+            time.sleep(0.3)
+            return extract(processor, predecessor)
+
+        processor, document = self.process()
+        with mock.patch('src.document_processor.processor.upload_document', side_effect=slow_upload), \
+                mock.patch.object(DocumentProcessor, 'extract', slow_extract):
+            start = time.perf_counter()
+            processor.process_with_upload(document)
+            elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 0.55)
+        self.assertEqual(document.file_url, 'https://example.com/slow.pdf')
+        self.assertEqual(document.processing_status, 'completed')
+
+    def test_failed_upload_keeps_covenants(self):
+        """A failed upload marks the document but keeps what was extracted"""
+        processor, document = self.process()
+        with mock.patch('src.document_processor.processor.upload_document',
+                        side_effect=RuntimeError('storage down')):
+            with self.assertRaises(RuntimeError):
+                processor.process_with_upload(document)
+        db.session.expire_all()
+        document = Document.query.get(document.id)
+        self.assertEqual(document.processing_status, 'error')
+        self.assertIsNone(document.file_url)
+        self.assertEqual(document.doc_metadata['storage_error'], 'storage down')
+        self.assertEqual(Covenant.query.filter_by(document_id=document.id).count(), 6)
+
+    def test_failed_extraction_still_attaches_upload(self):
+        """The stored file is linked even when extraction fails"""
+        processor, document = self.process()
+        with mock.patch.object(DocumentProcessor, 'extract', side_effect=RuntimeError('parse failed')):
+            with self.assertRaisesRegex(RuntimeError, 'parse failed'):
+                processor.process_with_upload(document)
+        db.session.expire_all()
+        document = Document.query.get(document.id)
+        self.assertEqual((document.processing_status, document.file_url),
+                         ('error', 'https://example.com/agreement.pdf'))
+
+class DuplicateUploadTests(QueuedDocumentTestCase):
+    """Uploads of content the project already has."""
+
+    def processor(self, data=b'%PDF-1.4 agreement'):
+        upload = SpooledUpload.read(io.BytesIO(data), self.file_path)
+        return DocumentProcessor(self.file_path, 'user-1', self.project_id, use_mock=True, upload=upload)
+
+    def test_same_content_is_found_in_project(self):
+        """The fingerprint identifies the stored document, only within its project"""
+        document = self.processor().queue_document()
+        self.assertEqual(document.content_hash, hashlib.sha256(b'%PDF-1.4 agreement').hexdigest())
+        self.assertEqual(self.processor().find_duplicate().id, document.id)
+        self.assertIsNone(self.processor(b'other').find_duplicate())
+
+        other_project = Project(name='Other', user_id='user-1')
+        db.session.add(other_project)
+        db.session.commit()
+        processor = self.processor()
+        processor.project_id = other_project.id
+        self.assertIsNone(processor.find_duplicate())
+
+    def test_concurrent_duplicate_links_to_first(self):
+        """Losing the race to the unique index returns the stored document without queueing"""
+        document = self.processor().queue_document()
+        processor = self.processor()
+        self.assertEqual(processor.queue_document().id, document.id)
+        self.assertEqual(processor.duplicate.id, document.id)
+        self.assertEqual(Document.query.count(), 1)
+        self.assertEqual(self.queue.counts(), {'queued': 1})
+
+    def test_failed_document_is_reprocessed(self):
+        """Re-uploading a document that failed resets and requeues it"""
+        self.queue.max_attempts = 1
+        document = self.processor().queue_document()
+        with mock.patch.object(DocumentProcessor, 'extract', side_effect=RuntimeError('parse failed')):
+            self.pool.run_once()
+        db.session.expire_all()
+        processor = self.processor()
+        self.assertEqual(processor.queue_document().id, document.id)
+        self.assertIsNone(processor.duplicate)
+        self.pool.run_once()
+        db.session.expire_all()
+        self.assertEqual(Document.query.get(document.id).processing_status, 'completed')
+        self.assertEqual(Document.query.count(), 1)
+
+class PredecessorTests(QueuedDocumentTestCase):
+    """Amendments naming a document of another project or user."""
+
+    def other_tenant_document(self):
+        project = Project(name='Other tenant', user_id='user-2')
+        db.session.add(project)
+        db.session.flush()
+        document = Document(project_id=project.id, filename='theirs.pdf', user_id='user-2',
+                            doc_metadata={'parties': ['Their Borrower']})
+        db.session.add(document)
+        db.session.commit()
+        return document
+
+    def test_foreign_predecessor_is_rejected(self):
+        """Only a document of the same project and user is used as the predecessor"""
+        theirs = self.other_tenant_document()
+        processor = DocumentProcessor(self.file_path, 'user-1', self.project_id, predecessor_id=theirs.id,
+                                      use_mock=True)
+        self.assertIsNone(processor.find_predecessor())
+        with self.assertRaisesRegex(ValueError, 'not found'):
+            processor.process_and_store()
+        self.assertEqual(Document.query.filter_by(user_id='user-1').count(), 0)
+
+        own = DocumentProcessor(self.file_path, 'user-1', self.project_id, use_mock=True).process_and_store()
+        processor.predecessor_id = own.id
+        self.assertEqual(processor.find_predecessor().id, own.id)
+
+    def test_job_with_foreign_predecessor_fails_before_upload(self):
+        """A queued row pointing at another tenant's document is failed without processing"""
+        document = self.queue_document()
+        document.parent_document_id = self.other_tenant_document().id
+        db.session.commit()
+        self.pool.run_once()
+        db.session.expire_all()
+        self.assertEqual(Document.query.get(document.id).processing_status, 'error')
+        self.assertEqual(self.queue.counts(), {'failed': 1})
+        self.assertEqual(self.uploads, [])
+        self.assertEqual(Covenant.query.filter_by(document_id=document.id).count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
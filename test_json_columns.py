@@ -0,0 +1,67 @@
+"""Test JSON metadata columns and their indexed paths."""
+import unittest
+
+from sqlalchemy import inspect
+
+from src.models.database import Alert, Covenant, Document, Project, db
+from test_support import DatabaseTestCase
+
+class JSONColumnTests(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        project = Project(name='JSON', user_id='user-1')
+        db.session.add(project)
+        db.session.flush()
+        self.documents = []
+        for index, parties in enumerate([['Acme Corp', 'First Bank'], ['Globex', 'First Bank'], []]):
+            document = Document(project_id=project.id, filename=f"{index}.pdf", user_id='user-1',
+                                doc_metadata={'parties': parties, 'pages': index})
+            db.session.add(document)
+            self.documents.append(document)
+        db.session.flush()
+        covenant = Covenant(document_id=self.documents[0].id, user_id='user-1', name='Leverage Ratio',
+                            covenant_metadata={'threshold_schedule': []})
+        db.session.add(covenant)
+        db.session.flush()
+        for severity in ('high', 'low', None):
+            details = {'analysis': {'severity': severity}} if severity else None
+            db.session.add(Alert(covenant_id=covenant.id, user_id='user-1', alert_type='breach',
+                                 message='Leverage Ratio is in breach status', details=details))
+        db.session.commit()
+
+    def test_values_round_trip_and_track_edits(self):
+        """Columns load as dicts and edits in place are saved"""
+        document = self.documents[0]
+        document.doc_metadata['storage_error'] = 'storage down'
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(Document.query.get(document.id).doc_metadata,
+                         {'parties': ['Acme Corp', 'First Bank'], 'pages': 0, 'storage_error': 'storage down'})
+        self.assertEqual(Covenant.query.one().threshold_schedule(), [])
+        self.assertIsNone(Alert.query.filter(Alert.details.is_(None)).one().severity)
+
+    def test_filters_on_json_paths(self):
+        """Parties and breach severity are filtered in SQL"""
+        names = lambda query: sorted(document.filename for document in query)
+        self.assertEqual(names(Document.query.filter(Document.has_party('First Bank'))), ['0.pdf', '1.pdf'])
+        self.assertEqual(names(Document.query.filter(Document.has_party('Globex'))), ['1.pdf'])
+        self.assertEqual(self.documents[0].parties, ['Acme Corp', 'First Bank'])
+
+        high = Alert.query.filter(Alert.user_id == 'user-1', Alert.severity == 'high').all()
+        self.assertEqual([alert.severity for alert in high], ['high'])
+
+    def test_severity_filter_uses_expression_index(self):
+        """The rendered path matches the index expression, so SQLite searches the index"""
+        query = Alert.query.filter(Alert.user_id == 'user-1', Alert.severity == 'high')
+        compiled = query.statement.compile(db.engine)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        with db.engine.connect() as conn:
+            plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled.string}", params)]
+        self.assertTrue(any('ix_alert_user_severity' in detail for detail in plan), plan)
+
+        # Array membership cannot be indexed on SQLite; the GIN index is Postgres only
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('document')}
+        self.assertNotIn('ix_document_parties', indexes)
+
+if __name__ == '__main__':
+    unittest.main()
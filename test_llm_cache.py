@@ -0,0 +1,75 @@
+"""Test the shared LLM response cache."""
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from src.llm import cache as llm_cache
+from src.llm.cache import LLMResponseCache, cache_key, cached_completion
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+class LLMResponseCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = LLMResponseCache(os.path.join(self.tmpdir.name, 'llm.db'), enabled=True)
+        patcher = mock.patch.object(llm_cache, '_default_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_key_ignores_whitespace_but_not_model(self):
+        """Prompts differing only in whitespace share a key"""
+        messages = [{'role': 'user', 'content': 'Analyze   this\n covenant'}]
+        same = [{'role': 'user', 'content': 'Analyze this covenant '}]
+        self.assertEqual(cache_key('gpt-4', messages, 0.1), cache_key('gpt-4', same, 0.1))
+        self.assertNotEqual(cache_key('gpt-4', messages, 0.1), cache_key('gpt-4o', messages, 0.1))
+
+    def test_repeat_prompt_is_served_from_cache(self):
+        """The second identical call does not reach the API"""
+        create = mock.Mock(return_value=completion('{"severity": "high"}'))
+        messages = [{'role': 'user', 'content': 'Analyze this breach'}]
+        self.assertEqual(cached_completion(create, 'gpt-4', messages), ('{"severity": "high"}', False))
+        self.assertEqual(cached_completion(create, 'gpt-4', messages), ('{"severity": "high"}', True))
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_disk_store_survives_new_instance(self):
+        """Entries persist in SQLite behind the in-memory LRU"""
+        self.cache.put('k', 'gpt-4', 'stored')
+        fresh = LLMResponseCache(self.cache.db_path, enabled=True)
+        self.assertEqual(fresh.get('k'), 'stored')
+        self.assertEqual(fresh.stats()['memory_hits'], 0)
+        self.assertEqual(fresh.get('k'), 'stored')
+        self.assertEqual(fresh.stats()['memory_hits'], 1)
+
+    def test_expired_entries_miss(self):
+        """Entries are not returned after their TTL"""
+        self.cache.put('k', 'gpt-4', 'stale', ttl=-1)
+        self.assertIsNone(self.cache.get('k'))
+
+    def test_invalid_responses_are_not_cached(self):
+        """Responses rejected by validate are retried rather than replayed"""
+        create = mock.Mock(return_value=completion('not json'))
+        messages = [{'role': 'user', 'content': 'Return JSON'}]
+        cached_completion(create, 'gpt-4', messages, validate=json.loads)
+        cached_completion(create, 'gpt-4', messages, validate=json.loads)
+        self.assertEqual(create.call_count, 2)
+
+    def test_bypass(self):
+        """Calls inside bypass() skip lookups and stores"""
+        create = mock.Mock(return_value=completion('fresh'))
+        messages = [{'role': 'user', 'content': 'prompt'}]
+        cached_completion(create, 'gpt-4', messages)
+        with self.cache.bypass():
+            self.assertEqual(cached_completion(create, 'gpt-4', messages), ('fresh', False))
+        self.assertEqual(create.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Test LLM token, cost and latency accounting."""
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+from flask import Flask
+
+from src.llm import cache as llm_cache
+from src.llm import metrics as llm_metrics
+from src.llm.cache import LLMResponseCache, cached_completion
+from src.llm.metrics import LLMMetrics, estimate_cost, in_current_scope, llm_scope
+from src.routes.metrics import metrics_bp
+
+def completion(content, prompt_tokens=100, completion_tokens=20):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              total_tokens=prompt_tokens + completion_tokens)
+    )
+
+class LLMMetricsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.metrics = LLMMetrics()
+        self.cache = LLMResponseCache(os.path.join(self.tmpdir.name, 'llm.db'), enabled=True)
+        for target, value in ((llm_metrics, self.metrics), (llm_cache, self.cache)):
+            patcher = mock.patch.object(target, '_metrics' if target is llm_metrics else '_default_cache', value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_cost_uses_longest_matching_price(self):
+        """gpt-4o-mini is not priced as gpt-4o or gpt-4"""
+        self.assertAlmostEqual(estimate_cost('gpt-4', 1000, 1000), 0.09)
+        self.assertAlmostEqual(estimate_cost('gpt-4o-mini-2024-07-18', 1000, 0), 0.00015)
+        self.assertEqual(estimate_cost('unknown-model', 1000, 1000), 0.0)
+
+    def test_calls_are_rolled_up_by_stage_and_document(self):
+        """Token usage is attributed to the enclosing document and run"""
+        create = mock.Mock(side_effect=[completion('[]'), completion('"loan"', 50, 5)])
+        with llm_scope(run='nightly'):
+            with llm_scope(document='a.pdf') as usage:
+                cached_completion(create, 'gpt-4', [{'role': 'user', 'content': 'one'}], stage='covenants')
+                cached_completion(create, 'gpt-4', [{'role': 'user', 'content': 'two'}], stage='document_type')
+                cached_completion(create, 'gpt-4', [{'role': 'user', 'content': 'one'}], stage='covenants')
+
+        document = usage.as_dict()
+        self.assertEqual(document['calls'], 3)
+        self.assertEqual(document['cache_hits'], 1)
+        self.assertEqual(document['prompt_tokens'], 150)
+        self.assertEqual(document['by_stage']['covenants']['calls'], 2)
+
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['by_document']['a.pdf']['completion_tokens'], 25)
+        self.assertEqual(snapshot['by_run']['nightly']['calls'], 3)
+        self.assertAlmostEqual(snapshot['totals']['cost_usd'], estimate_cost('gpt-4', 150, 25))
+        self.assertEqual(snapshot['recent_calls'][-1]['document'], 'a.pdf')
+        self.assertTrue(snapshot['recent_calls'][-1]['cache_hit'])
+
+    def test_worker_threads_keep_scope(self):
+        """Calls made from a thread pool count towards the caller's scope"""
+        with llm_scope(document='b.pdf') as usage:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                record = in_current_scope(lambda stage: self.metrics.record('gpt-4', stage, 0.01, prompt_tokens=10))
+                list(executor.map(record, ['covenants', 'parties']))
+        self.assertEqual(usage.as_dict()['calls'], 2)
+        self.assertEqual(self.metrics.snapshot()['by_document']['b.pdf']['prompt_tokens'], 20)
+
+    def test_each_call_is_logged_as_json(self):
+        """One structured log line is emitted per call"""
+        with self.assertLogs('llm.calls', level='INFO') as logs:
+            self.metrics.record('gpt-4', 'breach_analysis', 0.2, prompt_tokens=10, completion_tokens=5)
+        self.assertIn('"stage": "breach_analysis"', logs.output[0])
+
+class MetricsRouteTests(unittest.TestCase):
+    def setUp(self):
+        self.metrics = LLMMetrics()
+        patcher = mock.patch.object(llm_metrics, '_metrics', self.metrics)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def client(self, user_id):
+        app = Flask(__name__)
+        app.secret_key = 'test'
+        app.config['METRICS_ADMIN_USERS'] = ['auth0|admin']
+        app.register_blueprint(metrics_bp)
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user'] = {'sub': user_id}
+        return client
+
+    def test_only_admins_see_metrics(self):
+        """Rollups across tenants are withheld from other signed-in users"""
+        with llm_scope(document='theirs.pdf'):
+            self.metrics.record('gpt-4', 'covenants', 0.1, prompt_tokens=10)
+        response = self.client('auth0|tenant').get('/api/llm/metrics')
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn(b'theirs.pdf', response.data)
+
+        response = self.client('auth0|admin').get('/api/llm/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('theirs.pdf', response.get_json()['by_document'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,7 @@ from src.models.database import db, Document, Covenant, Alert
 from src.document_processor.mock_parser import MockDocumentParser
 import os
 from datetime import datetime
+from test_support import SCRATCH_DIR
 
 def test_with_mock():
     """Test document processing with mock parser."""
@@ -11,7 +12,7 @@ def test_with_mock():
     
     # Get absolute paths
     base_dir = os.path.abspath(os.path.dirname(__file__))
-    instance_dir = os.path.join(base_dir, 'instance')
+    instance_dir = os.path.join(SCRATCH_DIR, 'instance')  # never the real instance/covenant.db
     db_path = os.path.join(instance_dir, 'covenant.db')
     
     # Create instance directory
@@ -0,0 +1,196 @@
+"""Test DocumentParser text extraction without calling OpenAI."""
+import json
+import os
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('LLM_CACHE_DISABLED', '1')
+
+from src.document_processor.parser import DocumentParser, merge_covenants, split_into_windows
+import src.document_processor.parser as parser_module
+from src.llm import cache as llm_cache
+from src.llm.cache import LLMResponseCache
+
+def disable_llm_cache(test):
+    """Swap in a disabled LLM cache so earlier runs cannot answer the test's calls."""
+    tmpdir = tempfile.TemporaryDirectory()
+    test.addCleanup(tmpdir.cleanup)
+    cache = LLMResponseCache(os.path.join(tmpdir.name, 'llm.db'), enabled=False)
+    patcher = mock.patch.object(llm_cache, '_default_cache', cache)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+
+def build_pdf(pages):
+    """Build a minimal PDF with one line of text per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+class FakeOpenAI:
+    """Stand-in for the OpenAI client returning canned completions."""
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.calls = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.calls.append(kwargs)
+        content = self.respond(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+class DocumentParserExtractionTests(unittest.TestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+        self.pages = [f"Page {i} Leverage Ratio" for i in range(40)]
+        handle, self.pdf_path = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(build_pdf(self.pages))
+
+    def tearDown(self):
+        os.remove(self.pdf_path)
+
+    def test_iter_pages_in_order(self):
+        """Pages are streamed one at a time in document order"""
+        parser = DocumentParser(self.pdf_path)
+        self.assertEqual(list(parser.iter_pages()), self.pages)
+        self.assertEqual(parser.extract_text(), "".join(self.pages))
+
+    def test_parallel_extraction_matches_serial(self):
+        """Process pool extraction reassembles pages in order"""
+        original = parser_module.PAGE_BATCH_SIZE
+        parser_module.PAGE_BATCH_SIZE = 7
+        try:
+            parser = DocumentParser(self.pdf_path, workers=2)
+            self.assertEqual(parser.extract_text(), "".join(self.pages))
+        finally:
+            parser_module.PAGE_BATCH_SIZE = original
+
+    def test_text_is_capped(self):
+        """Extraction stops at the configured character ceiling"""
+        parser = DocumentParser(self.pdf_path, max_chars=50)
+        text = parser.extract_text()
+        self.assertEqual(len(text), 50)
+        self.assertTrue("".join(self.pages).startswith(text))
+
+class ChunkedExtractionTests(unittest.TestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+
+    def test_windows_overlap_and_cover_text(self):
+        """Windows overlap and together cover the whole document"""
+        text = "".join(f"Section {i}. Clause text.\n" for i in range(500))
+        windows = split_into_windows(text, size=1000, overlap=100)
+        self.assertTrue(all(len(w) <= 1000 for w in windows))
+        self.assertTrue(windows[0].endswith("\n"))
+        rebuilt = windows[0]
+        for window in windows[1:]:
+            overlap = next(n for n in range(len(window), 0, -1) if rebuilt.endswith(window[:n]))
+            rebuilt += window[overlap:]
+        self.assertEqual(rebuilt, text)
+
+    def test_merge_deduplicates_by_type_and_threshold(self):
+        """Duplicate covenants from overlapping windows are merged"""
+        merged = merge_covenants([
+            [{'type': 'leverage_ratio', 'threshold_value': 3.5, 'calculation_method': 'Not specified'}],
+            [{'type': 'Leverage_Ratio', 'threshold_value': 3.5, 'calculation_method': 'Debt / EBITDA'},
+             {'type': 'leverage_ratio', 'threshold_value': 3.0}],
+        ])
+        self.assertEqual(len(merged), 2)
+        self.assertEqual(merged[0]['calculation_method'], 'Debt / EBITDA')
+
+    def test_chunked_analysis_covers_late_sections(self):
+        """Covenants past the first window are extracted in chunked mode"""
+        def respond(kwargs):
+            prompt = kwargs['messages'][1]['content']
+            found = []
+            if 'Leverage Ratio' in prompt:
+                found.append({'type': 'leverage_ratio', 'threshold': 3.5})
+            if 'Minimum Liquidity' in prompt:
+                found.append({'type': 'minimum_liquidity', 'threshold': 10000000})
+            return json.dumps(found)
+
+        text = "Leverage Ratio 3.50:1.00\n" + "Definitions.\n" * 2000 + "Minimum Liquidity\n"
+        parser = DocumentParser('unused.pdf', use_cache=False)
+        parser.client = FakeOpenAI(respond)
+        self.assertEqual([c['type'] for c in parser.analyze_with_gpt(text)], ['leverage_ratio'])
+
+        parser.chunked = True
+        parser.chunk_concurrency = 3
+        types = [c['type'] for c in parser.analyze_with_gpt(text)]
+        self.assertEqual(types, ['leverage_ratio', 'minimum_liquidity'])
+        self.assertGreater(len(parser.client.calls), 3)
+
+class AnalysisModeTests(unittest.TestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+
+    def test_combined_mode_makes_one_call(self):
+        """Combined mode returns covenants, type and parties from one response"""
+        response = {
+            'document_type': 'Credit Agreement',
+            'parties': ['TECH INNOVATIONS INC.', 'FIRST NATIONAL BANK'],
+            'covenants': [{'type': 'leverage_ratio', 'threshold': '3.50:1.00', 'frequency': 'quarterly'}],
+        }
+        parser = DocumentParser('unused.pdf', use_cache=False)
+        parser.client = FakeOpenAI(lambda kwargs: json.dumps(response))
+        parser.analysis_mode = 'combined'
+        covenants, document_type, parties = parser.analyze_document("Leverage Ratio 3.50:1.00")
+        self.assertEqual(len(parser.client.calls), 1)
+        self.assertEqual(document_type, 'credit agreement')
+        self.assertEqual(parties, response['parties'])
+        self.assertEqual(covenants[0]['threshold_value'], 3.5)
+        self.assertEqual(covenants[0]['measurement_frequency'], 'quarterly')
+
+    def test_combined_mode_falls_back_on_bad_response(self):
+        """An unusable combined response falls back to the three separate calls"""
+        def respond(kwargs):
+            system = kwargs['messages'][0]['content']
+            if 'single JSON object' in system:
+                return 'not json'
+            if 'party names' in system:
+                return '["Borrower"]'
+            if 'document types' in system:
+                return 'Loan Agreement'
+            return '[]'
+
+        parser = DocumentParser('unused.pdf', use_cache=False)
+        parser.client = FakeOpenAI(respond)
+        parser.analysis_mode = 'combined'
+        covenants, document_type, parties = parser.analyze_document("text")
+        self.assertEqual(len(parser.client.calls), 4)
+        self.assertEqual((covenants, document_type, parties), ([], 'loan agreement', ['Borrower']))
+
+if __name__ == '__main__':
+    unittest.main()
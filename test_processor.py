@@ -4,6 +4,7 @@ from src.models.database import db
 from src.document_processor.processor import DocumentProcessor
 import os
 from dotenv import load_dotenv
+from test_support import SCRATCH_DIR
 
 def test_processor():
     """Test document processor with both parsers."""
@@ -14,7 +15,7 @@ def test_processor():
     
     # Get absolute paths
     base_dir = os.path.abspath(os.path.dirname(__file__))
-    instance_dir = os.path.join(base_dir, 'instance')
+    instance_dir = os.path.join(SCRATCH_DIR, 'instance')  # never the real instance/covenant.db
     db_path = os.path.join(instance_dir, 'covenant.db')
     pdf_path = os.path.join(os.path.dirname(base_dir), 'loan-agreement.pdf')
     
@@ -0,0 +1,109 @@
+"""Query-plan regression tests for the alert and project views at 1M-row scale."""
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+
+from src.models.database import Alert, Covenant, Document, Project, db
+from test_support import pop_database_app, push_database_app
+
+PROJECTS = 10_000
+DOCUMENTS = 100_000
+ROWS = 1_000_000
+USERS = 1_000
+
+class QueryPlanTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.context = push_database_app(cls.tmpdir.name)
+        fill = [
+            (f"""INSERT INTO project (id, name, user_id, created_at)
+                SELECT value, 'Project ' || value, 'user-' || (value % {USERS}), '2026-01-01 00:00:00'
+                FROM generate""", PROJECTS),
+            (f"""INSERT INTO document (id, project_id, filename, user_id, processing_status, content_hash)
+                SELECT value, 1 + value % {PROJECTS}, 'agreement.pdf', 'user-' || (value % {USERS}),
+                       'completed', printf('%064d', value)
+                FROM generate""", DOCUMENTS),
+            (f"""INSERT INTO covenant (id, document_id, user_id, name, compliance_status)
+                SELECT value, 1 + value % {DOCUMENTS}, 'user-' || (value % {USERS}), 'Leverage Ratio',
+                       CASE value % 4 WHEN 0 THEN 'compliant' WHEN 1 THEN 'warning'
+                                      WHEN 2 THEN 'breach' ELSE 'unknown' END
+                FROM generate""", ROWS),
+            (f"""INSERT INTO alert (id, covenant_id, user_id, alert_type, message, status, created_at)
+                SELECT value, value, 'user-' || (value % {USERS}), CASE value % 2 WHEN 0 THEN 'warning' ELSE 'breach' END,
+                       'Leverage Ratio is out of compliance', CASE value % 3 WHEN 0 THEN 'new' ELSE 'resolved' END,
+                       datetime('2026-01-01', '+' || (value % 365) || ' days')
+                FROM generate""", ROWS),
+        ]
+        with db.engine.begin() as conn:
+            # Scratch database: skip the fsyncs and keep the index pages in memory while filling
+            conn.exec_driver_sql("PRAGMA synchronous = OFF")
+            conn.exec_driver_sql("PRAGMA cache_size = -262144")
+            for statement, count in fill:
+                conn.execute(text(
+                    f"WITH RECURSIVE generate(value) AS (SELECT 1 UNION ALL SELECT value + 1 FROM generate "
+                    f"WHERE value < {count}) {statement}"))
+            conn.execute(text("ANALYZE"))
+
+    @classmethod
+    def tearDownClass(cls):
+        pop_database_app(cls.context)
+        cls.tmpdir.cleanup()
+
+    def plan(self, query):
+        """EXPLAIN QUERY PLAN details of an ORM query."""
+        statement = getattr(query, 'statement', query)
+        compiled = statement.compile(db.engine, compile_kwargs={'render_postcompile': True})
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        with db.engine.connect() as conn:
+            rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled.string}", params).fetchall()
+        return [row[-1] for row in rows]
+
+    def assertIndexed(self, query, *indexes):
+        """Every table is searched through an index, and the named indexes are used."""
+        plan = self.plan(query)
+        for detail in plan:
+            if detail.startswith(('SCAN', 'SEARCH')):
+                self.assertTrue(detail.startswith('SEARCH') and 'INDEX' in detail, f"{detail} in {plan}")
+        for index in indexes:
+            self.assertTrue(any(index in detail for detail in plan), f"{index} not in {plan}")
+        return plan
+
+    def test_alert_list_is_read_in_index_order(self):
+        """alerts(): active alerts newest first without a sort"""
+        plan = self.assertIndexed(
+            Alert.query.filter_by(user_id='user-7', status='new').order_by(Alert.created_at.desc()),
+            'ix_alert_user_status_created')
+        self.assertFalse(any('TEMP B-TREE' in detail for detail in plan), plan)
+
+    def test_alert_summary_reads_only_indexes(self):
+        """alert_summary: counts by type and the 30-day history come from covering indexes"""
+        type_counts = db.session.query(Alert.alert_type, db.func.count(Alert.id)) \
+            .filter_by(user_id='user-7', status='new').group_by(Alert.alert_type)
+        plan = self.assertIndexed(type_counts, 'COVERING INDEX ix_alert_user_status_created')
+
+        history = db.session.query(
+            db.func.date(Alert.created_at), Alert.alert_type, db.func.count(Alert.id)
+        ).filter(
+            Alert.user_id == 'user-7', Alert.created_at >= datetime(2026, 10, 18) - timedelta(days=30)
+        ).group_by(db.func.date(Alert.created_at), Alert.alert_type)
+        self.assertIndexed(history, 'COVERING INDEX ix_alert_user_created')
+
+        self.assertIndexed(Alert.query.filter_by(covenant_id=42, status='new'), 'ix_alert_covenant_status')
+
+    def test_project_views_use_indexes(self):
+        """Project list, project detail counts and the documents and covenants it renders"""
+        self.assertIndexed(Project.query.filter_by(user_id='user-7'), 'ix_project_user_id')
+        self.assertIndexed(Document.query.filter_by(project_id=42), 'uq_document_project_content_hash')
+        self.assertIndexed(db.session.query(Covenant).join(Document).filter(Document.project_id == 42),
+                           'uq_document_project_content_hash', 'ix_covenant_document_status')
+        self.assertIndexed(Covenant.query.filter_by(document_id=42), 'ix_covenant_document_status')
+        self.assertIndexed(db.session.query(Covenant.document_id, db.func.count())
+                           .filter(Covenant.document_id.in_([1, 2, 3]))
+                           .group_by(Covenant.document_id, Covenant.compliance_status),
+                           'COVERING INDEX ix_covenant_document_status')
+
+if __name__ == '__main__':
+    unittest.main()
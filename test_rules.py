@@ -0,0 +1,72 @@
+"""Test the rule-based covenant fast path."""
+import os
+import unittest
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('LLM_CACHE_DISABLED', '1')
+
+from src.document_processor.mock_parser import MockDocumentParser
+from src.document_processor.parser import DocumentParser
+from src.document_processor.rules import extract_rule_covenants, match_sentence
+from test_parser import FakeOpenAI, disable_llm_cache
+
+class RuleCovenantTests(unittest.TestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+
+    def test_mock_agreement_resolved_without_gpt(self):
+        """The standard covenant shapes are all resolved confidently"""
+        mock = MockDocumentParser('unused.pdf')
+        result = extract_rule_covenants(mock.extract_text())
+        found = {(c['type'], c['threshold']) for c in result['covenants']}
+        expected = {(c['type'], c['threshold_value']) for c in mock.process_document()['covenants']}
+        self.assertEqual(found, expected)
+        self.assertEqual(result['unresolved_text'].strip(), '')
+
+    def test_sentence_forms(self):
+        """Long-form clauses are normalized with direction and frequency"""
+        covenant = match_sentence(
+            "The Borrower shall maintain minimum Liquidity of not less than USD 10,000,000 at all times.")
+        self.assertEqual((covenant['type'], covenant['threshold'], covenant['direction']),
+                         ('minimum_liquidity', 10000000.0, 'min'))
+        self.assertEqual(covenant['frequency'], 'at all times')
+        self.assertGreaterEqual(covenant['confidence'], 0.9)
+
+        covenant = match_sentence(
+            "The Borrower shall not declare or pay any dividends or make any distributions on its "
+            "capital stock if the Leverage Ratio exceeds 2.75:1.00.")
+        self.assertEqual((covenant['type'], covenant['threshold']), ('distributions', 2.75))
+
+        covenant = match_sentence(
+            "The Borrower shall maintain, as of the last day of each fiscal quarter ending on or after "
+            "December 31, 2024, an Interest Coverage Ratio of not less than 2.50 to 1.00.")
+        self.assertEqual((covenant['type'], covenant['threshold'], covenant['direction']),
+                         ('interest_coverage_ratio', 2.5, 'min'))
+        self.assertGreaterEqual(covenant['confidence'], 0.9)
+
+        covenant = match_sentence("Total Debt shall not exceed $25 million at the end of any fiscal quarter.")
+        self.assertIsNone(covenant)
+
+    def test_step_down_grid_left_for_gpt(self):
+        """Clauses with several thresholds are not resolved by rules"""
+        text = ("Section 7.1 Leverage Ratio. The Leverage Ratio shall not exceed 3.50:1.00 through 2024, "
+                "3.25:1.00 during 2025 and 3.00:1.00 thereafter.\n"
+                "Section 7.2 Liquidity. Minimum Liquidity of $10,000,000.")
+        result = extract_rule_covenants(text)
+        self.assertEqual([c['type'] for c in result['covenants']], ['minimum_liquidity'])
+        self.assertIn("3.25:1.00", result['unresolved_text'])
+        self.assertNotIn("Minimum Liquidity", result['unresolved_text'])
+
+    def test_parser_skips_gpt_when_rules_resolve_everything(self):
+        """analyze_with_gpt makes no API call when every clause is resolved"""
+        parser = DocumentParser('unused.pdf', use_cache=False)
+        parser.client = FakeOpenAI(lambda kwargs: '[]')
+        parser.rules_fast_path = True
+        covenants = parser.analyze_with_gpt(MockDocumentParser('unused.pdf').extract_text())
+        self.assertEqual(len(covenants), 6)
+        self.assertEqual(parser.client.calls, [])
+        liquidity = next(c for c in covenants if c['type'] == 'minimum_liquidity')
+        self.assertEqual(liquidity['threshold_value'], 10000000.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+"""Test step-down threshold schedules."""
+import json
+import os
+import random
+import unittest
+from datetime import date, timedelta
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+from src.document_processor.parser import DocumentParser
+from src.document_processor.schedules import ScheduleIndex, ThresholdSchedule, build_schedule, parse_condition
+from src.models.database import Covenant
+
+with open(os.path.join(os.path.dirname(__file__), 'extraction_results.json')) as f:
+    LEVERAGE = json.load(f)['covenants'][0]
+
+class ScheduleTests(unittest.TestCase):
+    def test_leverage_step_downs(self):
+        """The 3.50 / 3.25 / 3.00 grid becomes consecutive date intervals"""
+        schedule = build_schedule(LEVERAGE['thresholds'])
+        self.assertEqual([(s['start'], s['end'], s['value']) for s in schedule], [
+            (None, '2024-12-31', 3.5),
+            ('2025-01-01', '2025-12-31', 3.25),
+            ('2026-01-01', None, 3.0),
+        ])
+        lookup = ThresholdSchedule(schedule)
+        self.assertEqual(lookup.value_at(date(2024, 6, 30)), 3.5)
+        self.assertEqual(lookup.value_at('2025-01-01'), 3.25)
+        self.assertEqual(lookup.value_at(date(2025, 12, 31)), 3.25)
+        self.assertEqual(lookup.value_at(date(2031, 3, 31)), 3.0)
+
+    def test_condition_keywords(self):
+        """'after' and 'before' exclude the date named"""
+        self.assertEqual(parse_condition("for periods after March 31, 2025")['start'], date(2025, 4, 1))
+        self.assertEqual(parse_condition("prior to 6/30/2025")['end'], date(2025, 6, 29))
+        self.assertEqual(parse_condition("for the fiscal quarter ending September 30, 2025")['end'],
+                         date(2025, 9, 30))
+
+    def test_non_date_conditions_are_not_schedules(self):
+        """Thresholds that cannot be placed in time give no schedule"""
+        self.assertEqual(build_schedule([{'value': 2.75, 'condition': 'if the Leverage Ratio exceeds'}]), [])
+        self.assertEqual(build_schedule([{'value': 3.0, 'condition': 'if rated BBB'},
+                                         {'value': 3.5, 'condition': 'if rated below BBB'}]), [])
+
+    def test_bulk_lookup_matches_bisection(self):
+        """ScheduleIndex agrees with per-covenant lookups across many covenants"""
+        rng = random.Random(0)
+        schedules, defaults = [], []
+        for _ in range(2000):
+            steps, start = [], date(2024, 1, 1) + timedelta(days=rng.randint(0, 365))
+            for _ in range(rng.randint(0, 4)):
+                steps.append({'start': start.isoformat(), 'value': round(rng.uniform(1, 5), 2)})
+                start += timedelta(days=rng.randint(30, 400))
+            schedules.append(steps)
+            defaults.append(None if rng.random() < 0.1 else 9.0)
+        dates = [date(2023, 6, 1) + timedelta(days=rng.randint(0, 1500)) for _ in schedules]
+
+        index = ScheduleIndex(schedules, defaults)
+        resolved = index.lookup(dates)
+        for position, (steps, default, on) in enumerate(zip(schedules, defaults, dates)):
+            expected = ThresholdSchedule(steps).value_at(on) if steps else default
+            if expected is None:
+                self.assertNotEqual(resolved[position], resolved[position])  # NaN
+            else:
+                self.assertEqual(resolved[position], expected)
+        self.assertEqual(index.lookup(date(2030, 1, 1)).shape, (2000,))
+
+    def test_compliance_uses_threshold_in_force(self):
+        """A leverage of 3.4 breaches once the 3.25 step applies"""
+        covenant = DocumentParser('unused.pdf', use_cache=False).normalize_covenant(dict(LEVERAGE))
+        stored = Covenant(name='Leverage Ratio', current_value=3.4, threshold_value=covenant['threshold_value'],
+                          covenant_metadata={'threshold_schedule': covenant['threshold_schedule']})
+        stored.update_compliance_status(date(2024, 9, 30))
+        self.assertEqual((stored.threshold_value, stored.compliance_status), (3.5, 'compliant'))
+        stored.update_compliance_status(date(2025, 9, 30))
+        self.assertEqual((stored.threshold_value, stored.compliance_status), (3.25, 'warning'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Test the covenant section locator."""
+import os
+import unittest
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('LLM_CACHE_DISABLED', '1')
+
+from src.document_processor.parser import DocumentParser
+from src.document_processor.sections import locate_covenant_sections
+from test_parser import FakeOpenAI, disable_llm_cache
+
+AGREEMENT = "\n".join([
+    "CREDIT AGREEMENT",
+    "dated as of October 28, 2024 among TECH INNOVATIONS INC., as Borrower, and FIRST NATIONAL BANK, as Agent.",
+    "ARTICLE I DEFINITIONS",
+    "\"Leverage Ratio\" means the ratio of Total Debt to EBITDA, which shall not exceed 3.50:1.00 when tested. " * 40,
+    "ARTICLE II THE LOANS",
+    "Section 2.1 Commitments. Each Lender agrees to make loans to the Borrower from time to time. " * 40,
+    "ARTICLE VII FINANCIAL COVENANTS",
+    "Section 7.1 Leverage Ratio. The Borrower shall not permit the Leverage Ratio to exceed 3.50:1.00.",
+    "Section 7.2 Interest Coverage. The Interest Coverage Ratio shall be at least 3.00:1.00.",
+    "ARTICLE VIII EVENTS OF DEFAULT",
+    "Section 8.1 Events. Failure to pay principal when due shall be an Event of Default. " * 40,
+    "Section 8.2 Liquidity. The Borrower shall maintain minimum Liquidity of $10,000,000 at all times.",
+    "IN WITNESS WHEREOF",
+    "TECH INNOVATIONS INC. By: Name: Title: Minimum signature block 1.00x",
+])
+
+class LocateCovenantSectionsTests(unittest.TestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+
+    def test_keeps_covenant_sections_only(self):
+        """Covenant articles and dense covenant clauses are kept, boilerplate dropped"""
+        selection = locate_covenant_sections(AGREEMENT)
+        kept = selection['text']
+        self.assertIn("Section 7.1 Leverage Ratio", kept)
+        self.assertIn("Section 7.2 Interest Coverage", kept)
+        self.assertIn("minimum Liquidity of $10,000,000", kept)
+        self.assertNotIn("means the ratio of Total Debt", kept)
+        self.assertNotIn("Each Lender agrees", kept)
+        self.assertNotIn("Failure to pay principal", kept)
+        self.assertNotIn("signature block", kept)
+        self.assertLess(selection['kept_fraction'], 0.2)
+        self.assertEqual(selection['kept_chars'], sum(end - start for start, end in selection['spans']))
+
+    def test_falls_back_to_whole_text(self):
+        """Documents without covenant signals are passed through unchanged"""
+        text = "This letter confirms our meeting.\nRegards."
+        selection = locate_covenant_sections(text)
+        self.assertEqual(selection['text'], text)
+        self.assertEqual(selection['kept_fraction'], 1.0)
+
+    def test_parser_sends_only_located_sections(self):
+        """With the locator enabled the covenant prompt carries the trimmed text"""
+        parser = DocumentParser('unused.pdf', use_cache=False)
+        parser.client = FakeOpenAI(lambda kwargs: '[]')
+        parser.locate_sections = True
+        parser.analyze_with_gpt(AGREEMENT)
+        prompt = parser.client.calls[0]['messages'][1]['content']
+        self.assertIn("Section 7.1 Leverage Ratio", prompt)
+        self.assertNotIn("Each Lender agrees", prompt)
+        self.assertLess(parser.section_selection['kept_fraction'], 0.2)
+
+if __name__ == '__main__':
+    unittest.main()
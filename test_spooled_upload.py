@@ -0,0 +1,91 @@
+"""Test spooled upload buffers and in-memory parsing."""
+import hashlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('LLM_CACHE_DISABLED', '1')
+
+from src.document_processor import uploads
+from src.document_processor.parser import DocumentParser
+from src.document_processor.processor import DocumentProcessor
+from src.document_processor.uploads import SpooledUpload
+from test_parser import build_pdf
+
+class SpooledUploadTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'agreement.pdf')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_small_upload_stays_in_memory(self):
+        """Small files are hashed while read and never touch the disk"""
+        data = os.urandom(5000)
+        upload = SpooledUpload.read(io.BytesIO(data), self.path, limit=10_000, chunk_size=1024)
+        self.assertTrue(upload.in_memory)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual((upload.size, upload.sha256), (5000, hashlib.sha256(data).hexdigest()))
+
+        first, second = upload.open(), upload.open()
+        self.assertEqual(first.read(100), data[:100])
+        self.assertEqual(second.read(), data)
+
+        upload.persist()
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+        upload.discard()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_large_upload_spills_to_disk(self):
+        """Files past the limit are written to their path as they arrive"""
+        data = os.urandom(50_000)
+        upload = SpooledUpload.read(io.BytesIO(data), self.path, limit=10_000, chunk_size=4096)
+        self.assertFalse(upload.in_memory)
+        self.assertIsNone(upload.content)
+        self.assertEqual(upload.sha256, hashlib.sha256(data).hexdigest())
+        with upload.open() as f:
+            self.assertEqual(f.read(), data)
+
+    def test_held_uploads_are_bounded(self):
+        """Uploads no worker takes are dropped oldest first"""
+        with mock.patch.object(uploads, 'UPLOAD_HELD_BYTES', 2500), \
+                mock.patch.object(uploads, '_held', uploads.OrderedDict()):
+            for name in ('a', 'b', 'c'):
+                uploads.hold(SpooledUpload.read(io.BytesIO(b'x' * 1000), name))
+            self.assertIsNone(uploads.take('a'))
+            self.assertEqual(uploads.take('c').size, 1000)
+            self.assertIsNone(uploads.take('c'))
+
+class InMemoryParsingTests(unittest.TestCase):
+    def test_parser_reads_buffer_without_file(self):
+        """The parser extracts text from the buffer; the path need not exist"""
+        pdf = build_pdf(["Credit Agreement", "Leverage Ratio 3.50:1.00"])
+        upload = SpooledUpload.read(io.BytesIO(pdf), '/nonexistent/agreement.pdf')
+        processor = DocumentProcessor(upload.path, 'user-1', use_mock=False, upload=upload)
+        parser = processor.parser
+        self.assertIsInstance(parser, DocumentParser)
+        self.assertEqual(parser.extract_text(), "Credit AgreementLeverage Ratio 3.50:1.00")
+        self.assertEqual(parser.document_hash, hashlib.sha256(pdf).hexdigest())
+
+        sent = []
+        with mock.patch('src.document_processor.processor.upload_document',
+                        side_effect=lambda source, project_id, filename: sent.append((source.read(), filename))
+                        or 'url'):
+            self.assertEqual(processor.upload_file(), 'url')
+        self.assertEqual(sent, [(pdf, 'agreement.pdf')])
+
+    def test_stream_upload_keeps_filename(self):
+        """Cloudinary is given the original filename along with an in-memory stream"""
+        from src.document_processor.storage import upload_document
+        with mock.patch('src.document_processor.storage.cloudinary.uploader.upload',
+                        return_value={'secure_url': 'url'}) as upload:
+            self.assertEqual(upload_document(io.BytesIO(b'%PDF'), 7, filename='agreement.pdf'), 'url')
+        self.assertEqual(upload.call_args.kwargs['filename'], 'agreement.pdf')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,147 @@
+"""Test incremental parsing of streamed covenant responses."""
+import json
+import os
+import threading
+import unittest
+from types import SimpleNamespace
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('LLM_CACHE_DISABLED', '1')
+
+from src.document_processor.parser import DocumentParser
+from src.document_processor.processor import DocumentProcessor
+from src.llm.streaming import JSONArrayStream, recover_json_array
+from src.models.database import Covenant, Document, Project, db
+from test_parser import build_pdf, disable_llm_cache
+from test_support import DatabaseTestCase
+
+COVENANTS = [
+    {'type': 'leverage_ratio', 'threshold': '3.50:1.00', 'frequency': 'quarterly',
+     'description': 'Total Leverage Ratio shall not exceed 3.50:1.00 {as "tested"}'},
+    {'type': 'interest_coverage', 'threshold': '2.00x', 'frequency': 'quarterly',
+     'description': 'Interest Coverage Ratio of at least 2.00x'},
+]
+
+class FakeStreamingOpenAI:
+    """Stand-in for the OpenAI client streaming canned content in small chunks."""
+
+    def __init__(self, content, chunk_size=7):
+        self.content = content
+        self.chunk_size = chunk_size
+        self.calls = []
+        self.delivered = []
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        with self.lock:
+            self.calls.append(kwargs)
+        if not kwargs.get('stream'):
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content='Loan Agreement'))])
+        return self.chunks()
+
+    def chunks(self):
+        for start in range(0, len(self.content), self.chunk_size):
+            delta = self.content[start:start + self.chunk_size]
+            self.delivered.append(delta)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+
+class JSONArrayStreamTests(unittest.TestCase):
+    def test_objects_are_emitted_as_they_close(self):
+        """Each object is returned by the chunk that closes it, not at the end"""
+        stream = JSONArrayStream()
+        content = "```json\n" + json.dumps(COVENANTS) + "\n```"
+        first = json.dumps(COVENANTS[0])
+        first_close = content.index(first) + len(first)
+        self.assertEqual(stream.feed(content[:first_close - 1]), [])
+        self.assertEqual(stream.feed(content[first_close - 1:first_close]), [COVENANTS[0]])
+        self.assertEqual(stream.feed(content[first_close:]), [COVENANTS[1]])
+        self.assertTrue(stream.complete)
+
+    def test_truncated_tail_keeps_complete_objects(self):
+        """A response cut off mid-object yields the objects before it"""
+        content = json.dumps(COVENANTS)[:-20]
+        self.assertEqual(recover_json_array(content), [COVENANTS[0]])
+        stream = JSONArrayStream()
+        stream.feed(content)
+        self.assertFalse(stream.complete)
+        self.assertTrue(stream.pending)
+
+    def test_malformed_object_is_skipped(self):
+        """One bad object does not lose the others"""
+        content = '[{"type": "a"}, {"type": b}, {"type": "c"}]'
+        stream = JSONArrayStream()
+        self.assertEqual(stream.feed(content), [{'type': 'a'}, {'type': 'c'}])
+        self.assertEqual(stream.skipped, 1)
+
+class StreamingParserTests(unittest.TestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+
+    def test_stream_window_yields_before_response_ends(self):
+        """The first covenant is available while the response is still arriving"""
+        content = json.dumps(COVENANTS)
+        parser = DocumentParser('unused.pdf', use_cache=False)
+        parser.client = FakeStreamingOpenAI(content)
+        covenants = parser.stream_window("Leverage Ratio 3.50:1.00")
+        first = next(covenants)
+        self.assertEqual(first['threshold_value'], 3.5)
+        self.assertLess(len(''.join(parser.client.delivered)), len(content))
+        self.assertEqual([c['type'] for c in covenants], ['interest_coverage'])
+        self.assertEqual(parser.llm_errors, 0)
+
+    def test_truncated_response_counts_as_error(self):
+        """Complete covenants of a cut-off response are kept but the call is an error"""
+        parser = DocumentParser('unused.pdf', use_cache=False)
+        parser.client = FakeStreamingOpenAI(json.dumps(COVENANTS)[:-20])
+        covenants = list(parser.stream_window("text"))
+        self.assertEqual([c['type'] for c in covenants], ['leverage_ratio'])
+        self.assertEqual(parser.llm_errors, 1)
+
+    def test_malformed_non_streamed_response_is_recovered(self):
+        """parse_covenant_response keeps the complete covenants of a truncated array"""
+        parser = DocumentParser('unused.pdf', use_cache=False)
+        covenants = parser.parse_covenant_response(json.dumps(COVENANTS)[:-20])
+        self.assertEqual([c['type'] for c in covenants], ['leverage_ratio'])
+        self.assertEqual(parser.llm_errors, 1)
+
+class StreamAndStoreTests(DatabaseTestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+        super().setUp()
+        self.pdf_path = os.path.join(self.tmpdir.name, 'agreement.pdf')
+        with open(self.pdf_path, 'wb') as f:
+            f.write(build_pdf(["Section 7.1 Total Leverage Ratio 3.50:1.00"]))
+
+        project = Project(name='Streaming', user_id='user-1')
+        db.session.add(project)
+        db.session.commit()
+        self.project_id = project.id
+
+    def test_covenants_are_committed_as_they_stream(self):
+        """Each covenant is visible in the database before the next one arrives"""
+        processor = DocumentProcessor(self.pdf_path, 'user-1', self.project_id, use_mock=False)
+        processor.file_url = 'https://example.com/agreement.pdf'
+        processor.parser.cache = None
+        processor.parser.stream = True
+        processor.parser.client = FakeStreamingOpenAI(json.dumps(COVENANTS))
+
+        seen = []
+        stream_covenants = processor.parser.stream_covenants
+
+        def observe(text):
+            for covenant in stream_covenants(text):
+                seen.append((Document.query.one().processing_status, Covenant.query.count()))
+                yield covenant
+
+        processor.parser.stream_covenants = observe
+        document = processor.process_and_store()
+        self.assertEqual(seen, [('extracting', 0), ('extracting', 1)])
+        self.assertEqual(document.processing_status, 'completed')
+        self.assertEqual(document.document_type, 'loan agreement')
+        self.assertEqual(Covenant.query.count(), 2)
+        self.assertNotIn('sections', document.doc_metadata)
+        self.assertTrue(processor.parser.stored_sections(document.doc_metadata))
+
+if __name__ == '__main__':
+    unittest.main()
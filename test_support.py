@@ -0,0 +1,49 @@
+"""Shared setup for tests that need the app database.
+
+Importing this module points every on-disk store at a scratch directory, so
+test runs never write the instance/*.db files; conftest.py imports it before
+any app module reads its path settings.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import unittest
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix='covenant-monitor-tests-')
+atexit.register(shutil.rmtree, SCRATCH_DIR, ignore_errors=True)
+for setting, name in [('TEXT_STORE_PATH', 'text_store.db'), ('EXTRACTION_CACHE_PATH', 'extraction_cache.db'),
+                      ('LLM_CACHE_PATH', 'llm_cache.db'), ('JOB_QUEUE_PATH', 'jobs.db')]:
+    os.environ[setting] = os.path.join(SCRATCH_DIR, name)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH_DIR, 'covenant.db')}"
+
+from flask import Flask
+from flask.ctx import AppContext
+
+from src.models.database import db
+
+def push_database_app(directory: str, name: str = 'test.db') -> AppContext:
+    """Push the app context of a Flask app on a new SQLite database in ``directory``."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, name)}"
+    db.init_app(app)
+    context = app.app_context()
+    context.push()
+    db.create_all()
+    return context
+
+def pop_database_app(context: AppContext):
+    """Close the database connections opened under ``context`` and pop it."""
+    db.session.remove()
+    db.engine.dispose()
+    context.pop()
+
+class DatabaseTestCase(unittest.TestCase):
+    """Each test runs in the app context of a fresh database in ``self.tmpdir``."""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.context = push_database_app(self.tmpdir.name)
+        self.addCleanup(pop_database_app, self.context)
+        self.app = self.context.app
@@ -0,0 +1,96 @@
+"""Test the compressed store of extracted document text."""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+os.environ.setdefault('LLM_CACHE_DISABLED', '1')
+
+from src.document_processor import text_store as text_store_module
+from src.document_processor.parser import DocumentParser
+from src.document_processor.text_store import TextStore
+from src.models.database import Document
+from test_parser import FakeOpenAI, build_pdf, disable_llm_cache
+
+class TextStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = TextStore(os.path.join(self.tmpdir.name, 'text.db'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_round_trip_is_lazy(self):
+        """Pages come back on demand, in order"""
+        pages = [f"Section {i}. The Borrower shall maintain a Leverage Ratio. " * 20 for i in range(5)]
+        info = self.store.put('doc-1', pages)
+        self.assertEqual(info, {'key': 'doc-1', 'pages': 5, 'chars': sum(map(len, pages))})
+
+        stored = self.store.get('doc-1')
+        with mock.patch.object(self.store, 'read_pages', wraps=self.store.read_pages) as read_pages:
+            self.assertEqual(len(stored), info['chars'])
+            read_pages.assert_not_called()
+            self.assertEqual(stored.page(3), pages[3])
+        self.assertEqual(list(stored.iter_pages()), pages)
+        self.assertEqual(stored.text(), "".join(pages))
+        self.assertIsNone(self.store.get('missing'))
+
+    def test_pages_shared_by_amendments_are_stored_once(self):
+        """An amendment only adds the pages that changed"""
+        original = [f"Page {i} of the credit agreement. " * 50 for i in range(10)]
+        amended = original[:9] + ["Page 9 as amended. " * 50]
+        self.store.put('original', original)
+        self.store.put('amendment', amended)
+        stats = self.store.stats()
+        self.assertEqual(stats['pages'], 11)
+        self.assertEqual(self.store.get('amendment').text(), "".join(amended))
+        self.assertLess(stats['stored_bytes'], stats['page_chars'] / 5)
+
+        self.assertEqual(self.store.delete('amendment'), 1)
+        self.assertEqual(self.store.stats()['pages'], 10)
+        self.assertEqual(self.store.get('original').text(), "".join(original))
+
+    def test_section_fingerprints_kept_with_text(self):
+        """Fingerprints are stored and removed with their document"""
+        sections = [{'heading': 'Section 7.1', 'start': 0, 'end': 40, 'hash': 'abc'}]
+        self.store.put('doc-1', ["Section 7.1 Leverage Ratio of 3.50:1.00."])
+        self.assertTrue(self.store.put_sections('doc-1', sections))
+        self.assertEqual(self.store.get_sections('doc-1'), sections)
+        self.assertIsNone(self.store.get_sections('missing'))
+        self.store.delete('doc-1')
+        self.assertIsNone(self.store.get_sections('doc-1'))
+
+class ParserTextStoreTests(unittest.TestCase):
+    def setUp(self):
+        disable_llm_cache(self)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = TextStore(os.path.join(self.tmpdir.name, 'text.db'))
+        patcher = mock.patch.object(text_store_module, '_default_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pdf_path = os.path.join(self.tmpdir.name, 'agreement.pdf')
+        self.pages = ["Credit Agreement", "Leverage Ratio 3.50:1.00"]
+        with open(self.pdf_path, 'wb') as f:
+            f.write(build_pdf(self.pages))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_result_references_stored_text(self):
+        """The result carries a key to the text instead of the text itself"""
+        parser = DocumentParser(self.pdf_path, use_cache=False)
+        parser.client = FakeOpenAI(lambda kwargs: '[]')
+        result = parser.process_document()
+        self.assertNotIn('raw_text', result)
+        info = result['metadata']['text']
+        self.assertEqual(info['pages'], 2)
+
+        document = Document(doc_metadata=result['metadata'])
+        self.assertEqual(document.raw_text().text(), "".join(self.pages))
+        self.assertNotIn('sections', result['metadata'])
+        self.assertEqual(self.store.get_sections(info['key']), parser.stored_sections(result['metadata']))
+        self.assertTrue(parser.stored_sections(result['metadata']))
+
+if __name__ == '__main__':
+    unittest.main()
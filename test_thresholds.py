@@ -0,0 +1,81 @@
+"""Test batch threshold parsing."""
+import math
+import os
+import unittest
+
+import numpy as np
+
+os.environ.setdefault('OPENAI_API_KEY', 'test-key')
+
+from src.document_processor.parser import DocumentParser
+from src.document_processor.thresholds import parse_threshold, parse_thresholds
+
+class ParseThresholdsTests(unittest.TestCase):
+    def test_units_and_scales(self):
+        """Currency, scale words, multiples, ratios and percentages are normalized"""
+        cases = {
+            "$25 million": 25e6,
+            "EUR 10mm": 10e6,
+            "USD 10,000,000": 10e6,
+            "£1.5bn": 1.5e9,
+            "$500k": 5e5,
+            "3.50x": 3.5,
+            "1.25 times": 1.25,
+            "3.50:1.00": 3.5,
+            "2.75 to 1.00": 2.75,
+            "12.5%": 0.125,
+            "not exceeding 4.00:1.00": 4.0,
+        }
+        values, failed = parse_thresholds(list(cases))
+        self.assertFalse(failed.any())
+        np.testing.assert_allclose(values, list(cases.values()))
+
+    def test_negative_values(self):
+        """A leading minus or accounting parentheses make the value negative"""
+        cases = {
+            "-2.0": -2.0,
+            "-$5 million": -5e6,
+            "($5 million)": -5e6,
+            "(12.5%)": -0.125,
+            "(3.50:1.00)": 3.5,
+            "(3.50x)": 3.5,
+            "3.50-4.00": 3.5,
+            "(i) 2.0": 2.0,
+            "(1) 4.00:1.00": 4.0,
+            "(5)": 5.0,
+        }
+        values, failed = parse_thresholds(list(cases))
+        self.assertFalse(failed.any())
+        np.testing.assert_allclose(values, list(cases.values()))
+
+    def test_failure_mask(self):
+        """Unparseable entries are masked and NaN; numbers pass through"""
+        values, failed = parse_thresholds(["not specified", 3, None, "3.00:0", 2.5, "not specified"])
+        self.assertEqual(failed.tolist(), [True, False, True, True, False, True])
+        self.assertEqual(values[1], 3.0)
+        self.assertEqual(values[4], 2.5)
+        self.assertTrue(np.isnan(values[[0, 2, 3, 5]]).all())
+
+    def test_repeated_values_share_results(self):
+        """Repeats across a large column resolve to the same value"""
+        values, failed = parse_thresholds(["$10 million", "3.50:1.00"] * 5000)
+        self.assertEqual(values.shape, (10000,))
+        self.assertEqual(set(values.tolist()), {10e6, 3.5})
+        self.assertFalse(failed.any())
+
+    def test_single_values_match_batch(self):
+        """parse_threshold agrees with the batch parser value for value"""
+        cases = ["$25 million", "EUR 10mm", "3.50x", "3.50:1.00", "2.75 to 1.00", "12.5%", "-2.0",
+                 "($5 million)", "(3.50x)", "(1) 4.00:1.00", "(5)", "3.00:0", "not specified", 3, 2.5, None, True]
+        values, _ = parse_thresholds(cases)
+        np.testing.assert_array_equal([parse_threshold(case) for case in cases], values)
+
+    def test_parser_no_longer_returns_zero(self):
+        """The per-covenant parser uses the same rules and reports failures as None"""
+        parser = DocumentParser('unused.pdf', use_cache=False)
+        self.assertEqual(parser.parse_threshold_value("$25 million"), 25e6)
+        self.assertIsNone(parser.parse_threshold_value("not specified"))
+        self.assertTrue(math.isclose(parser.parse_threshold_value("3.50x"), 3.5))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+"""Process queued document uploads.
+
+Run next to the web app when PROCESSING_WORKERS is set; the web process
+queues uploads and this process extracts them:
+
+    PROCESSING_WORKERS=2 python worker.py
+"""
+import logging
+import signal
+import threading
+
+from app import app, start_processing_workers
+
+logger = logging.getLogger(__name__)
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    workers = start_processing_workers(app)
+    if workers is None:
+        print("PROCESSING_WORKERS is 0; uploads are processed inside the request")
+        return
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stopping.set())
+    try:
+        stopping.wait()
+    except KeyboardInterrupt:
+        pass
+    print("Stopping processing workers")
+    workers.stop()
+
+if __name__ == '__main__':
+    main()